@@ -1,9 +1,14 @@
+import time
+
 import streamlit as st
 
-from models.state import VisibilityState
-from streamlit_utils.scoring import MultiModelScoringEngine
+import config
+from langgraph_agent.jobs import ensure_workers, start_workers, submit_job
+from storage.job_store import get_job_store
+from storage.report_store import find_report
+from storage.run_history import get_run_history
 from streamlit_utils.charts import *
-from langgraph_agent.agent import app
+from streamlit_utils.report_cache import cached_figures, cached_report, cached_responses, cached_scores
 
 # --------------------------------------------------------
 # PAGE CONFIG
@@ -72,68 +77,34 @@ st.set_page_config(layout="wide", page_title="AI Visibility Dashboard")
 if "page" not in st.session_state:
     st.session_state.page = "form"
 
-if "running" not in st.session_state:
-    st.session_state.running = False
-
 if "result_ready" not in st.session_state:
     st.session_state.result_ready = False
 
+# Background job of the last submitted run, and the report the dashboard shows
+if "job_id" not in st.session_state:
+    st.session_state.job_id = None
 
-# -------------------------
-# FUNCTION: RUN LANGGRAPH
-# -------------------------
-def run_langgraph(brand_name, brand_url, region, number_of_queries):
-    st.session_state.running = True
-    st.session_state.result_ready = False
-
-    st.markdown("## 🚀 Running AI Visibility Pipeline")
-
-    progress_text = st.empty()
-    progress_bar = st.progress(0)
+if "report_path" not in st.session_state:
+    st.session_state.report_path = None
 
-    NODE_SEQUENCE = ["web_scraper", "industry_detector", "competitor_extractor", "query_generator",
-                     "fire_queries", "parser", "flatten_queries"]
 
-    total_nodes = len(NODE_SEQUENCE)
-    completed_nodes = 0
+@st.cache_resource
+def job_workers():
+    """Worker processes of this Streamlit server (started once, shared by every session)."""
+    return start_workers()
 
-    current_node_placeholder = st.empty()
 
-    # Start streaming
-    for chunk in app.stream(
-            VisibilityState(
-                brand_name=brand_name,
-                website_url=brand_url,
-                num_queries=number_of_queries,
-                region=region
-            )
-    ):
+ensure_workers(job_workers())
+job_store = get_job_store()
 
-        node_name = list(chunk.keys())[0]
-        print("executing ", node_name)
 
-        if node_name:
-            # Update progress only when a NEW node appears
-            if node_name in NODE_SEQUENCE:
-                completed_nodes = NODE_SEQUENCE.index(node_name) + 1
-
-            progress_ratio = completed_nodes / total_nodes
-
-            progress_bar.progress(progress_ratio)
-
-            progress_text.markdown(
-                f"### ⏳ Progress: **{int(progress_ratio * 100)}%** complete"
-            )
-
-            current_node_placeholder.markdown(
-                f"#### ⚙️ Running Node: **{node_name}**"
-            )
-
-    # After completion
-    progress_bar.progress(1.0)
-    progress_text.markdown("### ✅ Completed!")
-    st.session_state.page = "dashboard"
-    st.rerun()
+def open_job(job):
+    st.session_state.job_id = job["job_id"]
+    if job["status"] == "done":
+        st.session_state.report_path = job["report_path"]
+        st.session_state.page = "dashboard"
+    else:
+        st.session_state.page = "job"
 
 
 # -------------------------
@@ -158,9 +129,89 @@ if st.session_state.page == "form":
         if not brand_name or not brand_url:
             st.error("Please fill in both fields.")
         else:
-            run_langgraph(brand_name, brand_url, region, number_of_queries)
+            # The run happens in a worker process: this session only polls its progress
+            st.session_state.job_id = submit_job(brand_name, brand_url, region, number_of_queries)
+            st.session_state.page = "job"
             st.rerun()
 
+    recent_jobs = job_store.list_jobs(10)
+    if recent_jobs:
+        st.markdown("### Recent runs")
+        for job in recent_jobs:
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.markdown(
+                    f"**{job['brand']}** — {job['status']} "
+                    f"({job['nodes_done']}/{job['nodes_total'] or '?'} steps), "
+                    f"submitted {time.strftime('%Y-%m-%d %H:%M', time.localtime(job['created_at']))}"
+                )
+            with col2:
+                label = "View report" if job["status"] == "done" else "Open"
+                if st.button(label, key=f"open_{job['job_id']}"):
+                    open_job(job)
+                    st.rerun()
+
+# -------------------------
+# PAGE 2 — JOB PROGRESS
+# -------------------------
+elif st.session_state.page == "job":
+
+    job = job_store.get(st.session_state.job_id) if st.session_state.job_id else None
+    if job is None:
+        st.session_state.page = "form"
+        st.rerun()
+
+    st.markdown(f"## 🚀 Running AI Visibility Pipeline — {job['brand']}")
+
+    progress_ratio = job["nodes_done"] / job["nodes_total"] if job["nodes_total"] else 0.0
+    st.progress(progress_ratio)
+    st.markdown(f"### ⏳ Progress: **{int(progress_ratio * 100)}%** complete")
+
+    if job["current_node"]:
+        st.markdown(f"#### ⚙️ Last finished step: **{job['current_node']}**")
+
+    # Partial results from answer_pipeline (PIPELINE_STREAMING)
+    partial = job_store.last_event(job["job_id"], "partial")
+    if partial:
+        st.markdown(
+            f"#### 📥 Parsed **{partial['completed']} / {partial['total']}** queries — "
+            f"brand mentioned in **{partial['mentioned']} / {partial['rows']}** answers so far"
+        )
+
+    if job["status"] == "done":
+        st.markdown("### ✅ Completed!")
+        open_job(job)
+        st.rerun()
+
+    elif job["status"] in ("failed", "cancelled"):
+        st.error(f"The run {job['status']}" + (f": {job['error']}" if job["error"] else "."))
+        st.info("Completed steps and queries are saved; a retry resumes from there.")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("▶️ Retry run"):
+                job_store.retry(job["job_id"])
+                st.rerun()
+        with col2:
+            if st.button("🔄 Back to form"):
+                st.session_state.page = "form"
+                st.rerun()
+
+    else:
+        if job["status"] == "queued":
+            st.info("Waiting for a free worker...")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("⏹️ Cancel run", disabled=job["status"] == "cancelling"):
+                job_store.cancel(job["job_id"])
+                st.rerun()
+        with col2:
+            if st.button("🔄 Back to form (the run continues)"):
+                st.session_state.page = "form"
+                st.rerun()
+
+        time.sleep(config.JOB_POLL_SECONDS)
+        st.rerun()
+
 elif st.session_state.page == "dashboard":
 
     # Back button
@@ -169,32 +220,33 @@ elif st.session_state.page == "dashboard":
         st.session_state.result_ready = False
         st.rerun()
 
-    DATA_PATH = Path("output/visibility_report.json")
+    DATA_PATH = find_report(st.session_state.report_path or "output/visibility_report.json")
 
     st.set_page_config(layout="wide")
     st.title("🚀 AI Visibility Dashboard")
 
-    if not DATA_PATH.exists():
+    if DATA_PATH is None:
         st.warning("Waiting for LangGraph to generate data...")
         st.stop()
 
-    with open(DATA_PATH, "r") as f:
-        raw_json = f.read()
-
+    # Scores and charts never need the full answer text; raw_response is
+    # loaded only when the raw data tab asks for it. All of it is cached per
+    # report version, so widget changes only redraw.
     try:
-        raw_data = json.loads(raw_json)
-    except:
-        st.error("Invalid JSON input.")
+        df_raw = cached_report(DATA_PATH)
+    except Exception as e:
+        st.error(f"Could not read the report ({e}).")
         st.stop()
 
-    results = MultiModelScoringEngine(raw_data).run()
+    results = cached_scores(DATA_PATH)
+    figures = cached_figures(DATA_PATH)
 
     # ----------------------------------------------------
     # TABS
     # ----------------------------------------------------
-    tab1, tab2, tab3, tab4 = st.tabs(["📄 View Raw Data", "📊 Visualization", "📝 Description", "Formula"])
-
-    df = pd.DataFrame(raw_data)
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        ["📄 View Raw Data", "📊 Visualization", "📝 Description", "Formula", "📈 Trends"]
+    )
 
     # ----------------------------------------------------
     # TAB 1 — RAW DATA
@@ -234,16 +286,17 @@ elif st.session_state.page == "dashboard":
             </style>
         """, unsafe_allow_html=True)
 
-        # Force show raw_response and all fields
         st.write("### Full Raw Dataset")
 
-        # Convert to DataFrame strictly (no column dropping)
-        df_raw = pd.DataFrame(raw_data)
+        table = df_raw
+        if st.checkbox("Show full model responses (raw_response)", value=False):
+            responses = cached_responses(DATA_PATH)
+            table = df_raw.assign(raw_response=responses["raw_response"].to_numpy())
 
         # Wrap dataframe inside scrollable container with CSS
         st.markdown("<div class='raw-table-container'>", unsafe_allow_html=True)
         st.dataframe(
-            df_raw,
+            table,
             use_container_width=True,
             height=550
         )
@@ -254,7 +307,7 @@ elif st.session_state.page == "dashboard":
     # ----------------------------------------------------
     with tab2:
         model_name = st.selectbox("Select Model", list(results.keys()))
-        model = results[model_name]
+        model_figures = figures["models"][model_name]
 
         st.markdown("### Inter Model Comparison metrics")
         st.markdown("""
@@ -266,47 +319,64 @@ elif st.session_state.page == "dashboard":
         with st.container():
             col1, col2 = st.columns([1, 1])
             with col1:
-                st.plotly_chart(plot_multi_model_visibility(results), use_container_width=True)
+                st.plotly_chart(figures["multi_model_visibility"], use_container_width=True)
             with col2:
-                st.plotly_chart(plot_multi_model_category(results), use_container_width=True)
+                st.plotly_chart(figures["multi_model_category"], use_container_width=True)
 
         with st.container():
             col1, col2 = st.columns([1, 1])
             with col1:
-                brand_score = calculate_brand_total_score(df_raw)
-                chart = create_donut_chart(brand_score, "Brand Visibility Score - Overall")
-
-                st.plotly_chart(chart, use_container_width=True)
+                st.plotly_chart(figures["brand_score"], use_container_width=True)
             with col2:
-                brand_score = calculate_brand_score_by_model(df_raw, model_name)
-                chart = create_donut_chart(brand_score, f"Brand Visibility Score for {model_name}")
-
-                st.plotly_chart(chart, use_container_width=True)
+                st.plotly_chart(model_figures["brand_score"], use_container_width=True)
 
         st.markdown(f"### {model_name} metrics")
         col1, col2 = st.columns(2)
         with col1:
-            st.plotly_chart(raw_visibility_chart(model["raw_visibility"]), use_container_width=True)
+            st.plotly_chart(model_figures["raw_visibility"], use_container_width=True)
         with col2:
-            st.plotly_chart(category_visibility_chart(model["category_visibility"]), use_container_width=True)
+            st.plotly_chart(model_figures["category_visibility"], use_container_width=True)
 
         with st.container():
             col1, col2 = st.columns([1, 1])
 
             with col1:
                 st.markdown("#### Product Dominance")
-                st.plotly_chart(product_dominance_chart(model["product_score"]), use_container_width=True)
+                st.plotly_chart(model_figures["product_dominance"], use_container_width=True)
 
             with col2:
                 st.markdown("#### Competitor Score")
-                st.plotly_chart(competitor_heatmap(model["competitor_score"]), use_container_width=True)
+                st.plotly_chart(model_figures["competitor_score"], use_container_width=True)
 
     # ----------------------------------------------------
     # TAB 3 — DESCRIPTION
     # ----------------------------------------------------
     with tab3:
-        summary_text = generate_summary(model, model_name)
-        st.markdown(summary_text)
+        st.markdown(model_figures["summary"])
+
+    # ----------------------------------------------------
+    # TAB 5 — TRENDS (run history aggregates, no reports reloaded)
+    # ----------------------------------------------------
+    with tab5:
+        history = get_run_history() if config.RUN_HISTORY_PATH else None
+        brands = history.brands() if history else []
+        if not brands:
+            st.info("No run history yet: trends appear once runs are recorded (config.RUN_HISTORY_PATH).")
+        else:
+            brand = st.selectbox("Brand", brands)
+            weeks = st.slider("Weeks of history", min_value=1, max_value=104, value=52)
+            since = time.time() - weeks * 7 * 24 * 3600
+
+            trend = history.brand_trend(brand, since)
+            st.plotly_chart(plot_brand_trend(trend), use_container_width=True)
+
+            col1, col2 = st.columns([1, 1])
+            with col1:
+                st.plotly_chart(plot_model_trend(history.model_trend(brand, since)), use_container_width=True)
+            with col2:
+                st.plotly_chart(plot_category_trend(history.category_trend(brand, since)), use_container_width=True)
+
+            st.caption(f"{len(trend)} runs since {pd.Timestamp(since, unit='s'):%Y-%m-%d}")
 
     with tab4:
         st.title("📘 Scoring Formulas Used in Dashboard")
@@ -0,0 +1,429 @@
+"""
+Local stand-in for every service the graph calls:
+
+  POST /v1/chat/completions   OpenAI chat completions (plain and stream=True)
+  POST /v1/messages           Anthropic messages
+  GET  /lite/?q=...           DuckDuckGo Lite result page
+  GET  /page/<id>             result pages the search links to
+  GET  /site/...              the brand website the scraper crawls
+  GET  /__stats               request / status / token counters (JSON)
+
+Answers are deterministic per prompt and shaped like the real ones each node
+expects (industry, competitor list, site profile, query lists, search
+answers, parser JSON), so the whole graph runs against it. Latency, error
+rate, 429 rate and an in-flight ceiling are configurable.
+
+    python -m benchmarks.mock_server --port 8765 --latency-ms 300 --rate-429 0.02
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+BRAND = "Acme"
+COMPETITORS = [
+    "Northwind", "Contoso", "Globex", "Initech", "Umbrella", "Stark",
+    "Wayne", "Wonka", "Hooli", "Vandelay", "Soylent", "Tyrell",
+]
+INDUSTRY = "Running shoes"
+QUERY_WORDS = (
+    ["best", "cheap", "top rated", "lightweight", "durable", "waterproof", "comfortable", "premium",
+     "affordable", "wide fit", "cushioned", "eco friendly"],
+    ["running shoes", "trail shoes", "marathon trainers", "walking shoes", "gym sneakers", "racing flats",
+     "recovery sandals", "hiking boots", "tennis shoes", "sprint spikes", "track shoes", "daily trainers"],
+    ["for flat feet", "for beginners", "under $100", "for women", "for men", "for winter", "for wide feet",
+     "for knee pain", "for long runs", "for kids", "for seniors", "near me"],
+)
+
+
+class MockSettings:
+    def __init__(self, latency_ms: float = 200, jitter_ms: float = 50, search_latency_ms: float = 80,
+                 page_latency_ms: float = 40, error_rate: float = 0.0, rate_429: float = 0.0,
+                 retry_after: float = 1.0, max_inflight: int = 0, brand: str = BRAND, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.search_latency_ms = search_latency_ms
+        self.page_latency_ms = page_latency_ms
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.max_inflight = max_inflight          # LLM calls beyond this get 429 (0 = no ceiling)
+        self.brand = brand
+        self.seed = seed
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class MockStats:
+    def __init__(self):
+        self.requests = Counter()
+        self.statuses = Counter()
+        self.tokens = Counter()
+        self.inflight = 0
+        self.peak_inflight = 0
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "statuses": {str(k): v for k, v in self.statuses.items()},
+                "tokens": dict(self.tokens),
+                "peak_inflight": self.peak_inflight,
+            }
+
+
+def approx_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def stable_rng(*parts: str) -> random.Random:
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+# -------------------------------------------------------------
+# Answers, by which node's prompt this is
+# -------------------------------------------------------------
+def search_answer(query: str, model: str, brand: str) -> str:
+    rng = stable_rng(query, model)
+    names = rng.sample(COMPETITORS, 5)
+    if rng.random() < 0.5:
+        names.insert(rng.randrange(len(names) + 1), brand)
+
+    lines = [f"Here are some of the best options for {query}:", ""]
+    for i, name in enumerate(names, start=1):
+        product = f"{name} {rng.choice(['Glide', 'Pulse', 'Nova', 'Trail', 'Aero'])} {rng.randint(2, 9)}"
+        lines.append(f"{i}. **{name}** – the {product} is a popular pick for comfort and value.")
+    lines += ["", "Pick based on your budget, fit and how often you run."]
+    return "\n".join(lines)
+
+
+def parse_answer(raw_text: str, brand: str) -> Dict[str, Any]:
+    competitors, rank = {}, None
+    for i, name in enumerate(re.findall(r"\*\*([^*]+)\*\*", raw_text), start=1):
+        if name.lower() == brand.lower():
+            rank = i
+        else:
+            competitors[name] = None
+    return {"brand_mentioned": brand.lower() in raw_text.lower(), "rank": rank, "competitors": competitors}
+
+
+_query_counter = 0
+_query_counter_lock = threading.Lock()
+
+
+def generated_queries(n: int) -> List[str]:
+    # Every call returns new combinations, so quotas of any size can be met
+    global _query_counter
+    with _query_counter_lock:
+        start = _query_counter
+        _query_counter += n
+
+    adjectives, products, suffixes = QUERY_WORDS
+    out = []
+    for i in range(start, start + n):
+        a, p, s = i % 12, (i // 12) % 12, (i // 144) % 12
+        extra = f" {2025 + i // 1728}" if i >= 1728 else ""
+        out.append(f"{adjectives[a]} {products[p]} {suffixes[s]}{extra}")
+    return out
+
+
+def chat_answer(body: Dict[str, Any], brand: str) -> str:
+    messages = body.get("messages") or []
+    prompt = "\n".join(m.get("content") or "" for m in messages if isinstance(m.get("content"), str))
+
+    if (body.get("response_format") or {}).get("type") == "json_schema":
+        return json.dumps({
+            "industry": INDUSTRY,
+            "competitors": COMPETITORS[:6],
+            "product_lines": ["Road running", "Trail running", "Walking"],
+        })
+
+    if "industry classifier" in prompt:
+        return INDUSTRY
+
+    if "COMPETITOR DISCOVERY ENGINE" in prompt:
+        return json.dumps(COMPETITORS[:8])
+
+    if "SEARCH QUERY GENERATOR" in prompt:
+        match = re.search(r"Generate exactly (\d+) queries", prompt)
+        return json.dumps(generated_queries(int(match.group(1)) if match else 10))
+
+    if "STRICT JSON parser" in prompt:
+        parser_brand = (re.search(r'BRAND: "([^"]*)"', prompt) or [None, brand])[1]
+        items = re.findall(r'ITEM id="([^"]+)".*?RAW_RESPONSE:\s*"""(.*?)"""', prompt, re.S)
+        if items:
+            return json.dumps([{"id": item_id, **parse_answer(text, parser_brand)} for item_id, text in items])
+        raw = re.search(r'RAW_RESPONSE:\s*"""(.*?)"""', prompt, re.S)
+        return json.dumps(parse_answer(raw.group(1) if raw else "", parser_brand))
+
+    question = re.search(r"USER QUESTION:\s*(.+)", prompt)
+    return search_answer(question.group(1).strip() if question else prompt[-200:], body.get("model", ""), brand)
+
+
+# -------------------------------------------------------------
+# HTML
+# -------------------------------------------------------------
+def search_page(base: str, query: str) -> str:
+    rng = stable_rng("search", query)
+    links = []
+    for _ in range(5):
+        # Pages come from a shared pool, so result URLs repeat across queries like real ones
+        page_id = f"p{rng.randrange(200)}"
+        title = f"{rng.choice(COMPETITORS)} review: {escape(query)}"
+        links.append(f'<tr><td><a class="result-link" href="{base}/page/{page_id}">{title}</a></td></tr>')
+    return f"<html><body><table>{''.join(links)}</table></body></html>"
+
+
+def result_page(page_id: str, brand: str) -> str:
+    rng = stable_rng("page", page_id)
+    names = rng.sample(COMPETITORS + [brand], 4)
+    paragraphs = "".join(
+        f"<p>{name} makes running shoes with good cushioning, fit and durability for everyday training.</p>"
+        for name in names
+    )
+    return f"<html><head><title>{page_id}</title></head><body><nav>Home</nav><article>{paragraphs * 3}</article></body></html>"
+
+
+def site_page(base: str, path: str, brand: str) -> str:
+    sections = ["products", "solutions", "catalog", "overview", "brands"]
+    nav = "".join(f'<a href="{base}/site/{s}">{s.title()}</a>' for s in sections)
+    body = "".join(
+        f"<p>{brand} designs {s} of running shoes: road trainers, trail shoes and race-day flats "
+        f"built for comfort. Compare {brand} with {', '.join(COMPETITORS[:3])}.</p>"
+        for s in sections
+    )
+    return f"<html><head><title>{brand} {path}</title></head><body><header>{nav}</header><main>{body * 4}</main></body></html>"
+
+
+# -------------------------------------------------------------
+# Server
+# -------------------------------------------------------------
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: str, content_type: str = "application/json",
+              headers: Optional[Dict[str, str]] = None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count_status(status)
+
+    def _sleep(self, ms: float):
+        s = self.server.settings
+        delay = max(0.0, ms + random.uniform(-s.jitter_ms, s.jitter_ms)) / 1000
+        if delay:
+            time.sleep(delay)
+
+    def _fault(self) -> Optional[Tuple[int, str, Dict[str, str]]]:
+        """429 / 500 to inject for this LLM call, if any."""
+        s = self.server.settings
+        stats = self.server.stats
+        if s.max_inflight and stats.inflight > s.max_inflight:
+            return 429, "too many concurrent requests", {"retry-after-ms": str(int(s.retry_after * 1000))}
+        roll = random.random()
+        if roll < s.rate_429:
+            return 429, "rate limit exceeded", {"retry-after": str(s.retry_after)}
+        if roll < s.rate_429 + s.error_rate:
+            return 500, "internal error", {}
+        return None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        base = f"http://{self.headers.get('Host')}"
+        settings = self.server.settings
+
+        if url.path == "/__stats":
+            return self._send(200, json.dumps(self.server.stats.snapshot()))
+
+        if url.path.startswith("/lite"):
+            self.server.count("search")
+            self._sleep(settings.search_latency_ms)
+            query = (parse_qs(url.query).get("q") or [""])[0]
+            return self._send(200, search_page(base, query), "text/html")
+
+        if url.path.startswith("/page/"):
+            self.server.count("page")
+            self._sleep(settings.page_latency_ms)
+            return self._send(200, result_page(url.path.rsplit("/", 1)[-1], settings.brand), "text/html")
+
+        if url.path.startswith("/site"):
+            self.server.count("site")
+            self._sleep(settings.page_latency_ms)
+            return self._send(200, site_page(base, url.path, settings.brand), "text/html")
+
+        self._send(404, json.dumps({"error": "not found"}))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if url.path.endswith("/chat/completions"):
+            kind = "openai"
+        elif url.path.endswith("/messages"):
+            kind = "anthropic"
+        else:
+            return self._send(404, json.dumps({"error": "not found"}))
+
+        stats = self.server.stats
+        with stats._lock:
+            stats.inflight += 1
+            stats.peak_inflight = max(stats.peak_inflight, stats.inflight)
+        try:
+            self.server.count(kind)
+            fault = self._fault()
+            if fault:
+                status, message, headers = fault
+                self._sleep(self.server.settings.latency_ms / 10)
+                return self._send(status, json.dumps({"error": {"message": message, "type": "mock"}}),
+                                  headers=headers)
+
+            self._sleep(self.server.settings.latency_ms)
+            text = chat_answer(body, self.server.settings.brand)
+            prompt_tokens = approx_tokens(json.dumps(body.get("messages") or []))
+            completion_tokens = approx_tokens(text)
+            self.server.count_tokens(kind, prompt_tokens, completion_tokens)
+
+            if kind == "anthropic":
+                return self._send(200, json.dumps(anthropic_message(body, text, prompt_tokens, completion_tokens)))
+            if body.get("stream"):
+                return self._send(200, openai_stream(body, text), "text/event-stream")
+            return self._send(200, json.dumps(openai_completion(body, text, prompt_tokens, completion_tokens)))
+        finally:
+            with stats._lock:
+                stats.inflight -= 1
+
+
+def openai_completion(body: Dict[str, Any], text: str, prompt_tokens: int, completion_tokens: int) -> Dict[str, Any]:
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def openai_stream(body: Dict[str, Any], text: str) -> str:
+    def event(delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+        chunk = {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    pieces = [text[i:i + 40] for i in range(0, len(text), 40)]
+    events = [event({"role": "assistant", "content": ""})]
+    events += [event({"content": piece}) for piece in pieces]
+    events.append(event({}, "stop"))
+    return "".join(events) + "data: [DONE]\n\n"
+
+
+def anthropic_message(body: Dict[str, Any], text: str, prompt_tokens: int, completion_tokens: int) -> Dict[str, Any]:
+    return {
+        "id": "msg_mock",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "mock"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": prompt_tokens, "output_tokens": completion_tokens},
+    }
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, settings: Optional[MockSettings] = None):
+        super().__init__(("127.0.0.1", port), MockHandler)
+        self.settings = settings or MockSettings()
+        self.stats = MockStats()
+        random.seed(self.settings.seed)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, endpoint: str):
+        with self.stats._lock:
+            self.stats.requests[endpoint] += 1
+
+    def count_status(self, status: int):
+        with self.stats._lock:
+            self.stats.statuses[status] += 1
+
+    def count_tokens(self, kind: str, prompt_tokens: int, completion_tokens: int):
+        with self.stats._lock:
+            self.stats.tokens[f"{kind}_input"] += prompt_tokens
+            self.stats.tokens[f"{kind}_output"] += completion_tokens
+
+    def start(self) -> "MockServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def settings_from_args(args: argparse.Namespace) -> MockSettings:
+    return MockSettings(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        search_latency_ms=args.search_latency_ms,
+        page_latency_ms=args.page_latency_ms,
+        error_rate=args.error_rate,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        max_inflight=args.max_inflight,
+        brand=args.brand,
+        seed=args.seed
+    )
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=200, help="LLM response latency")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--search-latency-ms", type=float, default=80)
+    parser.add_argument("--page-latency-ms", type=float, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of LLM calls answered with 500")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="share of LLM calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After sent with 429s (seconds)")
+    parser.add_argument("--max-inflight", type=int, default=0, help="concurrent LLM calls before 429s (0 = no limit)")
+    parser.add_argument("--brand", default=BRAND)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Mock OpenAI / Anthropic / DuckDuckGo server.")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    add_mock_arguments(arg_parser)
+    args = arg_parser.parse_args()
+
+    server = MockServer(args.port, settings_from_args(args))
+    print(f"Mock server on {server.base_url} (OPENAI_BASE_URL={server.base_url}/v1, "
+          f"ANTHROPIC_BASE_URL={server.base_url}, DDG_LITE_URL={server.base_url}/lite/)")
+    server.serve_forever()
@@ -0,0 +1,191 @@
+"""
+End-to-end throughput benchmark: runs the compiled LangGraph `app` against
+benchmarks/mock_server.py (no network, no API keys) at several query
+counts and writes one JSON file per invocation.
+
+    python -m benchmarks.run_benchmark --sizes 10 100 1000 --latency-ms 300
+
+With the default RATE_LIMITS large runs are paced by the tokens/min
+budgets, as they would be against the real APIs; --unlimited-budget lifts
+them to measure the pipeline alone.
+
+Every run reports per-node wall time, requests/sec by endpoint, token
+counts, peak Python heap (tracemalloc) and the process max RSS. Caches,
+checkpoints, the query store and the run history are off so each run
+does the full work; compare the JSON files of two versions to spot
+regressions.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import config
+from benchmarks.mock_server import MockServer, add_mock_arguments, settings_from_args
+
+
+def configure(base_url: str, args: argparse.Namespace):
+    """Point every service at the mock server and turn off state kept between runs."""
+    config.OPEN_AI_API_KEY = config.OPEN_AI_API_KEY or "mock-key"
+    config.CLAUDE_API_KEY = config.CLAUDE_API_KEY or "mock-key"
+    config.OPENAI_BASE_URL = f"{base_url}/v1"
+    config.ANTHROPIC_BASE_URL = base_url
+    config.DDG_LITE_URL = f"{base_url}/lite/"
+
+    config.LLM_CACHE_MODE = "off"
+    config.WEB_CACHE_PERSISTENT = False
+    config.CHECKPOINT_PATH = None
+    config.QUERY_STORE_PATH = None
+    config.RUN_HISTORY_PATH = None
+    config.QUERY_SET_MODE = "generate"
+    config.PIPELINE_STREAMING = args.streaming
+    if args.models:
+        config.FIRE_QUERY_MODELS = args.models
+    if args.unlimited_budget:
+        # Measure the pipeline, not the configured provider quotas
+        for limits in config.RATE_LIMITS.values():
+            limits["rpm"] = limits["tpm"] = 10 ** 9
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def stats_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    return {
+        group: {k: v - before[group].get(k, 0) for k, v in after[group].items() if v - before[group].get(k, 0)}
+        for group in ("requests", "statuses", "tokens")
+    }
+
+
+def run_once(app, server: MockServer, num_queries: int, output_dir: str) -> Dict[str, Any]:
+    from models.state import VisibilityState
+
+    state = VisibilityState(
+        brand_name=server.settings.brand,
+        website_url=f"{server.base_url}/site/",
+        num_queries=num_queries,
+        region="United States",
+        report_path=os.path.join(output_dir, f"report_{num_queries}.json")
+    )
+
+    before = server.stats.snapshot()
+    tracemalloc.reset_peak()
+    node_seconds: Dict[str, float] = {}
+    final: Dict[str, Any] = {}
+
+    start = last = time.perf_counter()
+    # The graph is a chain, so each update closes the node that produced it
+    for update in app.stream(state, stream_mode="updates"):
+        now = time.perf_counter()
+        for node, values in update.items():
+            node_seconds[node] = round(node_seconds.get(node, 0.0) + now - last, 3)
+            final.update(values or {})
+        last = now
+    wall = time.perf_counter() - start
+
+    _, peak_heap = tracemalloc.get_traced_memory()
+    delta = stats_delta(before, server.stats.snapshot())
+    total_requests = sum(delta["requests"].values())
+    queries = final.get("generated_queries") or []
+
+    return {
+        "num_queries": num_queries,
+        "queries_answered": sum(1 for q in queries if q.get("raw_response")),
+        "failed_model_calls": sum(len(q.get("errors") or {}) for q in queries),
+        "rows": len(final.get("flattened_rows") or []),
+        "wall_seconds": round(wall, 3),
+        "node_seconds": node_seconds,
+        "requests": delta["requests"],
+        "statuses": delta["statuses"],
+        "requests_per_second": round(total_requests / wall, 2) if wall else 0,
+        "requests_per_second_by_endpoint": {k: round(v / wall, 2) for k, v in delta["requests"].items()},
+        "tokens": delta["tokens"],
+        "peak_heap_mb": round(peak_heap / 2 ** 20, 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+    }
+
+
+def main(argv: List[str] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Benchmark the visibility graph against the mock server.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--models", nargs="+", default=None, help="provider:model keys (default FIRE_QUERY_MODELS)")
+    parser.add_argument("--streaming", action="store_true", help="use the answer_pipeline node")
+    parser.add_argument("--unlimited-budget", action="store_true",
+                        help="lift the requests/min and tokens/min budgets in RATE_LIMITS")
+    parser.add_argument("--output", default=None, help="JSON file (default benchmarks/results/<time>-<rev>.json)")
+    add_mock_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockServer(0, settings_from_args(args)).start()
+    configure(server.base_url, args)
+
+    # The graph is assembled from config at import time, so import after configure()
+    from langgraph_agent.agent import NODE_SEQUENCE, app
+    from llm_utils.rate_limiter import limiter_summary
+
+    revision = git_revision()
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{revision}.json"
+    )
+
+    tracemalloc.start()
+    runs = []
+    with tempfile.TemporaryDirectory() as report_dir:
+        for size in args.sizes:
+            print(f"benchmark: {size} queries ...", flush=True)
+            run = run_once(app, server, size, report_dir)
+            runs.append(run)
+            print(
+                f"  {run['wall_seconds']}s, {run['requests_per_second']} req/s, "
+                f"{run['queries_answered']}/{size} answered, peak heap {run['peak_heap_mb']} MB",
+                flush=True
+            )
+    tracemalloc.stop()
+
+    result = {
+        "revision": revision,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "nodes": NODE_SEQUENCE,
+        "mock": server.settings.as_dict(),
+        "config": {
+            "fire_query_models": config.FIRE_QUERY_MODELS,
+            "fire_queries_concurrency": config.FIRE_QUERIES_CONCURRENCY,
+            "rate_limits": config.RATE_LIMITS,
+            "pipeline_streaming": config.PIPELINE_STREAMING,
+            "parser_batch_size": config.PARSER_BATCH_SIZE,
+        },
+        "limiter": limiter_summary(),
+        "peak_inflight_llm_calls": server.stats.snapshot()["peak_inflight"],
+        "runs": runs,
+    }
+
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"benchmark: results written to {output}")
+
+    server.shutdown()
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,186 @@
 OPEN_AI_API_KEY=""
-CLAUDE_API_KEY=""
\ No newline at end of file
+CLAUDE_API_KEY=""
+
+# Concurrency limits for the fire_queries fan-out engine.
+# "queries" bounds how many queries are in flight at once and "search"/"fetch"
+# bound the web stages. LLM calls are paced by RATE_LIMITS only.
+FIRE_QUERIES_CONCURRENCY = {
+    "queries": 16,
+    "search": 4,
+    "fetch": 16,
+}
+
+# On-disk LLM completion cache.
+# "read_write" records every completion, "replay" only reads recorded ones
+# (a miss is an error, never a network call) and "off" disables caching.
+LLM_CACHE_MODE = "read_write"
+LLM_CACHE_PATH = ".cache/llm_completions.sqlite"
+LLM_CACHE_TTL_SECONDS = 30 * 24 * 3600
+LLM_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Search-result / page-snippet cache used by fire_queries.
+# Pages older than the TTL are revalidated with ETag / Last-Modified.
+# LLM_CACHE_MODE = "replay" also makes this cache offline-only.
+WEB_CACHE_PERSISTENT = True
+WEB_CACHE_PATH = ".cache/web.sqlite"
+WEB_CACHE_TTL_SECONDS = 24 * 3600
+WEB_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Number of (query, model) responses the parser packs into one LLM call.
+# 1 sends every response on its own, as before.
+PARSER_BATCH_SIZE = 8
+
+# Rule-based pre-parser: responses parsed locally with at least this
+# confidence skip the LLM parser (set above 1 to send everything to the LLM).
+# A hash-sampled fraction of them is still sent to the LLM to track agreement.
+RULE_PARSER_MIN_CONFIDENCE = 0.9
+RULE_PARSER_AUDIT_RATE = 0.05
+
+# Shared keep-alive HTTP session
+HTTP_POOL_CONNECTIONS = 16
+HTTP_POOL_MAXSIZE = 32
+
+# web_scraper crawl budget (the main page counts towards SCRAPER_MAX_PAGES)
+SCRAPER_MAX_PAGES = 6
+SCRAPER_MAX_DEPTH = 1
+SCRAPER_PER_HOST_CONCURRENCY = 4
+SCRAPER_DEADLINE_SECONDS = 20
+
+# content_condenser: website text passed to industry_detector and
+# competitor_extractor is cut to about this many tokens (boilerplate
+# deduplicated first, then the most keyword-dense passages kept).
+CONDENSED_CONTENT_TOKEN_BUDGET = 3000
+
+# One structured site_profiler call (industry + competitors + product lines)
+# instead of the separate industry_detector and competitor_extractor calls.
+USE_SITE_PROFILE = False
+
+# query_generator: categories generated in parallel; a category whose
+# output is not a JSON list of strings is retried this many times.
+QUERY_GEN_CONCURRENCY = 5
+QUERY_GEN_RETRIES = 2
+
+# Large runs are generated QUERY_GEN_CHUNK_SIZE queries per call (fits in
+# the 800-token reply), each chunk told the last QUERY_GEN_AVOID_LIMIT
+# queries of its category. Queries whose word sets overlap at least
+# QUERY_DEDUP_THRESHOLD (Jaccard) with an earlier one are dropped.
+QUERY_GEN_CHUNK_SIZE = 25
+QUERY_GEN_AVOID_LIMIT = 40
+QUERY_DEDUP_THRESHOLD = 0.8
+
+# Query sets are stored per (brand, region, industry) after every run.
+#   "generate":    new queries every run (the stored set is replaced)
+#   "reuse":       fire the stored set again (topped up if num_queries grew)
+#   "incremental": like reuse, but queries answered within
+#                  QUERY_SET_FRESHNESS_DAYS keep their stored results
+# QUERY_STORE_PATH = None turns the store off.
+QUERY_SET_MODE = "generate"
+QUERY_STORE_PATH = ".cache/query_sets.sqlite"
+QUERY_SET_FRESHNESS_DAYS = 7
+
+# Durable runs: graph state is checkpointed after every node (per thread_id)
+# and fire_queries / parser record per-query progress, so a resumed run
+# skips finished work. CHECKPOINT_PATH = None disables both.
+CHECKPOINT_PATH = ".cache/checkpoints.sqlite"
+PROGRESS_PATH = ".cache/progress.sqlite"
+
+# Stream each query through parsing and flattening as soon as its answers
+# arrive (one answer_pipeline node instead of fire_queries -> parser ->
+# flatten_queries). Producers block once PIPELINE_QUEUE_SIZE answered
+# queries wait for the parser; a partial parser batch is sent after
+# PIPELINE_FLUSH_SECONDS without new answers.
+PIPELINE_STREAMING = False
+PIPELINE_QUEUE_SIZE = 32
+PIPELINE_FLUSH_SECONDS = 2.0
+
+# Batch runs (langgraph_agent/batch.py): jobs run on threads and share
+# caches; brands with the same industry/region share the generic queries.
+# GLOBAL_CONCURRENCY caps searches / page fetches across all concurrent
+# runs (LLM calls are capped by RATE_LIMITS below).
+BATCH_MAX_WORKERS = 3
+BATCH_OUTPUT_DIR = "output/batch"
+SHARED_QUERY_CATEGORIES = ("best_of", "budget")
+GLOBAL_CONCURRENCY = {"search": 4, "fetch": 16}
+
+# Every LLM call goes through one limiter per provider (process-wide):
+# requests/min and tokens/min budgets, and a concurrency limit that starts
+# at initial_concurrency, grows by one per window of successes and halves
+# on 429s (between min_ and max_concurrency). Throttled / transient errors
+# are retried LLM_MAX_RETRIES times with jittered exponential backoff, or
+# after the server's Retry-After; calls that still fail are recorded as
+# errors, never as answer text.
+RATE_LIMITS = {
+    "openai": {"rpm": 5000, "tpm": 800000, "initial_concurrency": 8, "min_concurrency": 1, "max_concurrency": 32},
+    "claude": {"rpm": 1000, "tpm": 400000, "initial_concurrency": 4, "min_concurrency": 1, "max_concurrency": 16},
+    "default": {"rpm": 500, "tpm": 100000, "initial_concurrency": 4, "min_concurrency": 1, "max_concurrency": 8},
+}
+LLM_MAX_RETRIES = 5
+LLM_BACKOFF_BASE_SECONDS = 1.0
+LLM_BACKOFF_MAX_SECONDS = 60.0
+
+# Models every query is fanned out to ("provider:model"); a run can pick
+# its own list with VisibilityState.models. MODEL_CATALOG gives each model
+# its capabilities and USD cost per 1M input / output tokens; models not
+# listed get "chat" only and no cost. The "stub" provider answers locally
+# (after STUB_MODEL_LATENCY_SECONDS) for offline runs.
+FIRE_QUERY_MODELS = ["openai:gpt-4o", "claude:claude-haiku-4-5-20251001"]
+MODEL_CATALOG = {
+    "openai:gpt-4o": {"capabilities": ["chat", "json"], "input_cost": 2.50, "output_cost": 10.00},
+    "openai:gpt-4o-mini": {"capabilities": ["chat", "json"], "input_cost": 0.15, "output_cost": 0.60},
+    "claude:claude-haiku-4-5-20251001": {"capabilities": ["chat"], "input_cost": 1.00, "output_cost": 5.00},
+    "stub:echo": {"capabilities": ["chat"], "input_cost": 0.0, "output_cost": 0.0},
+}
+STUB_MODEL_LATENCY_SECONDS = 0.0
+
+# Service endpoints (None = the SDK default). benchmarks/run_benchmark.py
+# points all three at benchmarks/mock_server.py.
+OPENAI_BASE_URL = None
+ANTHROPIC_BASE_URL = None
+DDG_LITE_URL = "https://lite.duckduckgo.com/lite/"
+
+# Tracing: graph nodes and every search, page fetch, LLM call and parse are
+# recorded as spans (latency, bytes, tokens, cache hits, retries). Spans are
+# appended to TRACE_PATH (JSONL, None = not written) and, when
+# TRACE_OTLP_ENDPOINT is set, also sent to an OTLP/HTTP collector. The last
+# node prints a time / cost table per stage; `python -m tracing.summary`
+# prints it again from the JSONL file.
+TRACING = True
+TRACE_PATH = ".cache/traces.jsonl"
+TRACE_OTLP_ENDPOINT = None
+TRACE_SERVICE_NAME = "ai-visibility-score"
+
+# Dashboard scoring (streamlit_utils/scoring.py): "columnar" scores all
+# models in one pass of groupby / NumPy aggregates; "rows" runs the
+# per-model ModelScoringEngine loops. Both return the same result dict.
+SCORING_BACKEND = "columnar"
+
+# Report written by flatten_queries: "parquet" (columnar, needs pyarrow;
+# model_name / category dictionary-encoded, raw_response only read when
+# the dashboard asks for it) or "json" (records, indented when
+# REPORT_JSON_PRETTY). The extension of VisibilityState.report_path is
+# replaced to match.
+REPORT_FORMAT = "parquet"
+REPORT_JSON_PRETTY = True
+REPORT_ROW_GROUP_SIZE = 50_000
+
+# Every finished run appends its per (model, category) aggregates to the
+# run history (storage/run_history.py) for the dashboard's trend charts.
+# RUN_HISTORY_PATH = None turns it off.
+RUN_HISTORY_PATH = "output/run_history.sqlite"
+
+# Dashboard: report versions (path, mtime, size) whose rows, scores and
+# charts are kept in Streamlit's cache (least recently used dropped first).
+DASHBOARD_CACHE_ENTRIES = 4
+
+# Background jobs (langgraph_agent/jobs.py): the dashboard queues runs in
+# JOB_STORE_PATH and JOB_WORKERS spawned processes run them (0 = only
+# workers started with `python -m langgraph_agent.jobs work`). Each job
+# writes its report under JOB_OUTPUT_DIR/<job_id>/. Workers heartbeat
+# every JOB_HEARTBEAT_SECONDS; a running job without one for
+# JOB_STALE_SECONDS is requeued and resumes from its checkpoint.
+JOB_STORE_PATH = ".cache/jobs.sqlite"
+JOB_WORKERS = 2
+JOB_OUTPUT_DIR = "output/jobs"
+JOB_POLL_SECONDS = 1.0
+JOB_HEARTBEAT_SECONDS = 10.0
+JOB_STALE_SECONDS = 120.0
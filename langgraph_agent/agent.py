@@ -1,38 +1,102 @@
+import os
+import sqlite3
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
 from langgraph.graph import StateGraph, END
 
+import config
+
+from nodes.answer_pipeline import answer_pipeline
 from nodes.competitor_discovery import competitor_extractor
+from nodes.content_condenser import content_condenser
 from nodes.fire_queries_openai import llm_query_executor
 from nodes.flatten_queries import flatten_all_queries
 from nodes.generate_queries import query_generator
 from nodes.industry_detector import industry_detector
 from models.state import VisibilityState
 from nodes.parser import response_parser
+from nodes.query_set import query_set_loader
+from nodes.site_profiler import site_profiler
 from nodes.web_scraper import web_scraper
+from tracing.tracer import traced_node
+
+# Node order; USE_SITE_PROFILE swaps the two classification calls for one
+if config.USE_SITE_PROFILE:
+    PROFILE_NODES = [("site_profiler", site_profiler)]
+else:
+    PROFILE_NODES = [("industry_detector", industry_detector), ("competitor_extractor", competitor_extractor)]
+
+# "reuse" / "incremental" load the stored query set instead of generating one
+QUERY_NODE = query_generator if config.QUERY_SET_MODE == "generate" else query_set_loader
+
+# PIPELINE_STREAMING fuses fire -> parse -> flatten into one queue-driven node
+if config.PIPELINE_STREAMING:
+    ANSWER_NODES = [("answer_pipeline", answer_pipeline)]
+else:
+    ANSWER_NODES = [
+        ("fire_queries", llm_query_executor),
+        ("parser", response_parser),
+        ("flatten_queries", flatten_all_queries),
+    ]
+
+PIPELINE = [
+    ("web_scraper", web_scraper),
+    ("content_condenser", content_condenser),
+    *PROFILE_NODES,
+    ("query_generator", QUERY_NODE),
+    *ANSWER_NODES,
+]
+NODE_SEQUENCE = [name for name, _ in PIPELINE]
 
 graph = StateGraph(VisibilityState)
 
-graph.add_node("web_scraper", web_scraper)
-graph.add_node("industry_detector", industry_detector)
-graph.add_node("competitor_extractor", competitor_extractor)
-graph.add_node("query_generator", query_generator)
-graph.add_node("fire_queries", llm_query_executor)
-graph.add_node("parser", response_parser)
-graph.add_node("flatten_queries", flatten_all_queries)
-
-graph.set_entry_point("web_scraper")
-graph.add_edge("web_scraper", "industry_detector")
-graph.add_edge("industry_detector", "competitor_extractor")
-graph.add_edge("competitor_extractor", "query_generator")
-graph.add_edge("query_generator", "fire_queries")
-graph.add_edge("fire_queries", "parser")
-graph.add_edge("parser", "flatten_queries")
-graph.add_edge("flatten_queries", END)
-
-app = graph.compile()
+# Every node runs in a trace span; the last one prints the stage summary
+for i, (name, node) in enumerate(PIPELINE):
+    graph.add_node(name, traced_node(name, node, first=i == 0, last=i == len(PIPELINE) - 1))
+
+graph.set_entry_point(NODE_SEQUENCE[0])
+for current, following in zip(NODE_SEQUENCE, NODE_SEQUENCE[1:]):
+    graph.add_edge(current, following)
+graph.add_edge(NODE_SEQUENCE[-1], END)
+
+
+def build_checkpointer():
+    """
+    SQLite checkpointer: state is saved after every node, so a run resumed
+    with the same thread_id continues at the node that failed.
+    Pickle fallback covers the pandas DataFrame in flattened_df.
+    """
+    if not config.CHECKPOINT_PATH:
+        return None
+
+    directory = os.path.dirname(config.CHECKPOINT_PATH)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(config.CHECKPOINT_PATH, check_same_thread=False)
+    return SqliteSaver(conn, serde=JsonPlusSerializer(pickle_fallback=True))
+
+
+app = graph.compile(checkpointer=build_checkpointer())
+
+
+def run_config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def can_resume(thread_id: str) -> bool:
+    """True when thread_id has a checkpoint with nodes still to run."""
+    if not config.CHECKPOINT_PATH or not thread_id:
+        return False
+    snapshot = app.get_state(run_config(thread_id))
+    return bool(snapshot.values) and bool(snapshot.next)
 
 # for chunk in app.stream(VisibilityState(brand_name="Noise",
 #                                         website_url="https://www.gonoise.com/collections/smart-watches",
-#                                         num_queries=10, region="India")):
+#                                         num_queries=10, region="India"),
+#                         run_config("noise-weekly")):
 #     print(chunk)
+# Resume after a failure: app.stream(None, run_config("noise-weekly"))
 
 
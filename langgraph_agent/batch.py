@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from langgraph_agent.agent import app, run_config
+from models.state import VisibilityState
+from nodes.generate_queries import shared_query_pool
+from web_utils.web_cache import shared_run_cache
+
+
+def report_path_for(batch_id: str, brand: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", brand.lower()).strip("-") or "brand"
+    return os.path.join(config.BATCH_OUTPUT_DIR, batch_id, slug, "visibility_report.json")
+
+
+def run_job(batch_id: str, index: int, brand: str, url: str, region: str, num_queries: int) -> Dict[str, Any]:
+    state = VisibilityState(
+        brand_name=brand,
+        website_url=url,
+        num_queries=num_queries,
+        region=region,
+        report_path=report_path_for(batch_id, brand)
+    )
+    # One checkpoint thread per job, so a failed job can be resumed on its own
+    return app.invoke(state, run_config(f"{batch_id}:{index}"))
+
+
+def run_batch(jobs: List[Tuple[str, str, str]], num_queries: int,
+              max_workers: Optional[int] = None, batch_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Run the graph for several (brand, url, region) jobs at once.
+
+    Jobs run on a thread pool (BATCH_MAX_WORKERS) in one process, so they share:
+    - one web-cache run scope: each search / page is fetched once for the batch
+    - the completion cache with single flight: identical LLM calls are made once
+    - a query pool for SHARED_QUERY_CATEGORIES: brands with the same industry
+      and region get the same generic queries (answered once, parsed per brand)
+    - process-wide provider limits (RATE_LIMITS, GLOBAL_CONCURRENCY)
+
+    Returns the final state of each job, in job order. A failed job returns
+    {"error": ...} and does not stop the others.
+    """
+    batch_id = batch_id or uuid.uuid4().hex[:12]
+    workers = max(1, min(max_workers or config.BATCH_MAX_WORKERS, len(jobs) or 1))
+
+    with shared_run_cache() as web_cache, shared_query_pool(config.SHARED_QUERY_CATEGORIES):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(run_job, batch_id, i, brand, url, region, num_queries)
+                for i, (brand, url, region) in enumerate(jobs)
+            ]
+
+            results = []
+            for (brand, _, _), future in zip(jobs, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"batch {batch_id}: job '{brand}' failed: {e}")
+                    results.append({"error": str(e)})
+
+        print(f"batch {batch_id}: {web_cache.summary()}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the visibility pipeline for several brands.")
+    parser.add_argument("jobs", help='JSON file: [{"brand": ..., "url": ..., "region": ...}, ...]')
+    parser.add_argument("--num-queries", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.jobs, encoding="utf-8") as f:
+        job_list = [(j["brand"], j["url"], j.get("region") or "Global") for j in json.load(f)]
+
+    for (brand, _, _), result in zip(job_list, run_batch(job_list, args.num_queries, args.workers)):
+        if "error" in result:
+            print(f"{brand}: FAILED ({result['error']})")
+        else:
+            print(f"{brand}: {len(result.get('flattened_rows') or [])} rows -> {result.get('report_path')}")
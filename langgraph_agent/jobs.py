@@ -0,0 +1,224 @@
+"""
+Background jobs: the dashboard (or the CLI) queues runs in the job store
+and worker processes run the compiled graph, writing node progress and
+partial results as events. Runs survive browser refreshes, several brands
+run at once, and the Streamlit session only polls.
+
+    python -m langgraph_agent.jobs work --workers 4
+    python -m langgraph_agent.jobs submit "Noise" https://www.gonoise.com India --num-queries 20
+    python -m langgraph_agent.jobs status <job_id>
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import config
+from storage.job_store import get_job_store
+
+
+def submit_job(brand_name: str, website_url: str, region: str, num_queries: int, **fields) -> str:
+    """Queues a run (extra VisibilityState fields as keywords) and returns its job id."""
+    params = {
+        "brand_name": brand_name,
+        "website_url": website_url,
+        "region": region,
+        "num_queries": int(num_queries),
+        **fields,
+    }
+    return get_job_store().submit(params)
+
+
+class _Heartbeat(threading.Thread):
+    """Keeps the job alive while a long node runs and notices cancel requests."""
+
+    def __init__(self, job_id: str):
+        super().__init__(daemon=True)
+        self.job_id = job_id
+        self.cancel_requested = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(config.JOB_HEARTBEAT_SECONDS):
+            if not get_job_store().heartbeat(self.job_id):
+                self.cancel_requested = True
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def run_job(job: Dict[str, Any]):
+    """Runs one claimed job to completion, recording progress and the outcome in the job store."""
+    from langgraph_agent.agent import NODE_SEQUENCE, app, can_resume, run_config
+    from models.state import VisibilityState
+
+    store = get_job_store()
+    job_id = job["job_id"]
+
+    # Retried / requeued jobs continue from their checkpoint (job id = thread_id)
+    resumed = can_resume(job_id)
+    graph_input = None if resumed else VisibilityState(**job["params"], report_path=job["report_path"])
+    if resumed:
+        store.add_event(job_id, "resumed", None)
+
+    heartbeat = _Heartbeat(job_id)
+    heartbeat.start()
+    final: Dict[str, Any] = {}
+    rows = mentioned = 0
+    try:
+        for mode, chunk in app.stream(graph_input, run_config(job_id), stream_mode=["updates", "custom"]):
+            if mode == "custom":
+                # Partial rows from answer_pipeline: only counts go to the store
+                rows += len(chunk.get("rows", []))
+                mentioned += sum(1 for r in chunk.get("rows", []) if r.get("brand_mentioned"))
+                store.add_event(job_id, "partial", {
+                    "completed": chunk.get("completed", 0), "total": chunk.get("total", 0),
+                    "rows": rows, "mentioned": mentioned
+                })
+            else:
+                for node, values in chunk.items():
+                    final.update(values or {})
+                    if node in NODE_SEQUENCE:
+                        store.node_done(job_id, node, NODE_SEQUENCE.index(node) + 1, len(NODE_SEQUENCE))
+
+            if heartbeat.cancel_requested:
+                store.finish(job_id, "cancelled")
+                return
+    except Exception as e:
+        store.finish(job_id, "failed", error=f"{type(e).__name__}: {e}"[:1000])
+        raise
+    finally:
+        heartbeat.stop()
+
+    flattened = final.get("flattened_rows") or []
+    store.finish(job_id, "done", report_path=final.get("report_path"), data={
+        "rows": len(flattened),
+        "mentioned": sum(1 for r in flattened if r.get("brand_mentioned")),
+    })
+
+
+def share_rate_limits(workers: int):
+    """
+    RATE_LIMITS are enforced per process: give each of `workers` processes
+    an equal share so together they stay within the provider budgets.
+    """
+    if workers <= 1:
+        return
+    for limits in config.RATE_LIMITS.values():
+        for key in ("rpm", "tpm"):
+            limits[key] = max(1, limits[key] // workers)
+        limits["max_concurrency"] = max(limits["min_concurrency"], limits["max_concurrency"] // workers)
+        limits["initial_concurrency"] = min(limits["initial_concurrency"], limits["max_concurrency"])
+
+
+def worker_loop(worker_id: Optional[str] = None, workers: int = 1, once: bool = False):
+    """
+    Claims and runs queued jobs until stopped (once: until the queue is
+    empty). Jobs of workers that died are requeued by the others.
+    """
+    share_rate_limits(workers)
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    store = get_job_store()
+    print(f"job worker {worker_id}: waiting for jobs ({config.JOB_STORE_PATH})")
+
+    while True:
+        requeued = store.requeue_stale(config.JOB_STALE_SECONDS)
+        if requeued:
+            print(f"job worker {worker_id}: requeued {requeued} job(s) of stopped workers")
+
+        job = store.claim(worker_id)
+        if job is None:
+            if once:
+                return
+            time.sleep(config.JOB_POLL_SECONDS)
+            continue
+
+        print(f"job worker {worker_id}: running {job['job_id']} ({job['brand']})")
+        try:
+            run_job(job)
+        except Exception as e:
+            # Already recorded as failed; the worker moves on to the next job
+            print(f"job worker {worker_id}: job {job['job_id']} failed: {e}")
+
+
+def _spawn(index: int, count: int, daemon: bool) -> multiprocessing.Process:
+    process = multiprocessing.get_context("spawn").Process(
+        target=worker_loop, kwargs={"workers": count}, name=f"visibility-job-worker-{index}", daemon=daemon
+    )
+    process.start()
+    return process
+
+
+def start_workers(count: Optional[int] = None, daemon: bool = True) -> List[multiprocessing.Process]:
+    """
+    count worker processes (default JOB_WORKERS). Spawned, not forked: each
+    builds its own graph, clients and SQLite connections. Daemon workers
+    stop with the process that started them.
+    """
+    count = config.JOB_WORKERS if count is None else count
+    return [_spawn(i, count, daemon) for i in range(count)]
+
+
+def ensure_workers(processes: List[multiprocessing.Process]):
+    """Restarts, in place, workers from start_workers() that have exited."""
+    for i, process in enumerate(processes):
+        if not process.is_alive():
+            print(f"job worker {process.name} exited ({process.exitcode}); restarting")
+            processes[i] = _spawn(i, len(processes), process.daemon)
+
+
+def describe(job: Dict[str, Any]) -> str:
+    progress = f"{job['nodes_done']}/{job['nodes_total'] or '?'} nodes"
+    line = f"{job['job_id']}  {job['status']:<10} {job['brand']:<20} {progress}"
+    if job.get("current_node"):
+        line += f" (last: {job['current_node']})"
+    if job.get("error"):
+        line += f"  error: {job['error']}"
+    elif job["status"] == "done":
+        line += f"  -> {job['report_path']}"
+    return line
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Queue visibility runs and run them in worker processes.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    work = commands.add_parser("work", help="run worker processes until interrupted")
+    work.add_argument("--workers", type=int, default=None, help="default config.JOB_WORKERS")
+
+    submit = commands.add_parser("submit", help="queue a run")
+    submit.add_argument("brand")
+    submit.add_argument("url")
+    submit.add_argument("region", nargs="?", default="Global")
+    submit.add_argument("--num-queries", type=int, default=20)
+
+    status = commands.add_parser("status", help="show jobs (default: the 20 most recent)")
+    status.add_argument("job_id", nargs="?", default=None)
+
+    for name in ("cancel", "retry"):
+        commands.add_parser(name, help=f"{name} a job").add_argument("job_id")
+
+    args = parser.parse_args()
+    store = get_job_store()
+
+    if args.command == "work":
+        count = args.workers or config.JOB_WORKERS
+        if count <= 1:
+            worker_loop()
+        else:
+            for process in start_workers(count, daemon=False):
+                process.join()
+    elif args.command == "submit":
+        print(submit_job(args.brand, args.url, args.region, args.num_queries))
+    elif args.command == "status":
+        jobs = [store.get(args.job_id)] if args.job_id else store.list_jobs()
+        for found in jobs:
+            print(describe(found) if found else f"no job {args.job_id}")
+    elif args.command == "cancel":
+        print("cancel requested" if store.cancel(args.job_id) else "job is not queued or running")
+    elif args.command == "retry":
+        print("queued again" if store.retry(args.job_id) else "only failed or cancelled jobs can be retried")
@@ -0,0 +1,33 @@
+import threading
+
+import anthropic
+from openai import OpenAI
+
+import config
+
+_openai_client = None
+_claude_client = None
+_lock = threading.Lock()
+
+
+def get_openai_client() -> OpenAI:
+    """
+    Process-wide OpenAI client, so nodes share one connection pool.
+    SDK retries are off: llm_utils.rate_limiter retries with backoff.
+    """
+    global _openai_client
+    with _lock:
+        if _openai_client is None:
+            _openai_client = OpenAI(api_key=config.OPEN_AI_API_KEY, base_url=config.OPENAI_BASE_URL, max_retries=0)
+        return _openai_client
+
+
+def get_claude_client() -> anthropic.Anthropic:
+    """Process-wide Anthropic client (SDK retries off, like get_openai_client)."""
+    global _claude_client
+    with _lock:
+        if _claude_client is None:
+            _claude_client = anthropic.Anthropic(
+                api_key=config.CLAUDE_API_KEY, base_url=config.ANTHROPIC_BASE_URL, max_retries=0
+            )
+        return _claude_client
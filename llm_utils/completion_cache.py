@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import config
+from llm_utils.rate_limiter import estimate_tokens, get_limiter
+from tracing.tracer import NOOP_SPAN, annotate, span
+
+
+class CacheMissError(RuntimeError):
+    """Raised in replay mode when a completion was never recorded."""
+
+
+class DiskCache:
+    """
+    SQLite-backed key/value store:
+    - entries older than ttl_seconds are treated as missing
+    - once the stored values exceed max_bytes, the least recently
+      read/written entries are evicted first
+    - read_only=True never writes (not even access times)
+
+    The byte total is kept in memory (summed once on open) so a write does
+    not scan the table; it is recounted only when it says the budget is
+    exceeded, since other processes may share the file.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None, read_only: bool = False):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key         TEXT PRIMARY KEY,
+                value       TEXT NOT NULL,
+                size        INTEGER NOT NULL,
+                created_at  REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_created ON entries(created_at)")
+        self._conn.commit()
+        self._total_bytes = self._stored_bytes()
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key: str, ignore_ttl: bool = False) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created_at = row
+            if not ignore_ttl and self.ttl_seconds and time.time() - created_at > self.ttl_seconds:
+                return None
+
+            if not self.read_only:
+                self._conn.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key)
+                )
+                self._conn.commit()
+            return value
+
+    def set(self, key: str, value: str):
+        if self.read_only:
+            return
+
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def delete(self, key: str):
+        if self.read_only:
+            return
+
+        with self._lock:
+            self._delete("DELETE FROM entries WHERE key = ? RETURNING size", (key,))
+            self._conn.commit()
+
+    def _delete(self, sql: str, params: tuple):
+        """Runs a DELETE ... RETURNING size and takes the freed bytes off the total."""
+        freed = self._conn.execute(sql, params).fetchall()
+        self._total_bytes = max(0, self._total_bytes - sum(size for (size,) in freed))
+
+    def _evict(self):
+        if self.ttl_seconds:
+            # Index range scan: only the expired entries are visited
+            self._delete("DELETE FROM entries WHERE created_at < ? RETURNING size",
+                         (time.time() - self.ttl_seconds,))
+
+        if not self.max_bytes or self._total_bytes <= self.max_bytes:
+            return
+
+        # Other processes may have written or evicted since we last counted
+        total = self._total_bytes = self._stored_bytes()
+        if total <= self.max_bytes:
+            return
+
+        # Walk from least recently used until we are back under the budget
+        to_free = total - self.max_bytes
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            doomed.append((key, size))
+            to_free -= size
+            if to_free <= 0:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in doomed])
+        self._total_bytes = total - sum(size for _, size in doomed)
+
+
+# -------------------------------------------------------------
+# Completion cache used by every LLM call in the nodes
+# -------------------------------------------------------------
+_completion_cache: Optional[DiskCache] = None
+_completion_cache_lock = threading.Lock()
+
+# Single-flight entries: key -> [lock, callers holding or waiting for it].
+# An entry is dropped when its last caller leaves.
+_inflight: Dict[str, list] = {}
+_inflight_lock = threading.Lock()
+
+
+def completion_key(provider: str, model: str, prompt: str, temperature: float, max_tokens: Optional[int]) -> str:
+    payload = json.dumps(
+        [provider, model, prompt, temperature, max_tokens],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_completion_cache() -> DiskCache:
+    global _completion_cache
+    with _completion_cache_lock:
+        if _completion_cache is None:
+            _completion_cache = DiskCache(
+                config.LLM_CACHE_PATH,
+                ttl_seconds=config.LLM_CACHE_TTL_SECONDS,
+                max_bytes=config.LLM_CACHE_MAX_BYTES,
+                read_only=config.LLM_CACHE_MODE == "replay"
+            )
+        return _completion_cache
+
+
+def cached_completion(provider: str, model: str, prompt: str, temperature: float,
+                      max_tokens: Optional[int], fetch: Callable[[], str], refresh: bool = False) -> str:
+    """
+    Return the cached completion for this exact call, or run fetch() and
+    store its text (a None result is returned but not stored). `prompt` is the prompt text, or the JSON-serialized
+    message list when the call has more than one message.
+
+    fetch() runs under the provider's rate limiter, which retries
+    throttled / transient errors; a call that still fails raises
+    LLMCallError and nothing is stored, so it is retried on the next run.
+    refresh=True skips the lookup and overwrites the entry (for retrying an
+    unusable completion); it has no effect in replay mode.
+
+    Every call is traced as an "llm" span (cache hit, retries, tokens).
+    """
+    with span("llm", "llm", provider=provider, model=model, cache_hit=False) as s:
+        value = _cached_completion(provider, model, prompt, temperature, max_tokens, fetch, refresh)
+        # Usage reported by the provider (model adapters) wins over the ~4 chars/token estimate
+        if s is not NOOP_SPAN:
+            s.set_default(
+                prompt_tokens=(len(prompt) + 3) // 4,
+                completion_tokens=(len(value or "") + 3) // 4,
+                tokens_estimated=True
+            )
+        return value
+
+
+def _cached_completion(provider: str, model: str, prompt: str, temperature: float,
+                       max_tokens: Optional[int], fetch: Callable[[], str], refresh: bool) -> str:
+    mode = config.LLM_CACHE_MODE
+    limiter = get_limiter(provider)
+    tokens = estimate_tokens(prompt, max_tokens)
+    if mode == "off":
+        return limiter.call(fetch, tokens)
+
+    cache = get_completion_cache()
+    key = completion_key(provider, model, prompt, temperature, max_tokens)
+
+    # Single flight: concurrent identical calls (parallel batch jobs) wait
+    # for the first one and then read its entry
+    with _inflight_lock:
+        entry = _inflight.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+        key_lock = entry[0]
+
+    try:
+        with key_lock:
+            # Replay reproduces a recorded run, however old the entries are
+            if not refresh or mode == "replay":
+                hit = cache.get(key, ignore_ttl=mode == "replay")
+                if hit is not None:
+                    annotate(cache_hit=True)
+                    return hit
+
+            if mode == "replay":
+                raise CacheMissError(f"No recorded completion for {provider}:{model} (key {key[:12]})")
+
+            value = limiter.call(fetch, tokens)
+            # No text (e.g. a refusal with content=None): nothing worth replaying
+            if value is not None:
+                cache.set(key, value)
+            return value
+    finally:
+        with _inflight_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _inflight[key]
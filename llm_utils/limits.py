@@ -0,0 +1,31 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+import config
+
+_slots: Dict[str, threading.BoundedSemaphore] = {}
+_slots_lock = threading.Lock()
+
+
+def _slot(name: str) -> threading.BoundedSemaphore:
+    with _slots_lock:
+        if name not in _slots:
+            _slots[name] = threading.BoundedSemaphore(max(1, config.GLOBAL_CONCURRENCY.get(name, 8)))
+        return _slots[name]
+
+
+@contextmanager
+def provider_slot(name: str):
+    """
+    Process-wide concurrency cap per web provider (config.GLOBAL_CONCURRENCY);
+    LLM providers are paced by llm_utils.rate_limiter instead.
+
+    The per-node asyncio semaphores only limit one run; this caps the
+    process when several runs share it (batch jobs on threads). Blocking:
+    acquire it in the worker thread that makes the call, never on an
+    event loop.
+    """
+    slot = _slot(name)
+    with slot:
+        yield
@@ -0,0 +1,225 @@
+import abc
+import asyncio
+import contextvars
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+import config
+from llm_utils.clients import get_claude_client, get_openai_client
+from llm_utils.completion_cache import cached_completion
+from llm_utils.rate_limiter import LLMCallError
+from tracing.tracer import annotate, span
+
+
+class ModelInfo(NamedTuple):
+    key: str                      # "provider:model", the raw_response key
+    provider: str
+    model: str
+    capabilities: FrozenSet[str]
+    input_cost: float             # USD per 1M tokens
+    output_cost: float
+
+
+# One worker pool per provider, sized to its RATE_LIMITS max_concurrency:
+# calls waiting for the limiter queue here instead of holding threads of the
+# loop's default executor (the web stages) or of another provider.
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def provider_executor(provider: str) -> ThreadPoolExecutor:
+    with _executors_lock:
+        if provider not in _executors:
+            limits = config.RATE_LIMITS.get(provider, config.RATE_LIMITS["default"])
+            _executors[provider] = ThreadPoolExecutor(max_workers=max(1, limits["max_concurrency"]),
+                                                      thread_name_prefix=f"llm-{provider}")
+        return _executors[provider]
+
+
+class ModelAdapter(abc.ABC):
+    """
+    One provider's async completion call. complete() returns the answer
+    text or raises LLMCallError; blocking SDK calls run on the provider's
+    worker pool (the rate limiter blocks, so it must never run on the event loop).
+    """
+
+    provider = ""
+
+    @abc.abstractmethod
+    async def complete(self, model: str, prompt: str, refresh: bool = False) -> str:
+        ...
+
+    async def run_blocking(self, fn, *args):
+        """fn(*args) on the provider's pool, with the caller's context (trace spans)."""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(provider_executor(self.provider), context.run, fn, *args)
+
+
+class OpenAIAdapter(ModelAdapter):
+    provider = "openai"
+
+    def __init__(self, client=None):
+        self.client = client or get_openai_client()
+
+    def _complete(self, model: str, prompt: str, refresh: bool) -> str:
+        def fetch():
+            resp = self.client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.2
+            )
+            usage = getattr(resp, "usage", None)
+            record_usage(f"openai:{model}", getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0))
+            return resp.choices[0].message.content.strip()
+
+        return cached_completion("openai", model, prompt, 0.2, None, fetch, refresh=refresh)
+
+    async def complete(self, model: str, prompt: str, refresh: bool = False) -> str:
+        return await self.run_blocking(self._complete, model, prompt, refresh)
+
+
+class ClaudeAdapter(ModelAdapter):
+    provider = "claude"
+
+    def __init__(self, client=None):
+        self.client = client or get_claude_client()
+
+    def _complete(self, model: str, prompt: str, refresh: bool) -> str:
+        def fetch():
+            # temperature goes in the body: newer SDKs no longer take it as a keyword
+            resp = self.client.messages.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=800,
+                extra_body={"temperature": 0.2}
+            )
+            usage = getattr(resp, "usage", None)
+            record_usage(f"claude:{model}", getattr(usage, "input_tokens", 0), getattr(usage, "output_tokens", 0))
+            try:
+                return resp["completion"].strip()
+            except:
+                return resp.content[0].text.strip()
+
+        return cached_completion("claude", model, prompt, 0.2, 800, fetch, refresh=refresh)
+
+    async def complete(self, model: str, prompt: str, refresh: bool = False) -> str:
+        return await self.run_blocking(self._complete, model, prompt, refresh)
+
+
+class StubAdapter(ModelAdapter):
+    """
+    Offline answers: the question plus the titles of the web results in the
+    prompt, so brands in the results show up as mentions. Deterministic and
+    never cached or rate limited.
+    """
+
+    provider = "stub"
+    QUESTION = re.compile(r"USER QUESTION:\s*(.+)")
+    RESULT_TITLE = re.compile(r"^\s*\[\d+\]\s*(.+)$", re.MULTILINE)
+
+    async def complete(self, model: str, prompt: str, refresh: bool = False) -> str:
+        with span("llm", "llm", provider="stub", model=model, cache_hit=False):
+            if config.STUB_MODEL_LATENCY_SECONDS:
+                await asyncio.sleep(config.STUB_MODEL_LATENCY_SECONDS)
+
+            question = self.QUESTION.search(prompt)
+            titles = self.RESULT_TITLE.findall(prompt)
+            lines = [f"({model}) {question.group(1).strip() if question else prompt.strip()[:200]}"]
+            lines += [f"{i}. {title.strip()}" for i, title in enumerate(titles, start=1)]
+            record_usage(f"stub:{model}", len(prompt) // 4, sum(len(l) for l in lines) // 4)
+            return "\n".join(lines)
+
+
+# -------------------------------------------------------------
+# Registry
+# -------------------------------------------------------------
+_factories: Dict[str, Callable[[], ModelAdapter]] = {}
+_adapters: Dict[str, ModelAdapter] = {}
+_registry_lock = threading.Lock()
+
+
+def register_provider(provider: str, factory: Callable[[], ModelAdapter]):
+    """factory() builds the provider's adapter on first use (clients are created lazily)."""
+    with _registry_lock:
+        _factories[provider] = factory
+        _adapters.pop(provider, None)
+
+
+register_provider("openai", OpenAIAdapter)
+register_provider("claude", ClaudeAdapter)
+register_provider("stub", StubAdapter)
+
+
+def get_adapter(provider: str) -> ModelAdapter:
+    with _registry_lock:
+        if provider not in _adapters:
+            if provider not in _factories:
+                raise LLMCallError(provider, "no adapter registered for this provider")
+            _adapters[provider] = _factories[provider]()
+        return _adapters[provider]
+
+
+def get_model(key: str) -> ModelInfo:
+    provider, _, model = key.partition(":")
+    if not model:
+        raise ValueError(f"Model key must be 'provider:model', got '{key}'")
+    if provider not in _factories:
+        raise ValueError(f"Unknown provider '{provider}' in model '{key}' (registered: {sorted(_factories)})")
+
+    entry = config.MODEL_CATALOG.get(key, {})
+    return ModelInfo(
+        key=key,
+        provider=provider,
+        model=model,
+        capabilities=frozenset(entry.get("capabilities", ["chat"])),
+        input_cost=float(entry.get("input_cost", 0.0)),
+        output_cost=float(entry.get("output_cost", 0.0))
+    )
+
+
+def resolve_models(keys: Optional[Iterable[str]] = None, capability: str = "chat") -> List[ModelInfo]:
+    """The run's models (default config.FIRE_QUERY_MODELS), in order, duplicates dropped."""
+    models = []
+    for key in dict.fromkeys(keys or config.FIRE_QUERY_MODELS):
+        info = get_model(key)
+        if capability not in info.capabilities:
+            raise ValueError(f"Model '{key}' does not support '{capability}'")
+        models.append(info)
+    return models
+
+
+# -------------------------------------------------------------
+# Usage / cost (only calls that reached the provider, not cache hits)
+# -------------------------------------------------------------
+_usage: Dict[str, Dict[str, int]] = defaultdict(lambda: {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+_usage_lock = threading.Lock()
+
+
+def record_usage(key: str, input_tokens: Optional[int], output_tokens: Optional[int]):
+    annotate(prompt_tokens=input_tokens or 0, completion_tokens=output_tokens or 0, tokens_estimated=False)
+    with _usage_lock:
+        u = _usage[key]
+        u["calls"] += 1
+        u["input_tokens"] += input_tokens or 0
+        u["output_tokens"] += output_tokens or 0
+
+
+def usage_summary() -> str:
+    with _usage_lock:
+        usage = {key: dict(u) for key, u in _usage.items()}
+
+    parts = []
+    total = 0.0
+    for key, u in usage.items():
+        try:
+            info = get_model(key)
+            cost = (u["input_tokens"] * info.input_cost + u["output_tokens"] * info.output_cost) / 1_000_000
+        except ValueError:
+            cost = 0.0
+        total += cost
+        parts.append(f"{key}: {u['calls']} calls, {u['input_tokens']}+{u['output_tokens']} tokens, ${cost:.4f}")
+    return "; ".join(parts + [f"total ${total:.4f}"]) if parts else "no model calls"
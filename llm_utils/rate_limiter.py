@@ -0,0 +1,229 @@
+import random
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional, Tuple
+
+import config
+from tracing.tracer import current_span
+
+# Status codes worth retrying; 529 is Anthropic's "overloaded"
+THROTTLE_STATUS = {429, 529}
+TRANSIENT_STATUS = {408, 409, 500, 502, 503, 504}
+TRANSIENT_ERRORS = ("APITimeoutError", "APIConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout",
+                    "ConnectionError", "RemoteProtocolError", "InternalServerError", "ServiceUnavailableError")
+
+
+class LLMCallError(RuntimeError):
+    """An LLM call that failed for good (non-retryable error, or retries exhausted)."""
+
+    def __init__(self, provider: str, message: str, status: Optional[int] = None, attempts: int = 1):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.status = status
+        self.attempts = attempts
+
+
+def _status_of(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds from Retry-After / retry-after-ms response headers, if the error carries them."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def classify(error: Exception) -> Tuple[str, Optional[float]]:
+    """("throttled" | "transient" | "fatal", retry_after_seconds)."""
+    status = _status_of(error)
+    if status in THROTTLE_STATUS:
+        return "throttled", _retry_after(error)
+    if status in TRANSIENT_STATUS:
+        return "transient", _retry_after(error)
+    if status is None and (
+        isinstance(error, (TimeoutError, ConnectionError))
+        or type(error).__name__ in TRANSIENT_ERRORS
+    ):
+        return "transient", None
+    return "fatal", None
+
+
+class TokenBucket:
+    """
+    Per-minute budget (requests or tokens). reserve() takes the amount at
+    once, going into debt if needed, and returns how long the caller has
+    to wait for the debt to refill; reservations are served in call order.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: +1 after a full window of successes (as many
+    as the current limit), halved on throttling, at most once per
+    cooldown so one burst of 429s counts as a single signal.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, cooldown: float = 1.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.cooldown = cooldown
+
+        self.active = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self, outcome: str):
+        with self._cond:
+            self.active -= 1
+            now = time.monotonic()
+
+            if outcome == "throttled":
+                self._successes = 0
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit // 2)
+                    self._last_decrease = now
+            elif outcome == "ok":
+                self._successes += 1
+                if self._successes >= self.limit:
+                    self._successes = 0
+                    self.limit = min(self.maximum, self.limit + 1)
+
+            self._cond.notify_all()
+
+
+class ProviderLimiter:
+    """
+    Everything that paces one provider: requests/min and tokens/min
+    buckets, adaptive concurrency, a provider-wide pause after a 429 with
+    Retry-After, and retries with jittered exponential backoff.
+    """
+
+    def __init__(self, provider: str, rpm: float, tpm: float, initial_concurrency: int,
+                 min_concurrency: int, max_concurrency: int):
+        self.provider = provider
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, min_concurrency, max_concurrency)
+        self.stats = Counter()
+
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_for_budget(self, tokens: int):
+        with self._lock:
+            pause = self._paused_until - time.monotonic()
+        wait = max(pause, self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait > 0:
+            self.stats["waited_ms"] += int(wait * 1000)
+            current_span().add("limiter_wait_ms", int(wait * 1000))
+            time.sleep(wait)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(config.LLM_BACKOFF_MAX_SECONDS, config.LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    def call(self, fn: Callable[[], str], tokens: int) -> str:
+        """fn() under the provider limits; raises LLMCallError when it cannot succeed."""
+        retries = max(0, config.LLM_MAX_RETRIES)
+
+        for attempt in range(retries + 1):
+            self._wait_for_budget(tokens)
+            self.concurrency.acquire()
+            try:
+                value = fn()
+            except Exception as e:
+                kind, retry_after = classify(e)
+                self.concurrency.release(kind)
+                self.stats[kind] += 1
+
+                if kind == "fatal" or attempt == retries:
+                    self.stats["failed"] += 1
+                    raise LLMCallError(self.provider, f"{type(e).__name__}: {e}", _status_of(e), attempt + 1) from e
+
+                current_span().add("retries")
+                if kind == "throttled":
+                    current_span().add("throttled")
+
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                if kind == "throttled" and retry_after is not None:
+                    with self._lock:
+                        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                self.stats["retries"] += 1
+                time.sleep(delay)
+            else:
+                self.concurrency.release("ok")
+                self.stats["ok"] += 1
+                return value
+
+    def summary(self) -> str:
+        s = self.stats
+        return (
+            f"{self.provider}: {s['ok']} ok, {s['failed']} failed, {s['retries']} retries "
+            f"({s['throttled']} throttled), concurrency {self.concurrency.limit}, "
+            f"waited {s['waited_ms'] / 1000:.1f}s"
+        )
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    with _limiters_lock:
+        if provider not in _limiters:
+            limits = config.RATE_LIMITS.get(provider, config.RATE_LIMITS["default"])
+            _limiters[provider] = ProviderLimiter(
+                provider,
+                rpm=limits["rpm"],
+                tpm=limits["tpm"],
+                initial_concurrency=limits["initial_concurrency"],
+                min_concurrency=limits.get("min_concurrency", 1),
+                max_concurrency=limits["max_concurrency"]
+            )
+        return _limiters[provider]
+
+
+def estimate_tokens(prompt: str, max_tokens: Optional[int]) -> int:
+    # ~4 characters per prompt token, plus the completion budget
+    return (len(prompt) + 3) // 4 + (max_tokens or 512)
+
+
+def limiter_summary() -> str:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return "; ".join(l.summary() for l in limiters) or "no LLM calls"
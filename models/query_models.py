@@ -9,6 +9,9 @@ class Query(BaseModel):
     # raw_response holds model_key -> text or structured content
     raw_response: Dict[str, str] = Field(default_factory=dict)
 
+    # model_key -> error for calls that failed (no raw_response for that model)
+    errors: Dict[str, str] = Field(default_factory=dict)
+
     # parsed fields (per model)
     brand_mentioned: Dict[str, Optional[bool]] = Field(default_factory=dict)
     rank: Dict[str, Optional[int]] = Field(default_factory=dict)
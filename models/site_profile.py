@@ -0,0 +1,46 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import List
+
+
+class SiteProfile(BaseModel):
+    industry: str
+    competitors: List[str] = Field(default_factory=list)
+    product_lines: List[str] = Field(default_factory=list)
+
+    @field_validator("industry")
+    @classmethod
+    def industry_not_empty(cls, value: str):
+        value = value.strip().strip('"')
+        if not value:
+            raise ValueError("industry must not be empty")
+        return value
+
+    @field_validator("competitors", "product_lines")
+    @classmethod
+    def clean_names(cls, values: List[str]):
+        # Drop blanks and case-insensitive duplicates, keep the model's order
+        seen, out = set(), []
+        for v in values:
+            v = v.strip()
+            if v and v.lower() not in seen:
+                seen.add(v.lower())
+                out.append(v)
+        return out
+
+
+# Structured-output schema sent to the API (strict mode: every key required,
+# no extra keys), mirrors SiteProfile
+SITE_PROFILE_SCHEMA = {
+    "name": "site_profile",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "industry": {"type": "string"},
+            "competitors": {"type": "array", "items": {"type": "string"}},
+            "product_lines": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["industry", "competitors", "product_lines"],
+        "additionalProperties": False,
+    },
+}
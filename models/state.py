@@ -13,15 +13,26 @@ class VisibilityState(BaseModel):
     # Scraper + content extraction
     raw_website_html: Dict[str, str] = Field(default_factory=dict)
     extracted_content: Optional[str] = None
+    condensed_content: Optional[str] = None  # extracted_content cut to a token budget
     detected_industry: Optional[str] = None
 
     # Competitors
     competitors: List[str] = Field(default_factory=list)
+    product_lines: List[str] = Field(default_factory=list)  # filled by site_profiler
 
     # Query generation + parsing
     generated_queries: List[Dict[str, Any]] = Field(default_factory=list)
+    # Incremental query-set runs: parsed queries carried over without re-firing,
+    # and whether the fired ones must bypass the completion cache
+    reused_queries: List[Dict[str, Any]] = Field(default_factory=list)
+    refresh_answers: bool = False
 
-    # Flattened output
+    # Models each query is fired at ("provider:model"); empty = config.FIRE_QUERY_MODELS
+    models: List[str] = Field(default_factory=list)
+
+    # Flattened output (report_path: where flatten_queries writes the report; the
+    # extension is replaced to match config.REPORT_FORMAT)
+    report_path: str = "output/visibility_report.json"
     flattened_rows: List[Dict[str, Any]] = Field(default_factory=list)
     flattened_df: Optional[pd.DataFrame] = None  # MUST be optional
 
@@ -0,0 +1,123 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from langgraph.config import get_stream_writer
+
+import config
+from llm_utils.clients import get_openai_client
+from llm_utils.model_registry import ModelInfo, resolve_models
+from models.query_models import Query
+from models.state import VisibilityState
+from nodes.fire_queries_openai import build_semaphores, execute_query, log_failures
+from nodes.flatten_queries import finalize_report, flatten_query
+from nodes.parser import ParseSession
+from storage.progress_store import NodeProgress
+from storage.query_store import has_answers
+from web_utils.web_cache import start_run_cache
+
+
+def partial_results_writer() -> Callable[[Dict[str, Any]], None]:
+    """LangGraph custom-stream writer (stream_mode="custom"); a no-op outside a graph run."""
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda _: None
+
+
+async def run_pipeline(queries: List[Query], state: VisibilityState, models: List[ModelInfo],
+                       session: ParseSession, emit: Callable[[Dict[str, Any]], None]) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    fire_queries -> parser -> flatten per query, through a bounded queue.
+
+    Producers run the same execute_query() as fire_queries and put the
+    query index on the queue once its answers are in; when the parser falls
+    behind, the queue is full and producers wait. The single consumer feeds
+    ParseSession and flattens every query as soon as all its responses are
+    parsed. A partly filled parser batch is sent after PIPELINE_FLUSH_SECONDS
+    without new answers, so results keep flowing.
+    Returns query index -> flattened rows.
+    """
+    limits = config.FIRE_QUERIES_CONCURRENCY
+    semaphores = build_semaphores(limits)
+
+    # One extra worker thread for the parser
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=sum(limits.values()) + 1))
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, config.PIPELINE_QUEUE_SIZE))
+    fire_progress = NodeProgress("fire_queries")
+    keys = [f"{i}:{q.query}" for i, q in enumerate(queries)]
+    rows: Dict[int, List[Dict[str, Any]]] = {}
+
+    async def produce(i: int, q: Query):
+        if keys[i] in fire_progress.done:
+            q.raw_response = fire_progress.done[keys[i]]
+        else:
+            await execute_query(q, semaphores, models, state.refresh_answers)
+            if has_answers(q.model_dump()):
+                fire_progress.save(keys[i], q.raw_response)
+        await queue.put(i)
+
+    def publish(completed: List[int]):
+        batch = []
+        for i in completed:
+            rows[i] = flatten_query(session.apply(i, queries[i]).model_dump())
+            batch.extend(rows[i])
+        if batch:
+            emit({"completed": len(rows), "total": len(queries), "rows": batch})
+
+    async def consume():
+        received = 0
+        while received < len(queries):
+            try:
+                i = await asyncio.wait_for(queue.get(), timeout=config.PIPELINE_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                publish(await asyncio.to_thread(session.flush))
+                continue
+
+            received += 1
+            publish(await asyncio.to_thread(session.submit, i, queries[i]))
+
+        publish(await asyncio.to_thread(session.flush))
+
+    await asyncio.gather(consume(), *(produce(i, q) for i, q in enumerate(queries)))
+    return rows
+
+
+def answer_pipeline(state: VisibilityState):
+    """
+    Streaming replacement for fire_queries + parser + flatten_queries
+    (config.PIPELINE_STREAMING). Returns the same generated_queries,
+    flattened_rows and flattened_df; partial rows are emitted on the
+    "custom" stream while the run is in progress.
+    """
+    models = resolve_models(state.models)
+
+    queries = [
+        Query(**qdict) if not isinstance(qdict, Query) else qdict
+        for qdict in state.generated_queries
+    ]
+
+    session = ParseSession(get_openai_client(), state.brand_name, state.competitors, NodeProgress("parser"))
+    emit = partial_results_writer()
+
+    # Stored results of still-fresh queries (incremental runs) are already final
+    reused_rows = [row for q in state.reused_queries for row in flatten_query(q)]
+    if reused_rows:
+        emit({"completed": 0, "total": len(queries), "rows": reused_rows})
+
+    web_cache = start_run_cache()
+    rows = asyncio.run(run_pipeline(queries, state, models, session, emit))
+    print(web_cache.summary())
+    log_failures(queries)
+    session.log_stats()
+
+    # Same order as the barrier chain: reused queries first, then generated_queries order
+    parsed_queries = [q.model_dump() for q in queries]
+    flattened_rows = reused_rows + [row for i in range(len(queries)) for row in rows[i]]
+
+    return {
+        "generated_queries": parsed_queries,
+        **finalize_report(state, flattened_rows, parsed_queries)
+    }
@@ -1,20 +1,20 @@
-from openai import OpenAI
 import json
 
-import config
+from llm_utils.clients import get_openai_client
+from llm_utils.completion_cache import cached_completion
 from models.state import VisibilityState
 
 
 def competitor_extractor(state: VisibilityState):
 
-    extracted_text = state.extracted_content
+    extracted_text = state.condensed_content or state.extracted_content
     industry = state.detected_industry
     brand = state.brand_name
 
     if not extracted_text or extracted_text.startswith("ERROR"):
         return {"competitors": []}
 
-    client = OpenAI(api_key=config.OPEN_AI_API_KEY)
+    client = get_openai_client()
 
     prompt = f"""
     You are a COMPETITOR DISCOVERY ENGINE.
@@ -66,16 +66,21 @@ def competitor_extractor(state: VisibilityState):
     {extracted_text}
     """
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "Return only a JSON list of competitors."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0
-    )
+    messages = [
+        {"role": "system", "content": "Return only a JSON list of competitors."},
+        {"role": "user", "content": prompt}
+    ]
+
+    def fetch():
+        response = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0
+        )
+        return response.choices[0].message.content
 
-    raw = response.choices[0].message.content.strip()
+    raw = cached_completion("openai", "gpt-4o-mini", json.dumps(messages, ensure_ascii=False), 0, None, fetch)
+    raw = raw.strip()
     raw = raw.replace("```json", "").replace("```", "").strip()
 
     try:
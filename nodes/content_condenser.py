@@ -0,0 +1,126 @@
+import re
+from collections import Counter
+from typing import List, Set
+
+import config
+from models.state import VisibilityState
+from nodes.web_scraper import KEYWORDS
+from text_utils.similarity import WORD, NearDuplicateIndex
+
+# Sentence boundary: terminal punctuation followed by something that starts a sentence
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[\"'“(\[]?[A-Z0-9])")
+
+# Scraped text often has no punctuation at all (menus, product grids)
+MAX_SENTENCE_WORDS = 40
+PASSAGE_WORDS = 80
+
+# Most frequent content words of the whole site count as keywords too
+TOP_TERMS = 25
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "your", "you", "our", "are",
+    "was", "were", "will", "have", "has", "had", "not", "but", "all", "any", "can",
+    "more", "into", "about", "their", "they", "them", "its", "it's", "also", "than",
+    "then", "when", "what", "which", "who", "how", "each", "other", "out", "use",
+    "get", "one", "new", "now", "just", "only", "over", "such", "per", "may",
+}
+
+
+def approx_tokens(text: str) -> int:
+    # ~4 characters per token for English prose (OpenAI's rule of thumb)
+    return (len(text) + 3) // 4
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for sentence in SENTENCE_SPLIT.split(text):
+        words = sentence.split()
+        for start in range(0, len(words), MAX_SENTENCE_WORDS):
+            sentences.append(" ".join(words[start:start + MAX_SENTENCE_WORDS]))
+    return [s for s in sentences if s]
+
+
+def build_passages(sentences: List[str]) -> List[str]:
+    """Consecutive sentences packed into passages of about PASSAGE_WORDS words."""
+    passages, current, count = [], [], 0
+    for sentence in sentences:
+        n = len(sentence.split())
+        if current and count + n > PASSAGE_WORDS:
+            passages.append(" ".join(current))
+            current, count = [], 0
+        current.append(sentence)
+        count += n
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def keyword_terms(text: str, brand: str) -> Set[str]:
+    """Scraper KEYWORDS, the brand name and the site's most frequent content words."""
+    terms = {part for k in KEYWORDS for part in k.split("-")}
+    terms.update(WORD.findall(brand.lower()))
+
+    counts = Counter(
+        w for w in WORD.findall(text.lower())
+        if len(w) > 3 and w not in STOPWORDS and not w.isdigit()
+    )
+    terms.update(w for w, _ in counts.most_common(TOP_TERMS))
+    return terms
+
+
+def keyword_density(passage: str, terms: Set[str]) -> float:
+    words = WORD.findall(passage.lower())
+    if not words:
+        return 0.0
+    return sum(w in terms for w in words) / len(words)
+
+
+def condense(text: str, brand: str, token_budget: int) -> str:
+    """
+    Text cut to token_budget (approximate tokens).
+
+    Sentences repeated across pages (navigation, banners, cookie notices)
+    are kept once, near-identical ones included. If that is still over
+    budget, passages are picked by keyword density and returned in their
+    original order; the opening passage (main page) is always kept.
+    Text that already fits the budget is returned unchanged.
+    """
+    if approx_tokens(text) <= token_budget:
+        return text
+
+    dedup = NearDuplicateIndex()
+    sentences = [s for s in split_sentences(text) if dedup.add_if_new(s)]
+    deduped = " ".join(sentences)
+    if approx_tokens(deduped) <= token_budget:
+        return deduped
+
+    passages = build_passages(sentences)
+    terms = keyword_terms(deduped, brand)
+    ranked = sorted(
+        range(1, len(passages)),
+        key=lambda i: (-keyword_density(passages[i], terms), i)
+    )
+
+    chosen, used = set(), 0
+    for i in [0] + ranked:
+        cost = approx_tokens(passages[i]) + 1
+        if used + cost <= token_budget:
+            chosen.add(i)
+            used += cost
+
+    return " ".join(passages[i] for i in sorted(chosen))
+
+
+def content_condenser(state: VisibilityState):
+    """
+    Shrinks extracted_content to CONDENSED_CONTENT_TOKEN_BUDGET before it
+    is pasted into the industry_detector and competitor_extractor prompts.
+    """
+    text = state.extracted_content
+
+    if not text or text.startswith("ERROR"):
+        return {"condensed_content": text}
+
+    condensed = condense(text, state.brand_name, config.CONDENSED_CONTENT_TOKEN_BUDGET)
+    print(f"Content condensed: ~{approx_tokens(text)} -> ~{approx_tokens(condensed)} tokens")
+
+    return {"condensed_content": condensed}
@@ -1,26 +1,47 @@
-import requests
-from typing import List, Dict
-from bs4 import BeautifulSoup
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
-from openai import OpenAI
-import anthropic
+from typing import Callable, Dict, List, Optional
+from bs4 import BeautifulSoup
 
 import config
+from llm_utils.limits import provider_slot
+from llm_utils.model_registry import ModelInfo, get_adapter, resolve_models, usage_summary
+from llm_utils.rate_limiter import limiter_summary
 from models.query_models import Query
 from models.state import VisibilityState
+from storage.progress_store import NodeProgress
+from storage.query_store import has_answers
+from web_utils.html_extract import SNIPPET_SKIP_TAGS, extract
+from web_utils.http import get_session
+from tracing.tracer import annotate, span
+from web_utils.web_cache import get_run_cache, start_run_cache
 
 
 # -------------------------------------------------------------
 # 1) Search engine (DuckDuckGo Lite)
 # -------------------------------------------------------------
-DDG_LITE = "https://lite.duckduckgo.com/lite/"
+def ddg_search(query: str, max_results: int = 5, timeout: int = 10):
+    with span("search", "search", query=query) as s:
+        fetched = []
 
+        def fetch():
+            fetched.append(True)
+            return _ddg_search(query, max_results, timeout)
 
-def ddg_search(query: str, max_results: int = 5, timeout: int = 10):
+        # Identical (normalized) queries share one search per run
+        results = get_run_cache().search(query, max_results, fetch)
+        s.set(cache_hit=not fetched, results=len(results))
+        return results
+
+
+def _ddg_search(query: str, max_results: int, timeout: int):
     headers = {"User-Agent": "Mozilla/5.0"}
 
     try:
-        r = requests.get(DDG_LITE, params={"q": query}, headers=headers, timeout=timeout)
+        with provider_slot("search"):
+            r = get_session().get(config.DDG_LITE_URL, params={"q": query}, headers=headers, timeout=timeout)
+        annotate(status=r.status_code, bytes=len(r.content))
         r.raise_for_status()
     except:
         return []
@@ -41,21 +62,44 @@ def ddg_search(query: str, max_results: int = 5, timeout: int = 10):
 # 2) Fetch webpage content (snippet)
 # -------------------------------------------------------------
 def fetch_page_text(url: str, timeout: int = 8):
+    with span("fetch", "fetch", url=url) as s:
+        fetched = []
+
+        def fetch(validators):
+            fetched.append(True)
+            return _fetch_page_text(url, validators, timeout)
+
+        # Result URLs repeat across queries, so snippets are cached per normalized URL
+        text = get_run_cache().page(url, fetch)
+        s.set(cache_hit=not fetched)
+        return text
+
+
+def _fetch_page_text(url: str, validators: Dict[str, str], timeout: int):
     headers = {"User-Agent": "Mozilla/5.0"}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
 
     try:
-        r = requests.get(url, headers=headers, timeout=timeout)
+        with provider_slot("fetch"):
+            r = get_session().get(url, headers=headers, timeout=timeout)
+        annotate(status=r.status_code, bytes=len(r.content))
+        if r.status_code == 304:
+            return None, validators
         r.raise_for_status()
     except:
-        return ""
-
-    soup = BeautifulSoup(r.text, "html.parser")
+        return "", {}
 
-    for tag in soup(["script", "style", "noscript", "header", "footer", "svg"]):
-        tag.extract()
+    new_validators = {
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+    }
 
-    text = soup.get_text(" ", strip=True)
-    return " ".join(text.split())[:2000]  # Natural-sized snippet (not too long)
+    # Streaming extraction stops parsing as soon as the snippet is full
+    text, _ = extract(r.text, skip_tags=SNIPPET_SKIP_TAGS, char_budget=2000)
+    return text, new_validators  # Natural-sized snippet (not too long)
 
 
 # -------------------------------------------------------------
@@ -66,9 +110,13 @@ def build_web_results_block(results: List[Dict[str, str]]) -> str:
     This is what Perplexity / ChatGPT Search internally sends to the LLM.
     A natural list of retrieved documents.
     """
+    snippets = [fetch_page_text(r["url"]) for r in results]
+    return format_web_results(results, snippets)
+
+
+def format_web_results(results: List[Dict[str, str]], snippets: List[str]) -> str:
     web_blocks = []
-    for i, r in enumerate(results, start=1):
-        snippet = fetch_page_text(r["url"])
+    for i, (r, snippet) in enumerate(zip(results, snippets), start=1):
         if snippet:
             web_blocks.append(
                 f"[{i}] {r['title']}\nURL: {r['url']}\n{snippet}"
@@ -111,83 +159,146 @@ def build_prompt(query: str, web_results: str) -> str:
 # -------------------------------------------------------------
 # 5) LLM executor
 # -------------------------------------------------------------
-def call_llm(provider, model, prompt, openai_client=None, claude_client=None):
+async def call_llm(provider, model, prompt, refresh=False):
     """
-    Generic LLM wrapper — does NOT change prompt style.
+    Generic LLM wrapper — does NOT change prompt style. Delegates to the
+    provider's adapter in llm_utils.model_registry.
+    refresh=True asks the model again instead of using a cached answer.
+    Raises LLMCallError when the call fails for good (the rate limiter has
+    already retried throttling and transient errors).
     """
-    try:
-        if provider == "openai":
-            resp = openai_client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2
-            )
-            return resp.choices[0].message.content.strip()
-
-        if provider == "claude":
-            resp = claude_client.messages.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=800,
-                temperature=0.2
-            )
-            try:
-                return resp["completion"].strip()
-            except:
-                return resp.content[0].text.strip()
-
-        return "NO_MODEL_AVAILABLE"
-
-    except Exception as e:
-        return f"ERROR: {str(e)}"
+    return await get_adapter(provider).complete(model, prompt, refresh)
 
 
 # -------------------------------------------------------------
-# 6) MAIN NODE (Final output looks like ChatGPT / Perplexity)
+# 6) Async fan-out engine
 # -------------------------------------------------------------
-def llm_query_executor(state: VisibilityState):
+def build_semaphores(limits: Dict[str, int]) -> Dict[str, asyncio.Semaphore]:
+    """One semaphore per stage, created inside the running loop."""
+    return {name: asyncio.Semaphore(max(1, n)) for name, n in limits.items()}
+
+
+async def run_limited(semaphore: asyncio.Semaphore, fn, *args, **kwargs):
+    """Run a blocking call in a worker thread while holding the stage slot."""
+    async with semaphore:
+        return await asyncio.to_thread(fn, *args, **kwargs)
 
-    if not getattr(state, "generated_queries", None):
-        return {"generated_queries": state.generated_queries}
 
-    # Hardcoded keys (you said ok)
-    openai_client = OpenAI(
-        api_key=config.OPEN_AI_API_KEY
-    )
+async def call_model(info: ModelInfo, prompt: str, refresh: bool) -> str:
+    # No stage semaphore: the provider's rate limiter paces (and adapts) LLM calls
+    return await call_llm(info.provider, info.model, prompt, refresh)
 
-    claude_client = anthropic.Anthropic(
-        api_key=config.CLAUDE_API_KEY
-    )
 
-    updated_queries = []
+async def fetch_web_results(results: List[Dict[str, str]], semaphores) -> str:
+    snippets = await asyncio.gather(*(
+        run_limited(semaphores["fetch"], fetch_page_text, r["url"])
+        for r in results
+    ))
+    return format_web_results(results, list(snippets))
 
-    for qdict in state.generated_queries:
-        q = Query(**qdict) if not isinstance(qdict, Query) else qdict
 
-        # 1) Search
-        results = ddg_search(q.query, max_results=5)
+async def execute_query(q: Query, semaphores, models: List[ModelInfo], refresh: bool = False) -> Query:
+    with span("query", "query", query=q.query, category=q.category) as s:
+        # The "queries" slot covers the web stages only; LLM calls are
+        # paced by RATE_LIMITS alone
+        async with semaphores["queries"]:
+            # 1) Search
+            results = await run_limited(semaphores["search"], ddg_search, q.query, max_results=5)
 
-        # 2) Build web result context (natural)
-        web_results_block = build_web_results_block(results)
+            # 2) Build web result context (page fetches run concurrently)
+            web_results_block = await fetch_web_results(results, semaphores)
 
         # 3) Final prompt
         prompt = build_prompt(q.query, web_results_block)
 
-        # 4) Fire models
-        models = ["openai:gpt-4o", "claude:claude-haiku-4-5-20251001"]
-        for model_name in models:
-            provider, model_id = model_name.split(":", 1)
-
-            answer = call_llm(
-                provider=provider,
-                model=model_id,
-                prompt=prompt,
-                openai_client=openai_client,
-                claude_client=claude_client
-            )
+        # 4) Fire every model at once: more models cost more, but take no longer
+        answers = await asyncio.gather(
+            *(call_model(info, prompt, refresh) for info in models),
+            return_exceptions=True
+        )
+
+        # Keep raw_response keys in model order, same as the sequential loop.
+        # Failed calls go to q.errors, so they are never parsed or scored.
+        for info, answer in zip(models, answers):
+            if isinstance(answer, Exception):
+                q.errors[info.key] = str(answer)
+            else:
+                q.raw_response[info.key] = answer
+                q.errors.pop(info.key, None)
+
+        s.set(failed_models=len(q.errors))
+
+    return q
+
+
+async def execute_queries(queries: List[Query], models: List[ModelInfo], refresh: bool = False,
+                          on_done: Optional[Callable[[int, Query], None]] = None) -> List[Query]:
+    """on_done(index, query) is called as each query finishes (progress records)."""
+    limits = config.FIRE_QUERIES_CONCURRENCY
+    semaphores = build_semaphores(limits)
+
+    # The default executor is sized by CPU count; blocking I/O needs one
+    # thread per slot or the semaphores never fill up.
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=sum(limits.values())))
+
+    async def run(i: int, q: Query) -> Query:
+        q = await execute_query(q, semaphores, models, refresh)
+        if on_done:
+            on_done(i, q)
+        return q
+
+    return await asyncio.gather(*(run(i, q) for i, q in enumerate(queries)))
+
+
+def log_failures(queries: List[Query]):
+    failed = [(q.query, model, error) for q in queries for model, error in q.errors.items()]
+    print(f"LLM limits: {limiter_summary()}")
+    print(f"Model usage: {usage_summary()}")
+    if failed:
+        print(f"{len(failed)} model calls failed (not scored):")
+        for query, model, error in failed[:5]:
+            print(f"  {model} | {query[:60]} | {error[:200]}")
+
+
+# -------------------------------------------------------------
+# 7) MAIN NODE (Final output looks like ChatGPT / Perplexity)
+# -------------------------------------------------------------
+def llm_query_executor(state: VisibilityState):
+
+    if not getattr(state, "generated_queries", None):
+        return {"generated_queries": state.generated_queries}
+
+    # The run's models (state.models, else config.FIRE_QUERY_MODELS)
+    models = resolve_models(state.models)
+
+    queries = [
+        Query(**qdict) if not isinstance(qdict, Query) else qdict
+        for qdict in state.generated_queries
+    ]
+
+    # Resumed run: queries answered before the interruption are not fired again
+    progress = NodeProgress("fire_queries")
+    keys = [f"{i}:{q.query}" for i, q in enumerate(queries)]
+    pending_keys, pending = [], []
+    for key, q in zip(keys, queries):
+        if key in progress.done:
+            q.raw_response = progress.done[key]
+        else:
+            pending_keys.append(key)
+            pending.append(q)
+
+    def on_done(i: int, q: Query):
+        # Queries with failed model calls are fired again on resume
+        if has_answers(q.model_dump()):
+            progress.save(pending_keys[i], q.raw_response)
+
+    web_cache = start_run_cache()
 
-            q.raw_response[model_name] = answer
+    # Queries are updated in place, so output order matches generated_queries
+    asyncio.run(execute_queries(pending, models, state.refresh_answers, on_done))
 
-        updated_queries.append(q)
+    print(web_cache.summary())
+    log_failures(queries)
 
-    return {"generated_queries": [qq.model_dump() for qq in updated_queries]}
+    return {"generated_queries": [qq.model_dump() for qq in queries]}
@@ -1,77 +1,126 @@
+import uuid
+from typing import Any, Dict, List
+
+import config
 from models.state import VisibilityState
+from nodes.query_set import record_query_set
+from storage.progress_store import current_thread_id, get_progress_store
+from storage.report_store import write_report
+from storage.run_history import get_run_history
+
+
+def flatten_query(q: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Rows for one parsed query, one per raw_response key (model)."""
+    rows = []
+
+    # ---------------------------------------------------------
+    # TRUE MODEL SPLITTING BASED ONLY ON RAW_RESPONSE KEYS
+    # ---------------------------------------------------------
+    raw_resp = q.get("raw_response", {})
+    model_sources = list(raw_resp.keys())   # <-- Only source of split
+
+    # Every model call failed: nothing to score (the errors stay on the query)
+    if not model_sources and q.get("errors"):
+        return rows
+
+    # Safety fallback
+    if not model_sources:
+        model_sources = [None]
+
+    # Pre-extract competitive maps once
+    comp_dict = q.get("competitors", {})
+    comp_map = next(iter(comp_dict.values()), {})
+
+    competitors_brand_level = []
+    competitors_product_level = []
+
+    if isinstance(comp_map, dict):
+        for brand, models in comp_map.items():
+            competitors_brand_level.append(brand)
+
+            if isinstance(models, list):
+                for m in models:
+                    m_clean = (m or "").strip()
+                    if not m_clean:
+                        continue
+
+                    if not m_clean.lower().startswith(brand.lower()):
+                        competitors_product_level.append(f"{brand} {m_clean}")
+                    else:
+                        competitors_product_level.append(m_clean)
+
+    # ---------------------------------------------------------
+    # CREATE A ROW PER RAW_RESPONSE KEY
+    # ---------------------------------------------------------
+    for model_name in model_sources:
+        clean_model_name = model_name.split(":", 1)[0] if isinstance(model_name, str) else model_name
+        row = {
+            "query": q.get("query"),
+            "category": q.get("category"),
+            "raw_response": raw_resp.get(model_name),
+            "brand_mentioned": bool(
+                next(iter(q.get("brand_mentioned", {}).values()), False)
+            ),
+            "model_name": clean_model_name,
+        }
+
+        # Correct rank assignment: match parser name
+        rank_dict = q.get("rank", {})
+        rank_val = rank_dict.get(model_name)
+        row["rank"] = rank_val if isinstance(rank_val, int) else None
+
+        row["competitors_brand_level"] = competitors_brand_level
+        row["competitors_product_level"] = competitors_product_level
+
+        rows.append(row)
+
+    return rows
+
+
+def finalize_report(state: VisibilityState, flattened_rows: List[Dict[str, Any]],
+                    fired_queries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Writes the report (plus the query store and run history records) and returns the flatten state update."""
+    df = pd.DataFrame(flattened_rows)
+    report_path = write_report(df, state.report_path)
+
+    # Only the queries fired in this run get a new answered_at
+    if config.QUERY_STORE_PATH:
+        record_query_set(state, fired_queries)
+
+    # A resumed run keeps its thread_id, so it replaces its own history entry
+    thread_id = current_thread_id()
+    if config.RUN_HISTORY_PATH:
+        get_run_history().record_run(
+            thread_id or uuid.uuid4().hex,
+            state.brand_name,
+            df,
+            region=state.region,
+            industry=state.detected_industry,
+            report_path=report_path
+        )
+
+    # fire_queries / parser results are in the checkpointed state by now:
+    # the per-item progress of this run is no longer needed
+    if config.CHECKPOINT_PATH and thread_id:
+        get_progress_store().clear(thread_id)
+
+    return {
+        "flattened_rows": flattened_rows,
+        "flattened_df": df,
+        "report_path": report_path
+    }
 
 
 def flatten_all_queries(state: VisibilityState):
 
-    generated_queries = state.generated_queries
+    # Incremental runs: stored results of still-fresh queries come first
+    generated_queries = state.reused_queries + state.generated_queries
     flattened_rows = []
 
     for q in generated_queries:
+        flattened_rows.extend(flatten_query(q))
 
-        # ---------------------------------------------------------
-        # TRUE MODEL SPLITTING BASED ONLY ON RAW_RESPONSE KEYS
-        # ---------------------------------------------------------
-        raw_resp = q.get("raw_response", {})
-        model_sources = list(raw_resp.keys())   # <-- Only source of split
-
-        # Safety fallback
-        if not model_sources:
-            model_sources = [None]
-
-        # Pre-extract competitive maps once
-        comp_dict = q.get("competitors", {})
-        comp_map = next(iter(comp_dict.values()), {})
-
-        competitors_brand_level = []
-        competitors_product_level = []
-
-        if isinstance(comp_map, dict):
-            for brand, models in comp_map.items():
-                competitors_brand_level.append(brand)
-
-                if isinstance(models, list):
-                    for m in models:
-                        m_clean = (m or "").strip()
-                        if not m_clean:
-                            continue
-
-                        if not m_clean.lower().startswith(brand.lower()):
-                            competitors_product_level.append(f"{brand} {m_clean}")
-                        else:
-                            competitors_product_level.append(m_clean)
-
-        # ---------------------------------------------------------
-        # CREATE A ROW PER RAW_RESPONSE KEY
-        # ---------------------------------------------------------
-        for model_name in model_sources:
-            clean_model_name = model_name.split(":", 1)[0] if isinstance(model_name, str) else model_name
-            row = {
-                "query": q.get("query"),
-                "category": q.get("category"),
-                "raw_response": raw_resp.get(model_name),
-                "brand_mentioned": bool(
-                    next(iter(q.get("brand_mentioned", {}).values()), False)
-                ),
-                "model_name": clean_model_name,
-            }
-
-            # Correct rank assignment: match parser name
-            rank_dict = q.get("rank", {})
-            rank_val = rank_dict.get(model_name)
-            row["rank"] = rank_val if isinstance(rank_val, int) else None
-
-            row["competitors_brand_level"] = competitors_brand_level
-            row["competitors_product_level"] = competitors_product_level
-
-            flattened_rows.append(row)
-
-    df = pd.DataFrame(flattened_rows)
-    export_df_to_json(df, "output/visibility_report.json")
-
-    return {
-        "flattened_rows": flattened_rows,
-        "flattened_df": df
-    }
+    return finalize_report(state, flattened_rows, state.generated_queries)
 
 
 import os
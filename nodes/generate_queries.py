@@ -1,13 +1,20 @@
+import asyncio
 import random
-from typing import Dict, List
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import json
 from pydantic import SecretStr
 
 import config
+from llm_utils.completion_cache import cached_completion
 from models.query_models import Query   # your pydantic model
 from langchain_openai import ChatOpenAI
 
 from models.state import VisibilityState
+from text_utils.similarity import WORD, NearDuplicateIndex, normalize_text
 
 
 def compute_category_distribution(num_queries: int) -> Dict[str, int]:
@@ -253,21 +260,77 @@ FORBIDDEN:
     return base
 
 
-def call_llm_for_queries(prompt: str, n: int) -> List[str]:
+_query_llm = None
+_query_llm_lock = threading.Lock()
+
+
+def get_query_llm() -> ChatOpenAI:
+    """One ChatOpenAI client shared by every category (and run)."""
+    global _query_llm
+    with _query_llm_lock:
+        if _query_llm is None:
+            _query_llm = ChatOpenAI(
+                model_name="gpt-4o-mini",
+                temperature=0.7,
+                max_tokens=800,
+                max_retries=0,
+                openai_api_key=SecretStr(config.OPEN_AI_API_KEY),
+                openai_api_base=config.OPENAI_BASE_URL
+            )
+        return _query_llm
+
+
+# Complete JSON string literals, found while the array is still streaming in
+JSON_STRING = re.compile(r'"((?:[^"\\\n]|\\.)*)"')
+
+# Words that do not change what a query asks for
+QUERY_FILLER = {"a", "an", "the", "in", "of", "to", "is", "are", "which", "what"}
+
+
+def query_key(text: str) -> str:
     """
-    Calls LLM with deterministic output count.
+    Canonical form for duplicate checks: lowercase word tokens, naive
+    plural folding, filler words dropped, sorted (word order ignored).
+    """
+    words = []
+    for w in WORD.findall(text.lower()):
+        if w in QUERY_FILLER:
+            continue
+        if len(w) > 3 and w.endswith("s") and not w.endswith("ss"):
+            w = w[:-1]
+        words.append(w)
+    return " ".join(sorted(words))
+
+
+class QueryDeduplicator:
     """
+    Thread-safe filter shared by every category of a run: exact duplicates
+    by hash of query_key(), near duplicates by word-set similarity
+    (MinHash / LSH over query_key tokens) at or above threshold.
+    """
+
+    def __init__(self, threshold: float):
+        self._index = NearDuplicateIndex(threshold=threshold, shingle_size=1)
+        self._lock = threading.Lock()
+        self.dropped = 0
 
-    llm = ChatOpenAI(
-        model_name="gpt-4o-mini",
-        temperature=0.7,
-        max_tokens=800,
-        openai_api_key=SecretStr(config.OPEN_AI_API_KEY)
-    )
+    def add(self, text: str) -> bool:
+        key = query_key(text)
+        if not key:
+            return False
+        with self._lock:
+            if self._index.add_if_new(key, min_words=3):
+                return True
+            self.dropped += 1
+            return False
 
-    response = llm.invoke(prompt + f"\nGenerate exactly {n} queries.")
 
-    raw = response.content.strip()
+def parse_query_list(raw: str) -> List[str]:
+    """
+    The JSON array of query strings in an LLM reply. A reply cut off by
+    max_tokens keeps the strings that were complete.
+    """
+    raw = raw.strip()
 
     # Step 1: remove code fences if present
     raw = raw.replace("```json", "").replace("```", "").strip()
@@ -276,6 +339,10 @@ def call_llm_for_queries(prompt: str, n: int) -> List[str]:
     try:
         parsed = json.loads(raw)
     except json.JSONDecodeError:
+        # Truncated array: salvage the complete strings
+        salvaged = [json.loads(f'"{m}"') for m in JSON_STRING.findall(raw[raw.find("["):])] if raw.startswith("[") else []
+        if salvaged:
+            return salvaged
         raise ValueError(f"LLM output is not valid JSON:\n{raw}")
 
     # Step 3: Ensure parsed is list[str]
@@ -294,30 +361,220 @@ def call_llm_for_queries(prompt: str, n: int) -> List[str]:
     raise ValueError(f"LLM output is not a list of strings:\n{parsed}")
 
 
-def query_generator(state: VisibilityState):
+def build_chunk_prompt(prompt: str, n: int, avoid: List[str]) -> str:
+    # The first chunk (nothing to avoid yet) is the same prompt as a single-call run
+    full_prompt = prompt
+    if avoid:
+        full_prompt += (
+            "\nThese queries were already generated. Do NOT repeat or rephrase them:\n"
+            + json.dumps(avoid, ensure_ascii=False)
+        )
+    return full_prompt + f"\nGenerate exactly {n} queries."
+
+
+def call_llm_for_queries(prompt: str, n: int, refresh: bool = False, avoid: Optional[List[str]] = None,
+                         on_query: Optional[Callable[[str], None]] = None) -> List[str]:
+    """
+    Calls LLM with deterministic output count.
+    refresh=True bypasses the completion cache (used when retrying bad JSON).
+    The reply is streamed; on_query gets each query as soon as its JSON
+    string is complete (cached replies are replayed through it as well).
+    """
+
+    llm = get_query_llm()
+    full_prompt = build_chunk_prompt(prompt, n, avoid or [])
+    emitted = 0
+
+    def emit_complete(text: str):
+        nonlocal emitted
+        start = text.find("[")
+        if start < 0:
+            return
+        found = JSON_STRING.findall(text, start)
+        for literal in found[emitted:]:
+            emitted += 1
+            if on_query:
+                on_query(json.loads(f'"{literal}"'))
+
+    def fetch():
+        text = ""
+        for chunk in llm.stream(full_prompt):
+            text += chunk.content
+            # A literal still being streamed has no closing quote yet, so it does not match
+            emit_complete(text)
+        return text
+
+    raw = cached_completion("openai", "gpt-4o-mini", full_prompt, 0.7, 800, fetch, refresh=refresh)
+
+    queries = parse_query_list(raw)
+    if on_query:
+        for q in queries[emitted:]:
+            on_query(q)
+    return queries
+
+
+async def generate_category(category: str, prompt: str, quota: int, semaphore: asyncio.Semaphore,
+                            retries: int, dedup: QueryDeduplicator) -> List[str]:
+    """
+    Queries for one category, requested QUERY_GEN_CHUNK_SIZE at a time
+    until the quota of unique queries is met. Each new chunk is told which
+    queries it must not repeat.
+
+    Unusable output (bad JSON, wrong shape) is retried for this chunk only,
+    with a fresh completion each time. Generation stops early (with fewer
+    queries) when retries run out or chunks stop producing new queries.
+    """
+    chunk_size = max(1, config.QUERY_GEN_CHUNK_SIZE)
+    accepted: List[str] = []
+
+    def on_query(text: str):
+        if len(accepted) < quota and dedup.add(text):
+            accepted.append(text)
+
+    max_chunks = 2 * -(-quota // chunk_size) + 2
+    stalled = 0
+    for _ in range(max_chunks):
+        if len(accepted) >= quota or stalled >= 2:
+            break
+
+        before = len(accepted)
+        n = min(chunk_size, quota - len(accepted))
+        avoid = accepted[-config.QUERY_GEN_AVOID_LIMIT:]
+
+        for attempt in range(retries + 1):
+            try:
+                async with semaphore:
+                    await asyncio.to_thread(call_llm_for_queries, prompt, n, attempt > 0, avoid, on_query)
+                break
+            except (ValueError, json.JSONDecodeError) as e:
+                print(f"Query generation for '{category}' failed (attempt {attempt + 1}/{retries + 1}): {e}")
+        else:
+            break
+
+        stalled = stalled + 1 if len(accepted) == before else 0
+
+    if len(accepted) < quota:
+        print(f"Query generation for '{category}': {len(accepted)}/{quota} unique queries")
+    return accepted
+
 
+async def generate_all_categories(prompts: Dict[str, str], category_counts: Dict[str, int],
+                                  dedup: QueryDeduplicator) -> Dict[str, List[str]]:
+    limit = max(1, config.QUERY_GEN_CONCURRENCY)
+    semaphore = asyncio.Semaphore(limit)
+
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=limit))
+
+    categories = [c for c, count in category_counts.items() if count > 0]
+    results = await asyncio.gather(*(
+        generate_category(c, prompts[c], category_counts[c], semaphore, config.QUERY_GEN_RETRIES, dedup)
+        for c in categories
+    ))
+    return dict(zip(categories, results))
+
+
+def generate_query_texts(state: VisibilityState, category_counts: Dict[str, int],
+                         existing: Iterable[str] = ()) -> Dict[str, List[str]]:
+    """
+    category -> new query texts, quotas from category_counts.
+    Anything in `existing` counts as already generated (duplicates of it are dropped).
+    """
     brand = state.brand_name
     industry = state.detected_industry or ""
     competitors = state.competitors or []        # if no competitors → no competitor queries
-    num_queries = state.num_queries
     region = state.region or "Global"
 
-    category_counts = compute_category_distribution(num_queries)
-    final_queries: List[Query] = []
-
-    for category, count in category_counts.items():
-
-        prompt = build_generation_prompt(
+    prompts = {
+        category: build_generation_prompt(
             category=category,
             brand=brand,
             industry=industry,
             competitors=competitors,
             region=region
         )
+        for category in category_counts
+    }
+
+    # All categories are generated concurrently, deduplicated across categories
+    dedup = QueryDeduplicator(config.QUERY_DEDUP_THRESHOLD)
+    for text in existing:
+        dedup.add(text)
+    dedup.dropped = 0
+
+    generated = asyncio.run(generate_all_categories(prompts, category_counts, dedup))
+    if dedup.dropped:
+        print(f"Dropped {dedup.dropped} duplicate / near-duplicate queries")
+    return generated
+
+
+class SharedQueryPool:
+    """
+    Generic-category queries (best_of / budget: no brand or competitor in
+    them) shared by every brand of a batch with the same industry and
+    region. The first brand to ask generates them; later brands get the
+    same texts, so their searches and answers are cache hits and only the
+    parsing is per brand. A larger quota tops the pool up.
+    """
+
+    def __init__(self, categories: Iterable[str]):
+        self.categories = set(categories)
+        self._pools: Dict[Tuple[str, str], Dict[str, List[str]]] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def take(self, state: VisibilityState, category_counts: Dict[str, int]) -> Dict[str, List[str]]:
+        key = (normalize_text(state.detected_industry or ""), normalize_text(state.region or "Global"))
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        # Brands with the same key wait for the one generating
+        with key_lock:
+            pool = self._pools.setdefault(key, {})
+            missing = {
+                c: n - len(pool.get(c, []))
+                for c, n in category_counts.items() if n > len(pool.get(c, []))
+            }
+            if missing:
+                existing = [q for qs in pool.values() for q in qs]
+                for c, texts in generate_query_texts(state, missing, existing).items():
+                    pool.setdefault(c, []).extend(texts)
 
-        raw_list = call_llm_for_queries(prompt, count)
+            return {c: pool.get(c, [])[:n] for c, n in category_counts.items()}
 
-        for qtext in raw_list:
+
+_shared_query_pool: Optional[SharedQueryPool] = None
+
+
+@contextmanager
+def shared_query_pool(categories: Iterable[str]):
+    """query_generator takes the given categories from one pool inside this block."""
+    global _shared_query_pool
+    _shared_query_pool = SharedQueryPool(categories)
+    try:
+        yield _shared_query_pool
+    finally:
+        _shared_query_pool = None
+
+
+def query_generator(state: VisibilityState):
+
+    category_counts = compute_category_distribution(state.num_queries)
+
+    pool = _shared_query_pool
+    if pool is None:
+        generated = generate_query_texts(state, category_counts)
+    else:
+        # Batch run: generic categories come from the shared pool
+        generated = pool.take(state, {c: n for c, n in category_counts.items() if c in pool.categories})
+        own_counts = {c: n for c, n in category_counts.items() if c not in pool.categories}
+        shared = [q for qs in generated.values() for q in qs]
+        generated.update(generate_query_texts(state, own_counts, existing=shared))
+
+    # Assembled in category order, as the sequential loop did, then shuffled
+    final_queries: List[Query] = []
+    for category in category_counts:
+        for qtext in generated.get(category, []):
 
             q = Query(
                 query=qtext,
@@ -1,17 +1,18 @@
-from openai import OpenAI
+import json
 
-import config
+from llm_utils.clients import get_openai_client
+from llm_utils.completion_cache import cached_completion
 from models.state import VisibilityState
 
 
 def industry_detector(state: VisibilityState):
 
-    extracted_text = state.extracted_content
+    extracted_text = state.condensed_content or state.extracted_content
 
     if not extracted_text or extracted_text.startswith("ERROR"):
         return {"detected_industry": "unknown"}
 
-    client = OpenAI(api_key=config.OPEN_AI_API_KEY)
+    client = get_openai_client()
 
     prompt = f"""
 You are an industry classifier.
@@ -41,15 +42,20 @@ Website text:
 {extracted_text}
 """
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "Return only the industry name."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0
-    )
-
-    industry = response.choices[0].message.content.strip().strip('"')
+    messages = [
+        {"role": "system", "content": "Return only the industry name."},
+        {"role": "user", "content": prompt}
+    ]
+
+    def fetch():
+        response = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0
+        )
+        return response.choices[0].message.content
+
+    content = cached_completion("openai", "gpt-4o-mini", json.dumps(messages, ensure_ascii=False), 0, None, fetch)
+    industry = content.strip().strip('"')
 
     return {"detected_industry": industry}
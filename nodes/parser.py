@@ -1,24 +1,23 @@
+import hashlib
 import json
+from collections import Counter
+from typing import Any, Dict, List
+
 from openai import OpenAI, api_key
 
 import config
+from llm_utils.clients import get_openai_client
+from llm_utils.completion_cache import CacheMissError, cached_completion
+from llm_utils.rate_limiter import LLMCallError
 from models.query_models import Query
 from models.state import VisibilityState
+from storage.progress_store import NodeProgress
+from text_utils.rule_parser import RuleParser, compare_results
+from tracing.tracer import span
 
 PARSER_MODEL = "gpt-4o-mini"
 
-def build_generic_parser_prompt(raw_text: str, brand: str, original_query: str) -> str:
-    return f"""
-    You are a STRICT JSON parser with intelligent list detection.
-    Use ONLY the RAW_RESPONSE text. DO NOT guess or invent any facts.
-
-    Your task: extract:
-    - brand_mentioned (boolean)
-    - rank (integer or null)
-    - competitors (brand → product list)
-
-    Return exactly ONE JSON object and nothing else.
-
+PARSER_RULES = """\
     ===========================================================
     RANKING RULES (INTELLIGENT)
     ===========================================================
@@ -71,9 +70,9 @@ def build_generic_parser_prompt(raw_text: str, brand: str, original_query: str)
     "competitor_brand_name": [list of product models]
 
     Examples:
-    {{"Amazfit": ["Amazfit Bip U Pro"], "Noise": ["ColorFit Pro 3"]}}
+    {"Amazfit": ["Amazfit Bip U Pro"], "Noise": ["ColorFit Pro 3"]}
     If products are NOT mentioned:
-    {{"Amazfit": null, "Noise": null}}
+    {"Amazfit": null, "Noise": null}
 
     RULES:
     - competitor brand MUST be manufacturer/company name (NOT retailer)
@@ -91,9 +90,24 @@ def build_generic_parser_prompt(raw_text: str, brand: str, original_query: str)
     Shopify, Newegg, Croma, Reliance Digital, JD.com, MercadoLibre,
     Lazada, “online store”, “retailer”, “marketplace”, “website”.
 
-    If ONLY these appear → competitors MUST be {{}}.
+    If ONLY these appear → competitors MUST be {}.
 
-    ===========================================================
+"""
+
+
+def build_generic_parser_prompt(raw_text: str, brand: str, original_query: str) -> str:
+    return f"""
+    You are a STRICT JSON parser with intelligent list detection.
+    Use ONLY the RAW_RESPONSE text. DO NOT guess or invent any facts.
+
+    Your task: extract:
+    - brand_mentioned (boolean)
+    - rank (integer or null)
+    - competitors (brand → product list)
+
+    Return exactly ONE JSON object and nothing else.
+
+""" + PARSER_RULES + f"""    ===========================================================
     OUTPUT FORMAT (EXAMPLE):
     {{
       "brand_mentioned": true,
@@ -113,52 +127,326 @@ def build_generic_parser_prompt(raw_text: str, brand: str, original_query: str)
     QUERY: "{original_query}"
     """
 
-def response_parser(state: VisibilityState):
-    client = OpenAI(api_key=config.OPEN_AI_API_KEY)
 
-    if not getattr(state, "generated_queries", None):
-        return {"generated_queries": state.generated_queries}
+def build_batch_parser_prompt(items: List[Dict[str, str]], brand: str) -> str:
+    """
+    Same rules as build_generic_parser_prompt, sent once for N responses.
+    Each item is {"id", "query", "raw_text"}.
+    """
+    blocks = []
+    for item in items:
+        blocks.append(f"""
+    ===== ITEM id="{item['id']}" =====
+    QUERY: "{item['query']}"
+    RAW_RESPONSE:
+    \"\"\"{item['raw_text']}\"\"\"
+""")
+
+    return f"""
+    You are a STRICT JSON parser with intelligent list detection.
+    You will receive several ITEMS. Parse EACH item independently.
+    Use ONLY that item's RAW_RESPONSE text. DO NOT guess or invent any facts.
 
-    parsed_queries = []
+    Your task, for every item: extract:
+    - brand_mentioned (boolean)
+    - rank (integer or null)
+    - competitors (brand → product list)
+
+    Return exactly ONE JSON array and nothing else, with one object per item.
+
+""" + PARSER_RULES + f"""    ===========================================================
+    OUTPUT FORMAT (EXAMPLE):
+    [
+      {{
+        "id": "0",
+        "brand_mentioned": true,
+        "rank": 1,
+        "competitors": {{
+            "Amazfit": ["Amazfit Bip U Pro"],
+            "Samsung": ["Galaxy Watch"]
+        }}
+      }},
+      {{
+        "id": "1",
+        "brand_mentioned": false,
+        "rank": null,
+        "competitors": {{}}
+      }}
+    ]
+
+    Every item id below MUST appear exactly once in the array.
+
+    BRAND: "{brand}"
 
-    for q_dict in state.generated_queries:
-        q = Query(**q_dict)
+    ===========================================================
+    ITEMS:
+    {"".join(blocks)}
+    """
+
+
+def _strip_fences(content: str) -> str:
+    return content.replace("```json", "").replace("```", "").strip()
+
+
+def _chat(client, prompt: str, max_tokens: int, refresh: bool = False) -> str:
+    def fetch():
+        resp = client.chat.completions.create(
+            model=PARSER_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+            max_tokens=max_tokens,
+        )
+        return resp.choices[0].message.content.strip()
+
+    return cached_completion("openai", PARSER_MODEL, prompt, 0, max_tokens, fetch, refresh=refresh)
+
+
+def _to_result(parsed: dict) -> Dict[str, Any]:
+    return {
+        "brand_mentioned": parsed.get("brand_mentioned", False),
+        "rank": parsed.get("rank", None),
+        "competitors": parsed.get("competitors", []),
+    }
+
+
+# Worst-case fallback
+FALLBACK_RESULT = {"brand_mentioned": False, "rank": None, "competitors": []}
+
+
+def parse_single(client, item: Dict[str, str], brand: str) -> Dict[str, Any]:
+    prompt = build_generic_parser_prompt(
+        raw_text=item["raw_text"],
+        brand=brand,
+        original_query=item["query"]
+    )
+
+    # Garbled JSON is asked for once more with a fresh completion, so the
+    # bad answer is not what every later run reads from the cache
+    for refresh in (False, True):
+        try:
+            content = _chat(client, prompt, 200, refresh=refresh)
+            return _to_result(json.loads(content))
+
+        except (LLMCallError, CacheMissError):
+            # Provider failure or a replay without the recorded answer, not a
+            # bad parse: the node fails (and can be resumed) instead of scoring a fallback
+            raise
+        except Exception:
+            continue
+
+    return dict(FALLBACK_RESULT)
+
+
+def parse_batch(client, items: List[Dict[str, str]], brand: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Parse several responses in one call. Items the model drops or garbles
+    are retried on their own batch; a batch that fails completely is split
+    in half. Single items use the exact per-response prompt.
+    """
+    if len(items) == 1:
+        return {items[0]["id"]: parse_single(client, items[0], brand)}
+
+    prompt = build_batch_parser_prompt(items, brand)
+    results = {}
+
+    try:
+        content = _chat(client, prompt, 200 * len(items) + 50)
+        parsed = json.loads(_strip_fences(content))
+        if isinstance(parsed, dict):
+            parsed = next((v for v in parsed.values() if isinstance(v, list)), [])
+
+        wanted = {item["id"] for item in items}
+        for entry in parsed:
+            if isinstance(entry, dict) and str(entry.get("id")) in wanted and "brand_mentioned" in entry:
+                results[str(entry["id"])] = _to_result(entry)
+
+    except (LLMCallError, CacheMissError):
+        raise
+    except Exception:
+        results = {}
+
+    failed = [item for item in items if item["id"] not in results]
+    if not failed:
+        return results
+
+    if len(failed) == len(items):
+        mid = len(items) // 2
+        results.update(parse_batch(client, items[:mid], brand))
+        results.update(parse_batch(client, items[mid:], brand))
+    else:
+        results.update(parse_batch(client, failed, brand))
+
+    return results
+
+
+class ParseSession:
+    """
+    Incremental response parsing for one run.
+
+    Queries are submitted one at a time (in any order). Each (query, model)
+    response goes to the rule parser first; ambiguous ones (and the audit
+    sample) are queued and sent to the LLM PARSER_BATCH_SIZE at a time.
+    submit() and flush() return the indexes of the queries whose responses
+    are now all parsed; apply() writes the results onto a query.
+    """
+
+    def __init__(self, client, brand: str, competitors: List[str], progress: NodeProgress):
+        self.client = client
+        self.brand = brand
+        self.rule_parser = RuleParser(brand, competitors)
+        self.progress = progress
+        self.batch_size = max(1, config.PARSER_BATCH_SIZE)
+
+        self.stats = Counter()
+        self.results = {}
+        self.rule_guesses = {}
+        self.pending = []
+        self.total_items = 0
+
+        self._items_by_query: Dict[int, List[Dict[str, Any]]] = {}
+        self._outstanding: Dict[int, int] = {}
+
+    def submit(self, query_index: int, q: Query) -> List[int]:
+        # One work item per (query, model) pair
+        items = []
+        for model_key, raw in (q.raw_response or {}).items():
+            items.append({
+                "id": str(self.total_items),
+                "query_index": query_index,
+                "model_key": model_key,
+                "query": q.query,
+                "raw_text": _normalize_raw(raw),
+            })
+            self.total_items += 1
+
+        self._items_by_query[query_index] = items
+        self._outstanding[query_index] = len(items)
+        completed = [] if items else [query_index]
+
+        for item in items:
+            # Resumed run: results saved before the interruption are kept
+            item["progress_key"] = _progress_key(item)
+            if item["progress_key"] in self.progress.done:
+                self._resolve(item, self.progress.done[item["progress_key"]], completed)
+                self.rule_parser.learn(self.results[item["id"]].get("competitors"))
+                self.stats["resumed"] += 1
+                continue
+
+            # Local rules first; only ambiguous responses pay for an LLM call
+            with span("parse", "parse", method="rules", model_key=item["model_key"]) as s:
+                guess, confidence = self.rule_parser.parse(item["raw_text"])
+                s.set(confidence=round(confidence, 3))
+            self.rule_guesses[item["id"]] = guess
+            item["audited"] = False
+
+            if confidence >= config.RULE_PARSER_MIN_CONFIDENCE:
+                self.stats["rule_parsed"] += 1
+                if not _sampled_for_audit(item["raw_text"]):
+                    self._resolve(item, guess, completed)
+                    continue
+                item["audited"] = True
+
+            self.pending.append(item)
+            if len(self.pending) >= self.batch_size:
+                completed.extend(self.flush())
+
+        return completed
+
+    def flush(self) -> List[int]:
+        if not self.pending:
+            return []
+
+        completed = []
+        # Ids are local to a batch so the prompt stays cache-friendly
+        local = [dict(item, id=str(i)) for i, item in enumerate(self.pending)]
+        with span("parse", "parse", method="llm", items=len(local)):
+            batch_results = parse_batch(self.client, local, self.brand)
+
+        for item, local_item in zip(self.pending, local):
+            result = batch_results.get(local_item["id"], dict(FALLBACK_RESULT))
+            self.progress.save(item["progress_key"], result)
+            self.rule_parser.learn(result.get("competitors"))
+
+            kind = "audit" if item["audited"] else "llm"
+            for field, agrees in compare_results(self.rule_guesses[item["id"]], result).items():
+                self.stats[f"{kind}_{field}"] += agrees
+            self.stats[f"{kind}_total"] += 1
+
+            self._resolve(item, result, completed)
+
+        self.pending.clear()
+        return completed
+
+    def _resolve(self, item, result, completed: List[int]):
+        self.results[item["id"]] = result
+        qi = item["query_index"]
+        self._outstanding[qi] -= 1
+        if self._outstanding[qi] == 0:
+            completed.append(qi)
+
+    def apply(self, query_index: int, q: Query) -> Query:
         q.brand_mentioned = {}
         q.rank = {}
         q.competitors = {}
 
-        for model_key, raw in (q.raw_response or {}).items():
-            raw_text = _normalize_raw(raw)
-            prompt = build_generic_parser_prompt(
-                raw_text=raw_text,
-                brand=state.brand_name,
-                original_query=q.query
-            )
+        for item in self._items_by_query.get(query_index, []):
+            result = self.results[item["id"]]
+            q.brand_mentioned[item["model_key"]] = result["brand_mentioned"]
+            q.rank[item["model_key"]] = result["rank"]
+            q.competitors[item["model_key"]] = result["competitors"]
+        return q
+
+    def log_stats(self):
+        _log_rule_stats(self.stats, self.total_items)
+
 
-            try:
-                resp = client.chat.completions.create(
-                    model=PARSER_MODEL,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0,
-                    max_tokens=200,
-                )
+def response_parser(state: VisibilityState):
+    client = get_openai_client()
+
+    if not getattr(state, "generated_queries", None):
+        return {"generated_queries": state.generated_queries}
+
+    queries = [Query(**q_dict) for q_dict in state.generated_queries]
+
+    session = ParseSession(client, state.brand_name, state.competitors, NodeProgress("parser"))
+    for qi, q in enumerate(queries):
+        session.submit(qi, q)
+    session.flush()
+    session.log_stats()
 
-                content = resp.choices[0].message.content.strip()
-                parsed = json.loads(content)
+    parsed_queries = [session.apply(qi, q) for qi, q in enumerate(queries)]
 
-                q.brand_mentioned[model_key] = parsed.get("brand_mentioned", False)
-                q.rank[model_key] = parsed.get("rank", None)
-                q.competitors[model_key] = parsed.get("competitors", [])
+    return {"generated_queries": [q.model_dump() for q in parsed_queries]}
 
-            except Exception:
-                # Worst-case fallback
-                q.brand_mentioned[model_key] = False
-                q.rank[model_key] = None
-                q.competitors[model_key] = []
 
-        parsed_queries.append(q.model_dump())
+def _progress_key(item) -> str:
+    # The response hash keeps a stale record from matching a re-fired query
+    digest = hashlib.sha1(item["raw_text"].encode("utf-8")).hexdigest()[:16]
+    return f"{item['query_index']}:{item['model_key']}:{digest}"
+
+
+def _sampled_for_audit(raw_text: str) -> bool:
+    # Hash-based sampling keeps audits reproducible across runs
+    bucket = int(hashlib.sha1(raw_text.encode("utf-8")).hexdigest()[:8], 16) % 10000
+    return bucket < config.RULE_PARSER_AUDIT_RATE * 10000
+
+
+def _log_rule_stats(stats: Counter, total: int):
+    def pct(kind, field):
+        n = stats[f"{kind}_total"]
+        return f"{stats[f'{kind}_{field}'] / n * 100:.1f}%" if n else "n/a"
+
+    print(
+        f"rule parser: {stats['rule_parsed']}/{total} parsed locally, "
+        f"{stats['llm_total']} sent to LLM, {stats['audit_total']} audited"
+    )
+    for kind in ("llm", "audit"):
+        if stats[f"{kind}_total"]:
+            print(
+                f"  agreement with LLM ({kind}): brand {pct(kind, 'brand_mentioned')}, "
+                f"rank {pct(kind, 'rank')}, competitors {pct(kind, 'competitors')}"
+            )
 
-    return {"generated_queries": parsed_queries}
 
 def _normalize_raw(raw):
     """Minimal raw → text normalization, no heuristics."""
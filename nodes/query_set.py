@@ -0,0 +1,94 @@
+import time
+from typing import Any, Dict, List
+
+import config
+from models.query_models import Query
+from models.state import VisibilityState
+from nodes.generate_queries import compute_category_distribution, generate_query_texts, query_generator
+from storage.query_store import get_query_store, query_set_key
+
+
+def select_for_run(stored: List[Dict[str, Any]], category_counts: Dict[str, int]) -> List[Dict[str, Any]]:
+    """The first (oldest) stored queries of each category, up to its quota."""
+    taken = {c: 0 for c in category_counts}
+    selected = []
+    for entry in stored:
+        c = entry["category"]
+        if taken.get(c, 0) < category_counts.get(c, 0):
+            taken[c] += 1
+            selected.append(entry)
+    return selected
+
+
+def query_set_loader(state: VisibilityState):
+    """
+    Takes query_generator's place when QUERY_SET_MODE is "reuse" or "incremental".
+
+    The stored set for (brand, region, industry) is loaded; categories short
+    of their quota are topped up with newly generated queries (new ones are
+    added to the set). Without a stored set this is query_generator.
+
+    reuse:       every query is fired again
+    incremental: queries answered within QUERY_SET_FRESHNESS_DAYS keep their
+                 stored result (reused_queries); only stale and new queries
+                 are fired, bypassing the completion cache
+    """
+    mode = config.QUERY_SET_MODE
+    if not config.QUERY_STORE_PATH:
+        return query_generator(state)
+
+    store = get_query_store()
+    key = query_set_key(state.brand_name, state.region, state.detected_industry or "")
+
+    stored = store.load(key)
+    if not stored:
+        print(f"No stored query set for {key!r}, generating")
+        return query_generator(state)
+
+    category_counts = compute_category_distribution(state.num_queries)
+    selected = select_for_run(stored, category_counts)
+
+    # Top up categories the stored set cannot fill
+    missing = {c: n - sum(e["category"] == c for e in selected) for c, n in category_counts.items()}
+    missing = {c: n for c, n in missing.items() if n > 0}
+    new_entries = []
+    if missing:
+        generated = generate_query_texts(state, missing, existing=[e["query"] for e in stored])
+        new_entries = [
+            {"query": text, "category": c, "answered_at": None, "result": None}
+            for c in missing for text in generated.get(c, [])
+        ]
+        store.save_queries(key, new_entries)
+        selected.extend(new_entries)
+
+    if mode != "incremental":
+        print(f"Reusing {len(selected) - len(new_entries)} stored queries, {len(new_entries)} new")
+        return {
+            "generated_queries": [Query(query=e["query"], category=e["category"]).model_dump() for e in selected],
+            "reused_queries": []
+        }
+
+    cutoff = time.time() - config.QUERY_SET_FRESHNESS_DAYS * 24 * 3600
+    fresh = [e for e in selected if e["answered_at"] and e["answered_at"] >= cutoff and e["result"]]
+    fresh_ids = {id(e) for e in fresh}
+    to_fire = [e for e in selected if id(e) not in fresh_ids]
+
+    print(f"Incremental run: {len(fresh)} queries reused, {len(to_fire)} to fire")
+
+    return {
+        "generated_queries": [Query(query=e["query"], category=e["category"]).model_dump() for e in to_fire],
+        "reused_queries": [e["result"] for e in fresh],
+        "refresh_answers": True
+    }
+
+
+def record_query_set(state: VisibilityState, parsed_queries: List[Dict[str, Any]]):
+    """
+    Called by flatten_queries: stores this run's queries and their parsed
+    results. A "generate" run replaces the stored set for its key.
+    """
+    store = get_query_store()
+    key = query_set_key(state.brand_name, state.region, state.detected_industry or "")
+
+    store.save_queries(key, parsed_queries, replace=config.QUERY_SET_MODE == "generate")
+    store.save_results(key, parsed_queries)
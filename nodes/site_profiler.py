@@ -0,0 +1,96 @@
+import json
+
+from pydantic import ValidationError
+
+from llm_utils.clients import get_openai_client
+from llm_utils.completion_cache import cached_completion
+from models.site_profile import SITE_PROFILE_SCHEMA, SiteProfile
+from models.state import VisibilityState
+from nodes.competitor_discovery import competitor_extractor
+from nodes.industry_detector import industry_detector
+
+
+def build_site_profile_prompt(brand: str, extracted_text: str) -> str:
+    # Same rules as the industry_detector and competitor_extractor prompts, one pass over the text
+    return f"""
+You are a brand analyst. From the website text of the brand "{brand}", return:
+
+1. industry — the **commercial industry or product/service category** the brand operates in.
+   - A short phrase describing what the company SELLS (products/services), not research.
+   - Consumer/business facing (e.g., “headphones”, “skincare”, “pharmaceuticals”).
+   - NOT a scientific field (genomics, molecular biology, diagnostics) unless the company
+     directly SELLS those products/services to customers.
+   - Ignore research partners, scientific content, case studies, citations, academic language.
+   - If the text is unclear, infer the most likely COMMERCIAL category.
+
+2. competitors — companies that are DIRECT COMPETITORS of the brand: they sell similar
+   products/services to similar customers in the same industry.
+   - Include companies listed as “similar companies”, “alternatives”, “related brands”,
+     “companies like” or “customers also viewed”.
+   - If the text does not list competitors, INFER them from the industry and product domain.
+   - EXCLUDE the brand itself, retailers/marketplaces (Amazon, Walmart, Best Buy),
+     infrastructure/cloud providers unless they compete directly in the brand’s product space,
+     media studios unless the brand is in that industry, investors, clients, job boards,
+     staffing firms, and companies mentioned only incidentally.
+   - Aim for 3–15 high-quality competitors, no duplicates.
+
+3. product_lines — the brand's key product lines or service offerings as short names
+   (e.g., "Smartwatches", "Wireless earbuds"), at most 10, most prominent first.
+
+Website text:
+{extracted_text}
+"""
+
+
+def site_profiler(state: VisibilityState):
+    """
+    Industry, competitors and product lines from one structured-output call.
+    Replaces industry_detector + competitor_extractor when config.USE_SITE_PROFILE
+    is set; falls back to them if the response does not validate.
+    """
+    extracted_text = state.condensed_content or state.extracted_content
+    brand = state.brand_name
+
+    if not extracted_text or extracted_text.startswith("ERROR"):
+        return {"detected_industry": "unknown", "competitors": [], "product_lines": []}
+
+    client = get_openai_client()
+
+    messages = [
+        {"role": "system", "content": "Return the site profile as JSON."},
+        {"role": "user", "content": build_site_profile_prompt(brand, extracted_text)}
+    ]
+
+    def fetch():
+        response = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0,
+            response_format={"type": "json_schema", "json_schema": SITE_PROFILE_SCHEMA}
+        )
+        return response.choices[0].message.content
+
+    # The schema is part of the request, so it is part of the cache key too
+    cache_prompt = json.dumps({"messages": messages, "schema": SITE_PROFILE_SCHEMA}, ensure_ascii=False)
+    # An invalid profile is asked for once more with a fresh completion
+    # (overwriting the cached one) before falling back to separate calls
+    for refresh in (False, True):
+        raw = cached_completion("openai", "gpt-4o-mini", cache_prompt, 0, None, fetch, refresh=refresh)
+        try:
+            profile = SiteProfile.model_validate_json(raw or "")
+            break
+        except ValidationError as e:
+            print(f"Site profile failed validation (attempt {int(refresh) + 1}/2): {e}")
+    else:
+        print("Site profile unusable, using separate calls")
+        industry = industry_detector(state)["detected_industry"]
+        competitors = competitor_extractor(state.model_copy(update={"detected_industry": industry}))["competitors"]
+        return {"detected_industry": industry, "competitors": competitors, "product_lines": []}
+
+    competitors = [c for c in profile.competitors if c.lower() != brand.lower()]
+
+    return {
+        "detected_industry": profile.industry,
+        "competitors": competitors,
+        "product_lines": profile.product_lines
+    }
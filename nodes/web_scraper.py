@@ -1,7 +1,17 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from urllib.parse import urlparse
+
+import config
+from llm_utils.limits import provider_slot
 from models.state import VisibilityState
+from tracing.tracer import annotate, span
+from web_utils.html_extract import PAGE_SKIP_TAGS, extract
+from web_utils.http import get_session
+from web_utils.web_cache import get_run_cache, normalize_url, start_run_cache
 
 
 KEYWORDS = [
@@ -11,53 +21,148 @@ KEYWORDS = [
 ]
 
 
-def fetch_html(url: str):
+def fetch_html(url: str, timeout: float = 10):
+    with span("fetch", "fetch", url=url) as s:
+        fetched = []
+
+        def fetch(validators):
+            fetched.append(True)
+            return _fetch_html(url, validators, timeout)
+
+        # Pages go through the web cache: revalidated with ETag / Last-Modified, offline in replay mode
+        html = get_run_cache().page(url, fetch, namespace="html")
+        s.set(cache_hit=not fetched)
+        return html or None
+
+
+def _fetch_html(url: str, validators: Dict[str, str], timeout: float):
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
         "Accept-Language": "en-US,en;q=0.9"
     }
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        with provider_slot("fetch"):
+            response = get_session().get(url, headers=headers, timeout=timeout)
+        annotate(status=response.status_code, bytes=len(response.content))
+        if response.status_code == 304:
+            return None, validators
         response.raise_for_status()
-        return response.text
+        return response.text, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
     except Exception:
-        return None
+        return "", {}
 
 
 def clean_text(html: str):
-    soup = BeautifulSoup(html, "html.parser")
-
-    # Remove meaningless tags
-    for tag in soup(["script", "style", "noscript", "footer", "header", "nav", "form"]):
-        tag.decompose()
-
-    # Extract clean readable text
-    text = soup.get_text(separator=" ", strip=True)
-    text = " ".join(text.split())  # collapse whitespace
+    # Drops script/style/noscript/footer/header/nav/form subtrees, collapses whitespace
+    text, _ = extract(html, skip_tags=PAGE_SKIP_TAGS)
     return text
 
 
-def discover_relevant_links(base_url: str, html: str):
-    soup = BeautifulSoup(html, "html.parser")
+def filter_relevant_links(base_url: str, links: List[str]):
     domain = urlparse(base_url).netloc
+    relevant = []
 
-    links = set()
-
-    for a in soup.find_all("a", href=True):
-        href = a['href']
-
-        # Convert relative → absolute
-        full_url = urljoin(base_url, href)
-
+    for full_url in links:
         # Only include internal pages
         if domain not in full_url:
             continue
 
         # Only include business-relevant links
         if any(keyword in full_url.lower() for keyword in KEYWORDS):
-            links.add(full_url)
+            relevant.append(full_url)
+
+    return relevant
 
-    return list(links)
+
+def discover_relevant_links(base_url: str, html: str):
+    _, links = extract(html, base_url=base_url, collect_links=True)
+    return filter_relevant_links(base_url, links)
+
+
+def extract_page(base_url: str, html: str):
+    """Clean text and relevant links from a single parse of the page."""
+    text, links = extract(html, base_url=base_url, skip_tags=PAGE_SKIP_TAGS, collect_links=True)
+    return text, filter_relevant_links(base_url, links)
+
+
+def link_relevance(url: str) -> int:
+    """How many business KEYWORDS the URL hits; used to order the crawl."""
+    url = url.lower()
+    return sum(keyword in url for keyword in KEYWORDS)
+
+
+async def crawl(base_url: str, main_html: str, max_pages: int, max_depth: int,
+                per_host: int, deadline: float) -> Dict[str, Tuple[str, str]]:
+    """
+    Breadth-first crawl of relevant subpages, most relevant links first.
+    Each depth level is fetched concurrently (per_host requests per host at
+    most) and everything still running at the deadline is dropped: the
+    fetch threads are not waited for, so the crawl returns on time.
+    Returns url -> (html, clean text) in crawl order, main page first;
+    every page is parsed exactly once.
+    """
+    loop = asyncio.get_running_loop()
+    # Own pool, sized to the whole crawl (per_host only limits each host);
+    # asyncio.run would otherwise wait for fetches past the deadline
+    executor = ThreadPoolExecutor(max_workers=max(1, max_pages))
+    stop_at = loop.time() + deadline
+    host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    async def fetch(url: str):
+        limit = host_limits.setdefault(urlparse(url).netloc, asyncio.Semaphore(max(1, per_host)))
+        async with limit:
+            remaining = stop_at - loop.time()
+            if remaining <= 0:
+                return None
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(executor, context.run, fetch_html, url, min(10, remaining))
+
+    main_text, frontier = extract_page(base_url, main_html)
+    pages = {base_url: (main_html, main_text)}
+    seen = {normalize_url(base_url)}
+    depth = 1
+
+    try:
+        while frontier and depth <= max_depth and len(pages) < max_pages:
+            candidates = []
+            for link in sorted(frontier, key=lambda u: (-link_relevance(u), len(u), u)):
+                key = normalize_url(link)
+                if key not in seen:
+                    seen.add(key)
+                    candidates.append(link)
+
+            batch = candidates[:max_pages - len(pages)]
+            if not batch:
+                break
+
+            tasks = [asyncio.ensure_future(fetch(link)) for link in batch]
+            done, pending = await asyncio.wait(tasks, timeout=max(0, stop_at - loop.time()))
+            for task in pending:
+                task.cancel()
+
+            next_frontier: List[str] = []
+            for link, task in zip(batch, tasks):
+                html = task.result() if task in done else None
+                if html:
+                    text, links = extract_page(link, html)
+                    pages[link] = (html, text)
+                    if depth < max_depth:
+                        next_frontier.extend(links)
+
+            frontier = next_frontier
+            depth += 1
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return pages
 
 
 def web_scraper(state: VisibilityState):
@@ -65,13 +170,12 @@ def web_scraper(state: VisibilityState):
     Intelligent web scraper:
     - Scrapes main page
     - Detects business-relevant subpages
-    - Scrapes them too
+    - Crawls them concurrently (page budget, depth and deadline from config)
     - Returns clean + relevant text
     """
 
     base_url = state.website_url
-    all_text_chunks = []
-    raw_html_store = {}
+    web_cache = start_run_cache()
 
     # 1. Fetch main page
     main_html = fetch_html(base_url)
@@ -81,21 +185,21 @@ def web_scraper(state: VisibilityState):
             "extracted_content": ""
         }
 
-    raw_html_store[base_url] = main_html
-    all_text_chunks.append(clean_text(main_html))
-
-    # 2. Discover relevant subpages
-    links = discover_relevant_links(base_url, main_html)
-
-    # Limit to avoid huge crawls
-    links = links[:5]
-
-    # 3. Fetch & extract from subpages
-    for link in links:
-        sub_html = fetch_html(link)
-        if sub_html:
-            raw_html_store[link] = sub_html
-            all_text_chunks.append(clean_text(sub_html))
+    # 2. Discover & fetch relevant subpages
+    pages = asyncio.run(crawl(
+        base_url,
+        main_html,
+        max_pages=config.SCRAPER_MAX_PAGES,
+        max_depth=config.SCRAPER_MAX_DEPTH,
+        per_host=config.SCRAPER_PER_HOST_CONCURRENCY,
+        deadline=config.SCRAPER_DEADLINE_SECONDS
+    ))
+
+    # 3. Main page first, then subpages by relevance
+    raw_html_store = {url: html for url, (html, _) in pages.items()}
+    all_text_chunks = [text for _, text in pages.values()]
+
+    print(web_cache.summary())
 
     # Combine everything
     combined_text = " ".join(all_text_chunks)
@@ -0,0 +1,252 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import config
+
+# queued -> running -> done | failed | cancelled. "cancelling" asks the
+# worker to stop after the node in progress.
+FINISHED = ("done", "failed", "cancelled")
+
+_JOB_COLUMNS = ("job_id", "status", "brand", "params", "report_path", "worker", "created_at", "started_at",
+                "finished_at", "heartbeat_at", "current_node", "nodes_done", "nodes_total", "attempts", "error")
+
+
+class JobStore:
+    """
+    Pipeline jobs and their progress events, shared by the dashboard and
+    the worker processes (SQLite in WAL mode, so readers never wait).
+
+    The job id is also the run's checkpoint thread_id: a job that is
+    retried, or requeued after its worker died, resumes where it stopped.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                brand TEXT NOT NULL,
+                params TEXT NOT NULL,
+                report_path TEXT NOT NULL,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL,
+                current_node TEXT,
+                nodes_done INTEGER NOT NULL DEFAULT 0,
+                nodes_total INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                at REAL NOT NULL,
+                kind TEXT NOT NULL,
+                data TEXT,
+                PRIMARY KEY (job_id, seq)
+            ) WITHOUT ROWID;
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def _job(row) -> Dict[str, Any]:
+        job = dict(zip(_JOB_COLUMNS, row))
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def _add_event(self, job_id: str, kind: str, data: Optional[Dict[str, Any]]):
+        self._conn.execute(
+            "INSERT INTO job_events VALUES (?, "
+            "(SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?), ?, ?, ?)",
+            (job_id, job_id, time.time(), kind, json.dumps(data, default=str) if data is not None else None)
+        )
+
+    # -------------------------------------------------------------
+    # Dashboard side
+    # -------------------------------------------------------------
+    def submit(self, params: Dict[str, Any], report_path: Optional[str] = None, job_id: Optional[str] = None) -> str:
+        """Queues a run; params are VisibilityState fields. Returns the job id."""
+        job_id = job_id or uuid.uuid4().hex
+        report_path = report_path or os.path.join(config.JOB_OUTPUT_DIR, job_id, "visibility_report.json")
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, brand, params, report_path, created_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, params.get("brand_name", ""), json.dumps(params), report_path, time.time())
+            )
+            self._add_event(job_id, "queued", None)
+            self._conn.commit()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._job(row) if row else None
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent jobs first."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def events(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        """Events with seq > after, oldest first (poll with the last seq seen)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, at, kind, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after)
+            ).fetchall()
+        return [
+            {"seq": seq, "at": at, "kind": kind, "data": json.loads(data) if data else None}
+            for seq, at, kind, data in rows
+        ]
+
+    def last_event(self, job_id: str, kind: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM job_events WHERE job_id = ? AND kind = ? ORDER BY seq DESC LIMIT 1",
+                (job_id, kind)
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def cancel(self, job_id: str) -> bool:
+        """Queued jobs are cancelled at once, running ones after their current node."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = CASE status WHEN 'queued' THEN 'cancelled' ELSE 'cancelling' END, "
+                "finished_at = CASE status WHEN 'queued' THEN ? ELSE finished_at END "
+                "WHERE job_id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id)
+            )
+            if cur.rowcount:
+                self._add_event(job_id, "cancel_requested", None)
+            self._conn.commit()
+        return bool(cur.rowcount)
+
+    def retry(self, job_id: str) -> bool:
+        """Queues a failed / cancelled job again (it resumes from its checkpoint)."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, finished_at = NULL, error = NULL "
+                "WHERE job_id = ? AND status IN ('failed', 'cancelled')",
+                (job_id,)
+            )
+            if cur.rowcount:
+                self._add_event(job_id, "queued", {"retry": True})
+            self._conn.commit()
+        return bool(cur.rowcount)
+
+    # -------------------------------------------------------------
+    # Worker side
+    # -------------------------------------------------------------
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Atomically takes the oldest queued job (one statement, so two workers never get the same job)."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, heartbeat_at = ?, "
+                "attempts = attempts + 1 "
+                "WHERE job_id = (SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1) "
+                f"RETURNING {', '.join(_JOB_COLUMNS)}",
+                (worker, now, now)
+            ).fetchall()
+            row = rows[0] if rows else None
+            if row:
+                self._add_event(row[0], "started", {"worker": worker, "attempt": row[_JOB_COLUMNS.index("attempts")]})
+            self._conn.commit()
+        return self._job(row) if row else None
+
+    def requeue_stale(self, stale_seconds: float) -> int:
+        """
+        Running jobs whose worker stopped sending heartbeats go back to the
+        queue (ones being cancelled are cancelled). Returns how many were requeued.
+        """
+        now = time.time()
+        with self._lock:
+            cancelled = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? "
+                "WHERE status = 'cancelling' AND heartbeat_at < ? RETURNING job_id",
+                (now, now - stale_seconds)
+            ).fetchall()
+            for (job_id,) in cancelled:
+                self._add_event(job_id, "cancelled", {"reason": "worker heartbeat lost"})
+
+            requeued = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL "
+                "WHERE status = 'running' AND heartbeat_at < ? RETURNING job_id",
+                (now - stale_seconds,)
+            ).fetchall()
+            for (job_id,) in requeued:
+                self._add_event(job_id, "requeued", {"reason": "worker heartbeat lost"})
+            self._conn.commit()
+        return len(requeued)
+
+    def heartbeat(self, job_id: str) -> bool:
+        """Marks the job alive; False when a cancel was requested."""
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?", (time.time(), job_id))
+            self._conn.commit()
+            row = self._conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row) and row[0] != "cancelling"
+
+    def node_done(self, job_id: str, node: str, done: int, total: int):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET current_node = ?, nodes_done = ?, nodes_total = ?, heartbeat_at = ? "
+                "WHERE job_id = ?",
+                (node, done, total, time.time(), job_id)
+            )
+            self._add_event(job_id, "node", {"node": node, "done": done, "total": total})
+            self._conn.commit()
+
+    def add_event(self, job_id: str, kind: str, data: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self._add_event(job_id, kind, data)
+            self._conn.commit()
+
+    def finish(self, job_id: str, status: str, report_path: Optional[str] = None, error: Optional[str] = None,
+               data: Optional[Dict[str, Any]] = None):
+        if status not in FINISHED:
+            raise ValueError(f"Unknown final status '{status}' (expected one of {FINISHED})")
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ?, "
+                "report_path = COALESCE(?, report_path) WHERE job_id = ?",
+                (status, time.time(), error, report_path, job_id)
+            )
+            self._add_event(job_id, status, {**(data or {}), **({"error": error} if error else {})})
+            self._conn.commit()
+
+
+_job_store: Optional[JobStore] = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    global _job_store
+    with _job_store_lock:
+        if _job_store is None:
+            _job_store = JobStore(config.JOB_STORE_PATH)
+        return _job_store
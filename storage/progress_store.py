@@ -0,0 +1,101 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from langgraph.config import get_config
+
+import config
+
+
+def current_thread_id() -> Optional[str]:
+    """thread_id of the graph run executing this node (None outside a checkpointed run)."""
+    try:
+        return (get_config().get("configurable") or {}).get("thread_id")
+    except RuntimeError:
+        return None
+
+
+class ProgressStore:
+    """
+    Per-item progress inside long nodes, keyed by (thread_id, stage, item key).
+
+    The graph checkpointer only saves state between nodes; this lets a
+    resumed fire_queries / parser skip the items it finished before a crash.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS progress (
+                thread_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                item_key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (thread_id, stage, item_key)
+            )
+        """)
+        self._conn.commit()
+
+    def load(self, thread_id: str, stage: str) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_key, value FROM progress WHERE thread_id = ? AND stage = ?",
+                (thread_id, stage)
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def save(self, thread_id: str, stage: str, item_key: str, value: Any):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO progress (thread_id, stage, item_key, value, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (thread_id, stage, item_key, json.dumps(value, ensure_ascii=False), time.time())
+            )
+
+    def clear(self, thread_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM progress WHERE thread_id = ?", (thread_id,))
+
+
+class NodeProgress:
+    """
+    Progress of one stage for the current run. Without a thread_id (graph
+    not checkpointed) nothing is loaded or saved.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.thread_id = current_thread_id() if config.CHECKPOINT_PATH else None
+        self.done: Dict[str, Any] = (
+            get_progress_store().load(self.thread_id, stage) if self.thread_id else {}
+        )
+        if self.done:
+            print(f"{stage}: resuming, {len(self.done)} items already done")
+
+    def save(self, item_key: str, value: Any):
+        if self.thread_id:
+            get_progress_store().save(self.thread_id, self.stage, item_key, value)
+
+
+_progress_store: Optional[ProgressStore] = None
+_progress_store_lock = threading.Lock()
+
+
+def get_progress_store() -> ProgressStore:
+    global _progress_store
+    with _progress_store_lock:
+        if _progress_store is None:
+            _progress_store = ProgressStore(config.PROGRESS_PATH)
+        return _progress_store
@@ -0,0 +1,127 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import config
+from text_utils.similarity import normalize_text
+
+ERROR_PREFIXES = ("ERROR:", "NO_MODEL_AVAILABLE")
+
+
+def query_set_key(brand: str, region: str, industry: str) -> str:
+    # Case / punctuation differences in the detected industry still map to one set
+    return "|".join(normalize_text(v) for v in (brand, region, industry))
+
+
+def has_answers(parsed_query: Dict[str, Any]) -> bool:
+    """True when every model produced a real answer (no failed calls, no legacy ERROR placeholders)."""
+    raw = parsed_query.get("raw_response") or {}
+    return bool(raw) and not parsed_query.get("errors") and not any(
+        not isinstance(v, str) or v.startswith(ERROR_PREFIXES) for v in raw.values()
+    )
+
+
+class QueryStore:
+    """
+    Persistent query sets keyed by (brand, region, industry).
+
+    Each query keeps its category, position in the set, when it was added
+    and the last parsed result (the Query dict after response_parser) with
+    the time it was answered, so later runs can reuse the same queries and
+    skip the ones answered recently.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS queries (
+                set_key TEXT NOT NULL,
+                query_norm TEXT NOT NULL,
+                query TEXT NOT NULL,
+                category TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                added_at REAL NOT NULL,
+                result TEXT,
+                answered_at REAL,
+                PRIMARY KEY (set_key, query_norm)
+            )
+        """)
+        self._conn.commit()
+
+    def load(self, key: str) -> List[Dict[str, Any]]:
+        """Stored queries in set order: query, category, added_at, answered_at, result."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT query, category, added_at, answered_at, result FROM queries "
+                "WHERE set_key = ? ORDER BY position",
+                (key,)
+            ).fetchall()
+
+        return [
+            {
+                "query": query,
+                "category": category,
+                "added_at": added_at,
+                "answered_at": answered_at,
+                "result": json.loads(result) if result else None,
+            }
+            for query, category, added_at, answered_at, result in rows
+        ]
+
+    def save_queries(self, key: str, queries: Iterable[Dict[str, Any]], replace: bool = False):
+        """
+        Add queries to the set (existing ones keep their position and results).
+        replace=True drops the previous set first.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            if replace:
+                self._conn.execute("DELETE FROM queries WHERE set_key = ?", (key,))
+            (start,) = self._conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM queries WHERE set_key = ?", (key,)
+            ).fetchone()
+
+            for offset, q in enumerate(queries):
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO queries (set_key, query_norm, query, category, position, added_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, normalize_text(q["query"]), q["query"], q["category"], start + offset, now)
+                )
+
+    def save_results(self, key: str, parsed_queries: Iterable[Dict[str, Any]]):
+        """Record parsed results; answers containing errors are stored but not counted as answered."""
+        now = time.time()
+        with self._lock, self._conn:
+            for q in parsed_queries:
+                self._conn.execute(
+                    "UPDATE queries SET result = ?, answered_at = ? WHERE set_key = ? AND query_norm = ?",
+                    (
+                        json.dumps(q, ensure_ascii=False),
+                        now if has_answers(q) else None,
+                        key,
+                        normalize_text(q.get("query") or ""),
+                    )
+                )
+
+
+_query_store: Optional[QueryStore] = None
+_query_store_lock = threading.Lock()
+
+
+def get_query_store() -> QueryStore:
+    global _query_store
+    with _query_store_lock:
+        if _query_store is None:
+            _query_store = QueryStore(config.QUERY_STORE_PATH)
+        return _query_store
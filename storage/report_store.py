@@ -0,0 +1,121 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+
+import config
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: reports fall back to JSON
+    pa = pq = None
+
+EXTENSIONS = {"parquet": ".parquet", "json": ".json"}
+
+# Low-cardinality columns stored dictionary-encoded (pandas "category" on load)
+CATEGORICAL_COLUMNS = ("model_name", "category")
+LIST_COLUMNS = ("competitors_brand_level", "competitors_product_level")
+
+# Full answer text, by far the largest column; only read when asked for
+RESPONSE_COLUMNS = ("raw_response",)
+
+
+def report_format(fmt: Optional[str] = None) -> str:
+    fmt = fmt or config.REPORT_FORMAT
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unknown report format '{fmt}' (expected one of {sorted(EXTENSIONS)})")
+    if fmt == "parquet" and pq is None:
+        print("pyarrow is not installed; writing the report as JSON")
+        return "json"
+    return fmt
+
+
+def report_file(path: str, fmt: Optional[str] = None) -> str:
+    """path with the extension of the format (report paths are kept as .json in the state)."""
+    return os.path.splitext(path)[0] + EXTENSIONS[report_format(fmt)]
+
+
+def find_report(path: str) -> Optional[str]:
+    """The newest existing report for path in any format, or None."""
+    root = os.path.splitext(path)[0]
+    found = [root + ext for ext in EXTENSIONS.values() if os.path.exists(root + ext)]
+    return max(found, key=os.path.getmtime) if found else None
+
+
+def _arrow_table(df: pd.DataFrame):
+    # Parquet column chunks are read independently, so keeping raw_response as
+    # the last column lets readers skip it without touching the other pages
+    columns = [c for c in df.columns if c not in RESPONSE_COLUMNS] + [c for c in RESPONSE_COLUMNS if c in df.columns]
+    table = pa.Table.from_pandas(df[columns], preserve_index=False)
+
+    for name in CATEGORICAL_COLUMNS:
+        kind = table.schema.field(name).type if name in table.column_names else None
+        if kind is not None and (pa.types.is_string(kind) or pa.types.is_large_string(kind)):
+            i = table.column_names.index(name)
+            table = table.set_column(i, name, table.column(i).dictionary_encode())
+    for name in LIST_COLUMNS:
+        # All-empty lists would otherwise be stored as list<null>
+        if name in table.column_names and pa.types.is_list(table.schema.field(name).type):
+            i = table.column_names.index(name)
+            table = table.set_column(i, name, table.column(i).cast(pa.list_(pa.string())))
+    return table
+
+
+def write_report(data: Union[pd.DataFrame, List[Dict[str, Any]]], path: str, fmt: Optional[str] = None) -> str:
+    """Writes the flattened rows in the configured format and returns the file written."""
+    from nodes.flatten_queries import export_df_to_json
+
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    fmt = report_format(fmt)
+    target = report_file(path, fmt)
+    if fmt == "json":
+        return export_df_to_json(df, target, pretty=config.REPORT_JSON_PRETTY)
+
+    directory = os.path.dirname(target)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+
+    # Write then rename, so a dashboard never reads a half-written file
+    tmp = target + ".tmp"
+    pq.write_table(_arrow_table(df), tmp, compression="zstd", row_group_size=config.REPORT_ROW_GROUP_SIZE)
+    os.replace(tmp, target)
+    return target
+
+
+def load_report(path: str, columns: Optional[Sequence[str]] = None, with_responses: bool = False) -> pd.DataFrame:
+    """
+    Report rows as a DataFrame (model_name / category as pandas categoricals).
+    raw_response is left out unless with_responses or named in columns;
+    for Parquet it is then never read from disk.
+    """
+    if path.endswith(EXTENSIONS["parquet"]):
+        if pq is None:
+            raise ImportError("pyarrow is required to read Parquet reports")
+        if columns is None:
+            names = pq.read_schema(path).names
+            columns = [c for c in names if with_responses or c not in RESPONSE_COLUMNS]
+        categorical = [c for c in CATEGORICAL_COLUMNS if c in columns]
+        df = pq.read_table(path, columns=list(columns), read_dictionary=categorical).to_pandas()
+        # Dictionaries are in order of first appearance; sort them like the
+        # JSON path does, so groupby / selectbox order is the same for both
+        for name in categorical:
+            df[name] = df[name].cat.reorder_categories(sorted(df[name].cat.categories))
+        return df
+
+    with open(path, "r", encoding="utf-8") as f:
+        df = pd.DataFrame(json.load(f))
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    elif not with_responses:
+        df = df.drop(columns=[c for c in RESPONSE_COLUMNS if c in df.columns])
+    for name in CATEGORICAL_COLUMNS:
+        if name in df.columns:
+            df[name] = df[name].astype("category")
+    return df
+
+
+def load_responses(path: str) -> pd.DataFrame:
+    """query, model_name and raw_response only (the lazily loaded part of a report)."""
+    return load_report(path, columns=["query", "model_name", *RESPONSE_COLUMNS])
@@ -0,0 +1,225 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import config
+from text_utils.similarity import normalize_text
+
+
+def run_aggregates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per (model_name, category) counts of a report: rows, brand mentions,
+    competitor mentions in answers without the brand, ranked rows and the
+    sum of their ranks. Every dashboard score can be rebuilt from these.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=["model_name", "category", "rows", "mentioned",
+                                     "replacements", "ranked", "rank_sum"])
+
+    mentioned = df["brand_mentioned"].fillna(False).astype(bool)
+    competitors = df["competitors_brand_level"].map(lambda v: 0 if v is None else len(v))
+    rank = pd.to_numeric(df["rank"], errors="coerce") if "rank" in df.columns else pd.Series(np.nan, index=df.index)
+
+    frame = pd.DataFrame({
+        "model_name": df["model_name"].astype(object).fillna("").astype(str),
+        "category": df["category"].astype(object).fillna("").astype(str),
+        "rows": 1,
+        "mentioned": mentioned.astype(int),
+        "replacements": competitors.where(~mentioned, 0).astype(int),
+        "ranked": rank.notna().astype(int),
+        "rank_sum": rank.fillna(0.0),
+    })
+    return frame.groupby(["model_name", "category"], sort=False, observed=True).sum().reset_index()
+
+
+# -------------------------------------------------------------
+# Scores from aggregates (same formulas as streamlit_utils.charts)
+# -------------------------------------------------------------
+def brand_total_score(stats: pd.DataFrame) -> float:
+    """calculate_brand_total_score() of the rows behind stats."""
+    rows = stats["rows"].sum()
+    if not rows:
+        return 0.0
+
+    by_category = stats.groupby("category")["mentioned"].sum()
+    visibility_score = stats["mentioned"].sum() / rows * 100
+    category_score = (by_category > 0).sum() / len(by_category) * 100
+    competitor_penalty = stats["replacements"].sum() / max(rows, 1)
+    ranked = stats["ranked"].sum()
+    ranking_bonus = 100 - stats["rank_sum"].sum() / ranked * 20 if ranked else 50
+
+    final_score = (
+        0.45 * visibility_score +
+        0.25 * category_score +
+        0.15 * ranking_bonus +
+        0.15 * (100 * (1 - competitor_penalty))
+    ) / 100
+    return round(float(final_score) * 100, 2)
+
+
+def brand_score_by_model(stats: pd.DataFrame) -> int:
+    """calculate_brand_score_by_model() for the one model behind stats."""
+    rows = stats["rows"].sum()
+    if not rows:
+        return 0
+
+    recall = stats["mentioned"].sum() / rows * 100
+    ranked = stats["ranked"].sum()
+    rank_score = max(0, 100 - (stats["rank_sum"].sum() / ranked - 1) * 20) if ranked else 50
+    coverage = (stats["mentioned"] / stats["rows"]).mean() * 100
+
+    final_score = (0.4 * recall) + (0.3 * rank_score) + (0.3 * coverage)
+    return int(round(float(final_score), 2))
+
+
+class RunHistory:
+    """
+    Append-only history of finished runs, keyed by brand, run id and time.
+
+    Each run stores its per (model, category) aggregates rather than the
+    rows, so trends over any number of runs are a few indexed reads:
+    nothing is reloaded from the reports.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                brand_key TEXT NOT NULL,
+                brand TEXT NOT NULL,
+                region TEXT,
+                industry TEXT,
+                created_at REAL NOT NULL,
+                report_path TEXT,
+                num_rows INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS runs_by_brand ON runs (brand_key, created_at);
+
+            CREATE TABLE IF NOT EXISTS run_stats (
+                run_id TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                category TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                mentioned INTEGER NOT NULL,
+                replacements INTEGER NOT NULL,
+                ranked INTEGER NOT NULL,
+                rank_sum REAL NOT NULL,
+                PRIMARY KEY (run_id, model_name, category)
+            ) WITHOUT ROWID;
+        """)
+        self._conn.commit()
+
+    def record_run(self, run_id: str, brand: str, df: pd.DataFrame, region: Optional[str] = None,
+                   industry: Optional[str] = None, report_path: Optional[str] = None,
+                   created_at: Optional[float] = None):
+        """Adds a run (a resumed run with the same id replaces its earlier record)."""
+        stats = run_aggregates(df)
+        with self._lock:
+            self._conn.execute("DELETE FROM run_stats WHERE run_id = ?", (run_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, normalize_text(brand), brand, region, industry,
+                 created_at if created_at is not None else time.time(), report_path, len(df))
+            )
+            self._conn.executemany(
+                "INSERT INTO run_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, r.model_name, r.category, int(r.rows), int(r.mentioned), int(r.replacements),
+                  int(r.ranked), float(r.rank_sum)) for r in stats.itertuples(index=False)]
+            )
+            self._conn.commit()
+
+    def brands(self) -> List[str]:
+        """Brands with recorded runs, most recently run first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT brand FROM runs r WHERE created_at = "
+                "(SELECT MAX(created_at) FROM runs WHERE brand_key = r.brand_key) ORDER BY created_at DESC"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def runs(self, brand: str, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """The brand's runs, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id, brand, region, industry, created_at, report_path, num_rows FROM runs "
+                "WHERE brand_key = ? AND created_at >= ? ORDER BY created_at",
+                (normalize_text(brand), since or 0.0)
+            ).fetchall()
+        keys = ("run_id", "brand", "region", "industry", "created_at", "report_path", "num_rows")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def stats(self, brand: str, since: Optional[float] = None) -> pd.DataFrame:
+        """run_stats of the brand's runs, with created_at (oldest run first)."""
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT r.run_id, r.created_at, s.model_name, s.category, s.rows, s.mentioned, "
+                "s.replacements, s.ranked, s.rank_sum "
+                "FROM runs r JOIN run_stats s ON s.run_id = r.run_id "
+                "WHERE r.brand_key = ? AND r.created_at >= ? ORDER BY r.created_at",
+                self._conn, params=(normalize_text(brand), since or 0.0)
+            )
+
+    # -------------------------------------------------------------
+    # Trends (one row per run, oldest first)
+    # -------------------------------------------------------------
+    def brand_trend(self, brand: str, since: Optional[float] = None) -> pd.DataFrame:
+        """run_id, run_at, rows, visibility_percent and total_score per run."""
+        out = []
+        for (run_id, created_at), stats in self.stats(brand, since).groupby(["run_id", "created_at"], sort=False):
+            rows = int(stats["rows"].sum())
+            out.append({
+                "run_id": run_id,
+                "run_at": pd.to_datetime(created_at, unit="s"),
+                "rows": rows,
+                "visibility_percent": round(stats["mentioned"].sum() / rows * 100, 2) if rows else 0,
+                "total_score": brand_total_score(stats),
+            })
+        return pd.DataFrame(out, columns=["run_id", "run_at", "rows", "visibility_percent", "total_score"])
+
+    def model_trend(self, brand: str, since: Optional[float] = None) -> pd.DataFrame:
+        """calculate_brand_score_by_model per run and model."""
+        out = []
+        for (run_id, created_at, model), stats in self.stats(brand, since).groupby(
+                ["run_id", "created_at", "model_name"], sort=False):
+            out.append({
+                "run_id": run_id,
+                "run_at": pd.to_datetime(created_at, unit="s"),
+                "model_name": model,
+                "score": brand_score_by_model(stats),
+            })
+        return pd.DataFrame(out, columns=["run_id", "run_at", "model_name", "score"])
+
+    def category_trend(self, brand: str, since: Optional[float] = None) -> pd.DataFrame:
+        """Brand visibility % per run and category (all models together)."""
+        stats = self.stats(brand, since)
+        grouped = stats.groupby(["run_id", "created_at", "category"], sort=False)[["rows", "mentioned"]].sum()
+        grouped = grouped.reset_index()
+        grouped["run_at"] = pd.to_datetime(grouped["created_at"], unit="s")
+        grouped["visibility_percent"] = (grouped["mentioned"] / grouped["rows"] * 100).round(2)
+        return grouped[["run_id", "run_at", "category", "visibility_percent"]]
+
+
+_run_history: Optional[RunHistory] = None
+_run_history_lock = threading.Lock()
+
+
+def get_run_history() -> RunHistory:
+    global _run_history
+    with _run_history_lock:
+        if _run_history is None:
+            _run_history = RunHistory(config.RUN_HISTORY_PATH)
+        return _run_history
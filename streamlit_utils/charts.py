@@ -313,4 +313,66 @@ def plot_multi_model_category(results):
         template="plotly_white"
     )
 
-    return fig
\ No newline at end of file
+    return fig
+
+def plot_brand_trend(trend):
+    """trend: RunHistory.brand_trend() (one row per run)."""
+    fig = px.line(
+        trend,
+        x="run_at",
+        y=["total_score", "visibility_percent"],
+        markers=True,
+        title="Brand Score Over Time",
+        color_discrete_sequence=px.colors.qualitative.Set2
+    )
+
+    fig.update_layout(
+        yaxis_title="Score / Visibility (%)",
+        xaxis_title="Run",
+        legend_title="",
+        template="plotly_white"
+    )
+
+    return fig
+
+
+def plot_model_trend(trend):
+    """trend: RunHistory.model_trend() (one row per run and model)."""
+    fig = px.line(
+        trend,
+        x="run_at",
+        y="score",
+        color="model_name",
+        markers=True,
+        title="Brand Score by Model Over Time",
+        color_discrete_sequence=px.colors.qualitative.Set2
+    )
+
+    fig.update_layout(
+        yaxis_title="Score",
+        xaxis_title="Run",
+        template="plotly_white"
+    )
+
+    return fig
+
+
+def plot_category_trend(trend):
+    """trend: RunHistory.category_trend() (one row per run and category)."""
+    fig = px.line(
+        trend,
+        x="run_at",
+        y="visibility_percent",
+        color="category",
+        markers=True,
+        title="Category Visibility Over Time",
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+
+    fig.update_layout(
+        yaxis_title="Visibility (%)",
+        xaxis_title="Run",
+        template="plotly_white"
+    )
+
+    return fig
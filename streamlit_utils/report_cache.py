@@ -0,0 +1,86 @@
+import os
+from typing import Any, Dict, Tuple
+
+import pandas as pd
+import streamlit as st
+
+import config
+from storage.report_store import load_report, load_responses
+from streamlit_utils.charts import (calculate_brand_score_by_model, calculate_brand_total_score,
+                                    category_visibility_chart, competitor_heatmap, create_donut_chart,
+                                    generate_summary, plot_multi_model_category, plot_multi_model_visibility,
+                                    product_dominance_chart, raw_visibility_chart)
+from streamlit_utils.scoring import MultiModelScoringEngine
+
+# Streamlit reruns app.py on every widget change. Everything derived from a
+# report is cached per (path, mtime, size): a rewritten report is a new key,
+# and the LRU bound (DASHBOARD_CACHE_ENTRIES) drops old versions. The row
+# frames are shared (cache_resource) rather than unpickled on every rerun,
+# so callers must not modify them in place.
+
+
+def report_version(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+@st.cache_resource(max_entries=config.DASHBOARD_CACHE_ENTRIES, show_spinner=False)
+def _report(path: str, version: Tuple[int, int]) -> pd.DataFrame:
+    return load_report(path)
+
+
+@st.cache_resource(max_entries=config.DASHBOARD_CACHE_ENTRIES, show_spinner=False)
+def _responses(path: str, version: Tuple[int, int]) -> pd.DataFrame:
+    return load_responses(path)
+
+
+@st.cache_data(max_entries=config.DASHBOARD_CACHE_ENTRIES, show_spinner="Scoring report...")
+def _scores(path: str, version: Tuple[int, int]) -> Dict[str, Any]:
+    return MultiModelScoringEngine(_report(path, version)).run()
+
+
+@st.cache_data(max_entries=config.DASHBOARD_CACHE_ENTRIES, show_spinner="Building charts...")
+def _figures(path: str, version: Tuple[int, int]) -> Dict[str, Any]:
+    df = _report(path, version)
+    results = _scores(path, version)
+
+    models = {}
+    for model_name, model in results.items():
+        models[model_name] = {
+            "brand_score": create_donut_chart(calculate_brand_score_by_model(df, model_name),
+                                              f"Brand Visibility Score for {model_name}"),
+            "raw_visibility": raw_visibility_chart(model["raw_visibility"]),
+            "category_visibility": category_visibility_chart(model["category_visibility"]),
+            "product_dominance": product_dominance_chart(model["product_score"]),
+            "competitor_score": competitor_heatmap(model["competitor_score"]),
+            "summary": generate_summary(model, model_name),
+        }
+
+    return {
+        "multi_model_visibility": plot_multi_model_visibility(results),
+        "multi_model_category": plot_multi_model_category(results),
+        "brand_score": create_donut_chart(calculate_brand_total_score(df), "Brand Visibility Score - Overall"),
+        "models": models,
+    }
+
+
+def cached_report(path: str) -> pd.DataFrame:
+    """load_report(path) (without raw_response), once per report version."""
+    return _report(path, report_version(path))
+
+
+def cached_responses(path: str) -> pd.DataFrame:
+    return _responses(path, report_version(path))
+
+
+def cached_scores(path: str) -> Dict[str, Any]:
+    """MultiModelScoringEngine results per model, once per report version."""
+    return _scores(path, report_version(path))
+
+
+def cached_figures(path: str) -> Dict[str, Any]:
+    """
+    Every dashboard chart of the report, built once per report version:
+    the overall ones at the top level, each model's under "models".
+    """
+    return _figures(path, report_version(path))
@@ -2,6 +2,39 @@ import numpy as np
 from collections import defaultdict, Counter
 import pandas as pd
 
+import config
+from text_utils.mention_index import rescore_rows
+
+# Categories that count towards recall in the model-level score
+RECALL_CATEGORIES = ("comparison", "best_of", "budget")
+RANKING_QUALITY = 85  # placeholder since ranks missing
+BIAS = 30
+HALLUCINATION = 100
+
+
+def model_level_score(recall, coverage):
+    fairness = min(100, recall * 1.2)
+
+    final = (
+        0.25 * recall +
+        0.20 * RANKING_QUALITY +
+        0.20 * coverage +
+        0.15 * (100 - BIAS) +
+        0.10 * HALLUCINATION +
+        0.10 * fairness
+    )
+
+    return {
+        "recall": round(recall, 2),
+        "ranking_quality": RANKING_QUALITY,
+        "coverage": round(coverage, 2),
+        "bias": BIAS,
+        "hallucination_score": HALLUCINATION,
+        "fairness": round(fairness, 2),
+        "final_model_score": round(final, 2)
+    }
+
+
 class ModelScoringEngine:
     def __init__(self, model_name, responses):
         self.model_name = model_name
@@ -73,34 +106,12 @@ class ModelScoringEngine:
         }
 
     def compute_model_level_score(self):
-        relevant = [r for r in self.responses if r["category"] in ("comparison", "best_of", "budget")]
+        relevant = [r for r in self.responses if r["category"] in RECALL_CATEGORIES]
 
         recall = (sum(r["brand_mentioned"] for r in relevant) / max(len(relevant), 1)) * 100
-        ranking_quality = 85  # placeholder since ranks missing
-        coverage = np.mean([self.compute_category_visibility()[k]["visibility_percent"]
-                            for k in self.compute_category_visibility()])
-        bias = 30
-        hallucination = 100
-        fairness = min(100, recall * 1.2)
-
-        final = (
-            0.25 * recall +
-            0.20 * ranking_quality +
-            0.20 * coverage +
-            0.15 * (100 - bias) +
-            0.10 * hallucination +
-            0.10 * fairness
-        )
-
-        return {
-            "recall": round(recall, 2),
-            "ranking_quality": ranking_quality,
-            "coverage": round(coverage, 2),
-            "bias": bias,
-            "hallucination_score": hallucination,
-            "fairness": round(fairness, 2),
-            "final_model_score": round(final, 2)
-        }
+        categories = self.compute_category_visibility()
+        coverage = np.mean([v["visibility_percent"] for v in categories.values()])
+        return model_level_score(recall, coverage)
 
     def run(self):
         return {
@@ -113,14 +124,131 @@ class ModelScoringEngine:
         }
 
 
+class ColumnarScoringEngine:
+    """
+    ModelScoringEngine.run() for every model at once: one set of groupby /
+    bincount aggregates over the whole frame, with the competitor and
+    product lists exploded to one row per mention. Python only loops over
+    the aggregated (model, key) groups, so the result dicts (key order
+    included) match the per-model engine.
+    """
+
+    def __init__(self, df):
+        self.df = df
+
+    @staticmethod
+    def _counts(codes, keys, mentioned):
+        """(model, key, size, hits) per group, in order of first appearance."""
+        frame = pd.DataFrame({"model": codes, "key": keys, "mentioned": mentioned})
+        return (
+            frame.groupby(["model", "key"], sort=False, dropna=False)["mentioned"]
+            .agg(["size", "sum"])
+            .reset_index()
+        )
+
+    @staticmethod
+    def _explode(codes, mentioned, lists):
+        """One (model, mention, brand_mentioned) row per list item."""
+        items = pd.Series(lists.to_numpy(), copy=False).explode().dropna()
+        rows = items.index.to_numpy()
+        return codes[rows], items.to_numpy(), mentioned[rows]
+
+    @staticmethod
+    def _per_model(n, counts):
+        out = [[] for _ in range(n)]
+        for model, key, size, hits in zip(counts["model"].tolist(), counts["key"].tolist(),
+                                          counts["size"].tolist(), counts["sum"].tolist()):
+            out[model].append((key, size, hits))
+        return out
+
+    def run(self):
+        df = self.df[self.df["model_name"].notna()]
+        # object dtype: a categorical would factorize in its category order
+        codes, models = pd.factorize(df["model_name"].astype(object), sort=True)
+        n = len(models)
+        mentioned = df["brand_mentioned"].fillna(False).to_numpy(dtype=bool)
+        relevant = df["category"].isin(RECALL_CATEGORIES).to_numpy()
+
+        totals = np.bincount(codes, minlength=n).tolist()
+        hits = np.bincount(codes, weights=mentioned, minlength=n).astype(np.int64).tolist()
+        relevant_totals = np.bincount(codes, weights=relevant, minlength=n).astype(np.int64).tolist()
+        relevant_hits = np.bincount(codes, weights=relevant & mentioned, minlength=n).astype(np.int64).tolist()
+
+        categories = self._per_model(n, self._counts(codes, df["category"].to_numpy(dtype=object), mentioned))
+        competitors = self._per_model(
+            n, self._counts(*self._explode(codes, mentioned, df["competitors_brand_level"]))
+        )
+
+        p_codes, p_items, p_mentioned = self._explode(codes, mentioned, df["competitors_product_level"])
+        # Counter.most_common(): count descending, ties in order of first appearance
+        by_count = dict(by=["model", "size"], ascending=[True, False], kind="stable")
+        products = self._per_model(n, self._counts(p_codes, p_items, p_mentioned).sort_values(**by_count))
+        missed = ~p_mentioned
+        replaces = self._per_model(
+            n, self._counts(p_codes[missed], p_items[missed], p_mentioned[missed]).sort_values(**by_count)
+        )
+
+        results = {}
+        for m, model in enumerate(models):
+            category_visibility = {
+                cat: {"visibility_percent": round((hit / size) * 100, 2)} for cat, size, hit in categories[m]
+            }
+            recall = (relevant_hits[m] / max(relevant_totals[m], 1)) * 100
+            coverage = np.mean([v["visibility_percent"] for v in category_visibility.values()])
+
+            results[model] = {
+                "model_name": model,
+                "raw_visibility": {
+                    "total_queries": totals[m],
+                    "brand_mentioned": hits[m],
+                    "brand_missing": totals[m] - hits[m],
+                    "visibility_percent": round((hits[m] / totals[m]) * 100, 2) if totals[m] else 0
+                },
+                "category_visibility": category_visibility,
+                "competitor_score": {
+                    c: {
+                        "frequency": size,
+                        "wins": hit,
+                        "losses": size - hit,
+                        "win_loss_ratio": round(hit / (size - hit), 2) if size - hit else float("inf")
+                    }
+                    for c, size, hit in competitors[m]
+                },
+                "product_score": {
+                    "product_frequency": {p: size for p, size, _ in products[m]},
+                    "product_replaces_brand": {p: size for p, size, _ in replaces[m]}
+                },
+                "model_level_score": model_level_score(recall, coverage)
+            }
+        return results
+
+
 class MultiModelScoringEngine:
-    def __init__(self, flat_data):
+    def __init__(self, flat_data, mention_index=None, backend=None):
+        """
+        flat_data: flattened rows (list of dicts or a DataFrame).
+        mention_index: optional text_utils.mention_index.MentionIndex. When
+        given, competitor / product mentions found in raw_response are added
+        to what the parser emitted before scoring (no API calls needed).
+        backend: "columnar" or "rows" (default config.SCORING_BACKEND).
+        """
         self.flat_data = flat_data
+        self.mention_index = mention_index
+        self.backend = backend or config.SCORING_BACKEND
 
     def run(self):
-        df = pd.DataFrame(self.flat_data)
+        rows = self.flat_data
+        if self.mention_index is not None:
+            if isinstance(rows, pd.DataFrame):
+                rows = rows.to_dict(orient="records")
+            rows = rescore_rows(list(rows), self.mention_index)
+
+        df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+        if self.backend == "columnar":
+            return ColumnarScoringEngine(df).run()
+
         results = {}
         for model, group in df.groupby("model_name"):
             engine = ModelScoringEngine(model, group.to_dict(orient="records"))
             results[model] = engine.run()
-        return results
\ No newline at end of file
+        return results
@@ -0,0 +1,186 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def normalize_alias(alias: str) -> str:
+    return " ".join((alias or "").lower().split())
+
+
+def _trie_pattern(node: Dict[str, Any]) -> str:
+    """
+    Regex for every word in a trie. Shared prefixes are factored out, so
+    the regex engine walks the trie instead of retrying each alias
+    (an Aho-Corasick style scan, executed by the C regex engine).
+    """
+    ends_here = "" in node
+    branches = []
+    for ch in sorted(k for k in node if k):
+        atom = r"\s+" if ch == " " else re.escape(ch)
+        branches.append(atom + _trie_pattern(node[ch]))
+
+    if not branches:
+        return ""
+
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if ends_here:
+        # Greedy "?" prefers the longer alias and falls back to this one
+        return "(?:" + body + ")?"
+    return body
+
+
+class MentionIndex:
+    """
+    Case-insensitive whole-word matcher for a fixed set of aliases.
+
+    Built once from {alias: payload}; scan() finds every non-overlapping
+    leftmost-longest alias in a single linear pass over the text.
+    """
+
+    def __init__(self, entries: Dict[str, Any]):
+        self._payloads: Dict[str, Any] = {}
+        trie: Dict[str, Any] = {}
+
+        for alias, payload in entries.items():
+            key = normalize_alias(alias)
+            if not key or key in self._payloads:
+                continue
+            self._payloads[key] = payload
+
+            node = trie
+            for ch in key:
+                node = node.setdefault(ch, {})
+            node[""] = True
+
+        # Texts are lowercased before scanning: a case-sensitive pattern is
+        # about twice as fast as re.IGNORECASE. The ignore-case variant is
+        # only used when lowercasing would shift character offsets.
+        body = r"(?<!\w)(?:" + _trie_pattern(trie) + r")(?!\w)"
+        self._pattern = re.compile(body) if self._payloads else None
+        self._pattern_ignore_case = re.compile(body, re.IGNORECASE) if self._payloads else None
+
+    def __len__(self):
+        return len(self._payloads)
+
+    def get(self, alias: str) -> Optional[Any]:
+        return self._payloads.get(normalize_alias(alias))
+
+    def owner_of(self, alias: str) -> Optional[str]:
+        """Owner of a for_brand() entry (brand / competitor name)."""
+        payload = self.get(alias)
+        return payload[2] if payload else None
+
+    def scan(self, text: str) -> List[Tuple[int, int, Any]]:
+        """(start, end, payload) for every alias occurrence, in text order."""
+        if self._pattern is None or not text:
+            return []
+
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            matches = self._pattern.finditer(lowered)
+        else:
+            matches = self._pattern_ignore_case.finditer(text)
+
+        return [
+            (m.start(), m.end(), self._payloads[normalize_alias(m.group(0))])
+            for m in matches
+        ]
+
+    # ---------------------------------------------------------
+    # Brand / competitor / product index used for scoring
+    # ---------------------------------------------------------
+    @classmethod
+    def for_brand(cls, brand: str, competitors: Iterable[str] = (),
+                  products: Iterable[str] = ()) -> "MentionIndex":
+        """
+        Payloads are (name, kind, owner) with kind in brand/competitor/product.
+        Products are full names ("Amazfit Bip U Pro"); their owner is the
+        longest competitor name they start with, if any.
+        """
+        competitors = [c.strip() for c in competitors or [] if isinstance(c, str) and c.strip()]
+        entries: Dict[str, Any] = {}
+
+        # Longest first, so "Noise ColorFit" wins over "Noise" for the same key
+        for p in sorted({p.strip() for p in products or [] if isinstance(p, str) and p.strip()}, key=len, reverse=True):
+            owner = next(
+                (c for c in sorted(competitors, key=len, reverse=True) if normalize_alias(p).startswith(normalize_alias(c))),
+                None
+            )
+            entries.setdefault(p, (p, "product", owner))
+
+        for c in competitors:
+            entries.setdefault(c, (c, "competitor", c))
+        entries[brand] = (brand, "brand", brand)
+
+        return cls(entries)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]], brand: str,
+                  competitors: Iterable[str] = ()) -> "MentionIndex":
+        """Index everything the parser has ever emitted across a report."""
+        comp_names = list(competitors or [])
+        products = []
+        for r in rows:
+            comp_names.extend(r.get("competitors_brand_level") or [])
+            products.extend(r.get("competitors_product_level") or [])
+
+        seen = set()
+        unique = [c for c in comp_names if isinstance(c, str) and not (c.lower() in seen or seen.add(c.lower()))]
+        unique = [c for c in unique if c.lower() != brand.lower()]
+        return cls.for_brand(brand, unique, products)
+
+    def index_text(self, text: str) -> Dict[str, Any]:
+        """
+        mentions: [(start, end, name, kind)]
+        first_occurrence: owners (brand / competitor names) by first position
+        """
+        mentions, order, seen = [], [], set()
+        for start, end, (name, kind, owner) in self.scan(text or ""):
+            mentions.append((start, end, name, kind))
+            key = owner or name
+            if key not in seen:
+                seen.add(key)
+                order.append(key)
+        return {"mentions": mentions, "first_occurrence": order}
+
+    def index_rows(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self.index_text(r.get("raw_response") or "") for r in rows]
+
+
+def rescore_rows(rows: List[Dict[str, Any]], index: MentionIndex) -> List[Dict[str, Any]]:
+    """
+    Copies of flattened rows whose competitor lists also contain every
+    indexed competitor / product found in raw_response, so mentions the
+    LLM parser missed count towards competitor and product scores.
+    Parser order is kept; new names are appended in order of appearance.
+    Each row also gets mention_order (brand and competitors by first mention).
+    """
+    out = []
+    for row, found in zip(rows, index.index_rows(rows)):
+        brands = list(row.get("competitors_brand_level") or [])
+        products = list(row.get("competitors_product_level") or [])
+        brand_seen = {b.lower() for b in brands}
+        product_seen = {p.lower() for p in products}
+
+        for _, _, name, kind in found["mentions"]:
+            if kind == "brand":
+                continue
+
+            if kind == "product":
+                if name.lower() not in product_seen:
+                    product_seen.add(name.lower())
+                    products.append(name)
+                owner = index.owner_of(name)
+                if not owner:
+                    continue
+                name = owner
+
+            if name.lower() not in brand_seen:
+                brand_seen.add(name.lower())
+                brands.append(name)
+
+        new_row = dict(row)
+        new_row["competitors_brand_level"] = brands
+        new_row["competitors_product_level"] = products
+        new_row["mention_order"] = found["first_occurrence"]
+        out.append(new_row)
+    return out
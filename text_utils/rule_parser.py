@@ -0,0 +1,244 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from text_utils.mention_index import MentionIndex, normalize_alias
+
+# Retailers / marketplaces are never competitors (same list as the LLM parser prompt)
+RETAILERS = {
+    "amazon", "flipkart", "walmart", "target", "best buy", "ebay", "aliexpress",
+    "shopify", "newegg", "croma", "reliance digital", "jd.com", "mercadolibre",
+    "lazada", "myntra", "ajio", "paytm mall",
+}
+
+# Capitalized words that are not entities even in the middle of a sentence
+COMMON_CAPITALIZED = {
+    "i", "i'd", "i'm", "i'll", "i've", "ai", "faq", "faqs", "usd", "inr", "eur", "gbp",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "january", "february", "march", "april", "may", "june", "july", "august",
+    "september", "october", "november", "december", "india", "us", "usa", "uk",
+    "europe", "uae", "global", "android", "ios", "iphone", "google", "youtube", "reddit",
+    # spec vocabulary that shows up capitalized in product write-ups
+    "gps", "amoled", "oled", "lcd", "led", "hd", "fhd", "ips", "ecg", "spo2", "atm", "ip68",
+    "usb", "nfc", "anc", "enc", "ram", "ssd", "mah", "bluetooth", "wi-fi", "wifi",
+}
+
+ERROR_PREFIXES = ("ERROR:", "NO_MODEL_AVAILABLE")
+
+LIST_ITEM = re.compile(
+    r"^\s{0,3}(?:#{1,6}\s*)?(?:(?P<num>\d{1,2})[.)]|#(?P<hash>\d{1,2})\b|(?P<bullet>[-*•]))\s+(?P<body>.+?)\s*$"
+)
+BOLD_HEAD = re.compile(r"^\*\*(.+?)\*\*")
+HEAD_SPLIT = re.compile(r"\s*(?::|\s[-–—]\s)")
+CAPITALIZED = re.compile(r"(?<![\w'’-])([A-Z][\w'’.-]*[A-Za-z0-9])")
+SENTENCE_START = re.compile(r"(?:^|[.!?:]\s+|\s[-–—]\s+|\n\s*(?:[-*•]|\d{1,2}[.)])?\s*)(?:\*\*|\()?$")
+HEADING = re.compile(r"^\s*(?:#{1,6}\s.*|\*\*[^*\n]+:?\*\*:?)\s*$", re.MULTILINE)
+# Model names that follow a brand: "Bip U Pro", "Watch 2", "Galaxy Watch 5"
+CONTINUATION = re.compile(r"(?:[ \t]+(?:[A-Z0-9][\w+-]*|[a-z]?\d[\w+-]*))+")
+
+
+class RuleParser:
+    """
+    Deterministic local extraction of brand_mentioned / rank / competitors.
+
+    parse() returns the same dict shape as the LLM parser plus a confidence
+    in [0, 1]. Confidence is high only when every entity-looking word in
+    the response is a known brand, competitor, product or retailer, and the
+    rank is unambiguous (brand absent, or brand found in a list).
+    """
+
+    def __init__(self, brand: str, competitors: Iterable[str] = (),
+                 products: Optional[Dict[str, Iterable[str]]] = None):
+        self.brand = brand
+        self._aliases: Dict[str, Tuple[str, Optional[str]]] = {}  # lowered alias -> (owner, product)
+        self._index: Optional[MentionIndex] = None
+
+        self._add_alias(brand, brand, None)
+        # Retailers are matched too (so they never look like unknown brands) but have no owner
+        for r in RETAILERS:
+            self._add_alias(r, None, None)
+        for c in competitors or []:
+            if isinstance(c, str) and c.strip():
+                self._add_alias(c, c.strip(), None)
+        self.learn(products or {})
+
+    # ---------------------------------------------------------
+    # Alias table
+    # ---------------------------------------------------------
+    def _add_alias(self, alias: str, owner: str, product: Optional[str]):
+        key = normalize_alias(alias)
+        if key and key not in self._aliases:
+            self._aliases[key] = (owner, product)
+            self._index = None
+
+    def _owner_for(self, name: str) -> str:
+        known = self._aliases.get(normalize_alias(name))
+        return known[0] if known and known[0] else name.strip()
+
+    def learn(self, competitors_map: Dict[str, Any]):
+        """Add competitor brands and products found by the LLM parser."""
+        if not isinstance(competitors_map, dict):
+            return
+
+        for comp, models in competitors_map.items():
+            if not isinstance(comp, str) or not comp.strip() or comp.lower() in RETAILERS:
+                continue
+            owner = self._owner_for(comp)
+            self._add_alias(comp, owner, None)
+
+            for m in models if isinstance(models, list) else []:
+                m_clean = (m or "").strip() if isinstance(m, str) else ""
+                if not m_clean:
+                    continue
+                full = m_clean if m_clean.lower().startswith(comp.lower()) else f"{comp} {m_clean}"
+                self._add_alias(full, owner, full)
+                # The model name alone ("Bip U Pro") also identifies the product
+                short = full[len(comp):].strip()
+                if len(short) > 3:
+                    self._add_alias(short, owner, full)
+
+    def _compiled(self) -> MentionIndex:
+        # Rebuilt lazily, only after learn() added new aliases
+        if self._index is None:
+            self._index = MentionIndex(self._aliases)
+        return self._index
+
+    def _matches(self, text: str) -> List[Tuple[int, int, Optional[str], Optional[str], bool]]:
+        out = []
+        for start, end, (owner, product) in self._compiled().scan(text):
+            surface = text[start:end]
+
+            tail = CONTINUATION.match(text, end) if owner else None
+            if tail:
+                end = tail.end()
+                product = f"{product or owner} {' '.join(tail.group(0).split())}"
+
+            # "noise" in lowercase prose is probably the word, not the brand
+            exact_case = owner is None or surface != surface.lower() or owner == owner.lower()
+            out.append((start, end, owner, product, exact_case))
+        return out
+
+    def mentions(self, text: str) -> List[Tuple[int, int, str, Optional[str], bool]]:
+        """
+        (start, end, owner, product, exact_case) for every known brand alias.
+        Capitalized words right after a brand are read as its model name.
+        """
+        return [m for m in self._matches(text) if m[2] is not None]
+
+    # ---------------------------------------------------------
+    # Lists
+    # ---------------------------------------------------------
+    @staticmethod
+    def list_groups(text: str) -> List[List[Tuple[Optional[int], str]]]:
+        """Consecutive markdown list items as [(explicit_number, head_text)]."""
+        groups, current = [], []
+        for line in text.splitlines():
+            m = LIST_ITEM.match(line)
+            if m:
+                number = m.group("num") or m.group("hash")
+                body = m.group("body")
+                bold = BOLD_HEAD.match(body)
+                head = bold.group(1) if bold else HEAD_SPLIT.split(body, maxsplit=1)[0]
+                current.append((int(number) if number else None, head.strip(" *:")))
+            elif line.strip():
+                if current:
+                    groups.append(current)
+                current = []
+        if current:
+            groups.append(current)
+        return groups
+
+    # ---------------------------------------------------------
+    # Parse
+    # ---------------------------------------------------------
+    def _unknown_entities(self, text: str, matches) -> List[str]:
+        covered = [(s, e) for s, e, *_ in matches]
+        covered += [(h.start(), h.end()) for h in HEADING.finditer(text)]
+        unknown = []
+        for m in CAPITALIZED.finditer(text):
+            word = m.group(1).rstrip(".")
+            if any(s <= m.start() < e for s, e in covered):
+                continue
+            if word.lower() in COMMON_CAPITALIZED or word.lower() in RETAILERS:
+                continue
+            if SENTENCE_START.search(text[max(0, m.start() - 12):m.start()]):
+                continue
+            unknown.append(word)
+        return unknown
+
+    def parse(self, raw_text: str) -> Tuple[Dict[str, Any], float]:
+        text = raw_text or ""
+        if not text.strip() or text.startswith(ERROR_PREFIXES):
+            return {"brand_mentioned": False, "rank": None, "competitors": {}}, 1.0
+
+        matches = self._matches(text)
+        mentions = [m for m in matches if m[2] is not None]
+        brand_hits = [m for m in mentions if m[2] == self.brand]
+        brand_mentioned = bool(brand_hits)
+
+        competitors: Dict[str, Optional[List[str]]] = {}
+        for _, _, owner, product, _ in mentions:
+            if owner == self.brand:
+                continue
+            products = competitors.setdefault(owner, None)
+            if product:
+                if products is None:
+                    products = competitors[owner] = []
+                if product not in products:
+                    products.append(product)
+
+        confidence = 1.0
+        unknown = self._unknown_entities(text, matches)
+        if unknown:
+            confidence = min(confidence, 0.5 / len(set(unknown)))
+        if any(not exact for *_, exact in brand_hits) and not any(exact for *_, exact in brand_hits):
+            confidence = min(confidence, 0.4)
+
+        rank = None
+        if brand_mentioned:
+            rank, list_confidence = self._rank(text)
+            confidence = min(confidence, list_confidence)
+
+        return {"brand_mentioned": brand_mentioned, "rank": rank, "competitors": competitors}, confidence
+
+    def _rank(self, text: str) -> Tuple[Optional[int], float]:
+        best, best_resolved = None, 0
+        for group in self.list_groups(text):
+            owners = [self._head_owner(head) for _, head in group]
+            resolved = sum(o is not None for o in owners)
+            if resolved > best_resolved:
+                best, best_resolved = (group, owners), resolved
+
+        # Brand in prose only: the LLM ranks by order of mention, which is ambiguous
+        if best is None:
+            return None, 0.6
+
+        group, owners = best
+        if best_resolved < len(group):
+            return None, 0.5
+
+        for position, ((number, _), owner) in enumerate(zip(group, owners), start=1):
+            if owner == self.brand:
+                return number or position, 1.0
+        return None, 0.9
+
+    def _head_owner(self, head: str) -> Optional[str]:
+        hits = self.mentions(head)
+        return hits[0][2] if hits else None
+
+
+def compare_results(rule: Dict[str, Any], llm: Dict[str, Any]) -> Dict[str, bool]:
+    """Field-by-field agreement between a rule result and an LLM result."""
+    def as_rank(value):
+        try:
+            return int(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    def comp_names(value):
+        return {c.lower() for c in value} if isinstance(value, dict) else set()
+
+    return {
+        "brand_mentioned": bool(rule.get("brand_mentioned")) == bool(llm.get("brand_mentioned")),
+        "rank": as_rank(rule.get("rank")) == as_rank(llm.get("rank")),
+        "competitors": comp_names(rule.get("competitors")) == comp_names(llm.get("competitors")),
+    }
@@ -0,0 +1,127 @@
+import hashlib
+import random
+import re
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase word tokens joined by single spaces (punctuation dropped)."""
+    return " ".join(WORD.findall((text or "").lower()))
+
+
+def text_hash(text: str) -> str:
+    """Stable hash of the normalized text, for exact-duplicate checks."""
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def shingles(text: str, k: int = 3) -> Set[str]:
+    words = normalize_text(text).split()
+    if len(words) <= k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """MinHash signatures with deterministic permutations (same seed, same signature)."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, items: Set[str]) -> Tuple[int, ...]:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+            for s in items
+        ] or [0]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        )
+
+    @staticmethod
+    def similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+        return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    """
+    Incremental near-duplicate filter: exact duplicates by normalized hash,
+    near duplicates by Jaccard similarity of word shingles. MinHash + LSH
+    banding picks the candidates (only entries sharing a band), the exact
+    Jaccard of their shingle sets decides.
+    """
+
+    def __init__(self, threshold: float = 0.8, shingle_size: int = 3,
+                 num_perm: int = 64, bands: int = 16):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        self._exact: Set[str] = set()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self._shingles: List[Set[str]] = []
+
+    def _band_keys(self, sig: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, sig[band * self.rows:(band + 1) * self.rows]
+
+    def _find(self, text: str, min_words: Optional[int]):
+        """(is_duplicate, shingle set, signature); the last two are reused by add()."""
+        if text_hash(text) in self._exact:
+            return True, None, None
+
+        items = shingles(text, self.shingle_size)
+        sig = self.hasher.signature(items)
+
+        words = normalize_text(text).split()
+        if len(words) < (min_words if min_words is not None else self.shingle_size + 2):
+            return False, items, sig
+
+        candidates = set()
+        for key in self._band_keys(sig):
+            candidates.update(self._buckets.get(key, ()))
+
+        return any(jaccard(items, self._shingles[i]) >= self.threshold for i in candidates), items, sig
+
+    def is_duplicate(self, text: str, min_words: Optional[int] = None) -> bool:
+        """
+        True when text is a duplicate of something already added.
+        Texts shorter than min_words (default: shingle size + 2) only get
+        the exact check, since a handful of shingles says little.
+        """
+        return self._find(text, min_words)[0]
+
+    def add(self, text: str, _items: Optional[Set[str]] = None, _sig: Optional[Tuple[int, ...]] = None):
+        self._exact.add(text_hash(text))
+
+        items = _items if _items is not None else shingles(text, self.shingle_size)
+        sig = _sig if _sig is not None else self.hasher.signature(items)
+        idx = len(self._shingles)
+        self._shingles.append(items)
+        for key in self._band_keys(sig):
+            self._buckets.setdefault(key, []).append(idx)
+
+    def add_if_new(self, text: str, min_words: Optional[int] = None) -> bool:
+        """Add text unless it duplicates an earlier one; returns True when added."""
+        duplicate, items, sig = self._find(text, min_words)
+        if duplicate:
+            return False
+        self.add(text, items, sig)
+        return True
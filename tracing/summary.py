@@ -0,0 +1,152 @@
+import argparse
+import json
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+CALL_KINDS = ("query", "search", "fetch", "llm", "parse")
+
+
+def llm_cost(attributes: Dict[str, Any]) -> float:
+    """USD for one LLM span from MODEL_CATALOG (cache hits cost nothing)."""
+    if attributes.get("cache_hit"):
+        return 0.0
+
+    from llm_utils.model_registry import get_model
+    try:
+        info = get_model(f"{attributes.get('provider')}:{attributes.get('model')}")
+    except ValueError:
+        return 0.0
+    return (
+        (attributes.get("prompt_tokens") or 0) * info.input_cost
+        + (attributes.get("completion_tokens") or 0) * info.output_cost
+    ) / 1_000_000
+
+
+class _Stage:
+    __slots__ = ("count", "errors", "durations", "bytes", "prompt_tokens", "completion_tokens",
+                 "cache_hits", "retries", "cost")
+
+    def __init__(self):
+        self.count = self.errors = self.bytes = self.prompt_tokens = self.completion_tokens = 0
+        self.cache_hits = self.retries = 0
+        self.cost = 0.0
+        self.durations: List[float] = []
+
+    def add(self, record: Dict[str, Any], cost: float):
+        attrs = record.get("attributes") or {}
+        self.count += 1
+        self.errors += record.get("status") != "ok"
+        self.durations.append(record.get("duration_ms") or 0.0)
+        self.bytes += attrs.get("bytes") or 0
+        self.prompt_tokens += attrs.get("prompt_tokens") or 0
+        self.completion_tokens += attrs.get("completion_tokens") or 0
+        self.cache_hits += bool(attrs.get("cache_hit"))
+        self.retries += attrs.get("retries") or 0
+        self.cost += cost
+
+
+class TraceSummary:
+    """
+    Time and cost per graph node (wall time of the node span; bytes, tokens,
+    retries and cost of the calls made inside it) and per call kind. Call
+    times are summed latencies, so concurrent calls add up to more than the
+    node's wall time.
+    """
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.nodes: Dict[str, _Stage] = defaultdict(_Stage)
+        self.node_calls: Dict[str, _Stage] = defaultdict(_Stage)   # calls made inside each node
+        self.kinds: Dict[str, _Stage] = defaultdict(_Stage)
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]):
+        kind = record.get("kind")
+        cost = llm_cost(record.get("attributes") or {}) if kind == "llm" else 0.0
+
+        with self._lock:
+            if kind == "node":
+                self.nodes[record["name"]].add(record, 0.0)
+            elif kind in CALL_KINDS:
+                self.kinds[kind].add(record, cost)
+                # Queries only group the calls below them; count those once
+                if kind != "query":
+                    self.node_calls[record.get("node") or "-"].add(record, cost)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = []
+            for name, stage in self.nodes.items():
+                rows.append(self._row(f"node:{name}", stage, self.node_calls.get(name) or _Stage()))
+            for kind in CALL_KINDS:
+                if kind in self.kinds:
+                    rows.append(self._row(kind, self.kinds[kind], self.kinds[kind]))
+            return rows
+
+    @staticmethod
+    def _row(stage: str, timing: _Stage, s: _Stage) -> Dict[str, Any]:
+        """Times from `timing`; bytes, tokens, cache hits, retries and cost from `s`."""
+        durations = sorted(timing.durations)
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))] if durations else 0.0
+        return {
+            "stage": stage,
+            "count": timing.count,
+            "seconds": round(sum(durations) / 1000, 2),
+            "avg_ms": round(sum(durations) / len(durations), 1) if durations else 0.0,
+            "p95_ms": round(p95, 1),
+            "mb": round(s.bytes / 2 ** 20, 2),
+            "tokens_in": s.prompt_tokens,
+            "tokens_out": s.completion_tokens,
+            "cache_hit_pct": round(100 * s.cache_hits / s.count, 1) if s.count else 0.0,
+            "retries": s.retries,
+            "errors": timing.errors,
+            "cost_usd": round(s.cost, 4),
+        }
+
+    def table(self) -> str:
+        rows = self.rows()
+        columns = ["stage", "count", "seconds", "avg_ms", "p95_ms", "mb", "tokens_in", "tokens_out",
+                   "cache_hit_pct", "retries", "errors", "cost_usd"]
+        widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) if rows else len(c) for c in columns}
+
+        lines = [f"trace {self.trace_id}"]
+        lines.append("  ".join(c.ljust(widths[c]) for c in columns))
+        for r in rows:
+            lines.append("  ".join(str(r[c]).ljust(widths[c]) for c in columns))
+        total = sum(r["cost_usd"] for r in rows if r["stage"].startswith("node:"))
+        lines.append(f"total LLM cost ${total:.4f}")
+        return "\n".join(lines)
+
+
+def summarize(records: Iterable[Dict[str, Any]], trace_id: Optional[str] = None) -> Optional[TraceSummary]:
+    """Summary of one trace from exported span records (default: the last trace in the file)."""
+    records = list(records)
+    if trace_id is None and records:
+        trace_id = records[-1].get("trace_id")
+    if trace_id is None:
+        return None
+
+    summary = TraceSummary(trace_id)
+    for record in records:
+        if record.get("trace_id") == trace_id:
+            summary.add(record)
+    return summary
+
+
+def read_spans(path: str) -> Iterable[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage time / cost table for a traced run.")
+    parser.add_argument("path", nargs="?", default=None, help="spans JSONL (default config.TRACE_PATH)")
+    parser.add_argument("--trace", default=None, help="trace id (default: the most recent one)")
+    args = parser.parse_args()
+
+    import config
+    found = summarize(read_spans(args.path or config.TRACE_PATH), args.trace)
+    print(found.table() if found else "no spans found")
@@ -0,0 +1,310 @@
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+from tracing.summary import TraceSummary
+
+
+class Span:
+    """
+    One timed operation. kind is "node", "query", "search", "fetch",
+    "llm" or "parse"; attributes carry what was measured (bytes,
+    prompt_tokens, completion_tokens, cache_hit, retries, ...).
+    """
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "node", "start",
+                 "duration_ms", "status", "attributes", "_t0", "_otel")
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.kind = kind
+        # Graph node the span belongs to, for per-stage attribution
+        self.node = name if kind == "node" else (parent.node if parent else None)
+        self.start = time.time()
+        self.duration_ms = 0.0
+        self.status = "ok"
+        self.attributes = attributes
+        self._t0 = time.perf_counter()
+        self._otel = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def set_default(self, **attributes):
+        for key, value in attributes.items():
+            self.attributes.setdefault(key, value)
+
+    def add(self, key: str, amount: float = 1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "node": self.node,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+    def set_default(self, **attributes):
+        pass
+
+    def add(self, key: str, amount: float = 1):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+# -------------------------------------------------------------
+# Exporters
+# -------------------------------------------------------------
+class JsonlExporter:
+    """Appends one JSON line per finished span; flushed every 100 spans and at the end of a trace."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def start(self, span: Span):
+        pass
+
+    def end(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._pending += 1
+            if self._pending >= 100:
+                self._file.flush()
+                self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+            self._pending = 0
+
+
+class OtlpExporter:
+    """
+    Mirrors spans to an OTLP/HTTP collector. Needs opentelemetry-sdk and
+    opentelemetry-exporter-otlp-proto-http (optional dependencies).
+    """
+
+    def __init__(self, endpoint: str):
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        self._trace = trace
+        self._provider = TracerProvider(resource=Resource.create({"service.name": config.TRACE_SERVICE_NAME}))
+        self._provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+        self._tracer = self._provider.get_tracer("visibility")
+        self._live: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def start(self, span: Span):
+        with self._lock:
+            parent = self._live.get(span.parent_id)
+        context = self._trace.set_span_in_context(parent) if parent is not None else None
+        span._otel = self._tracer.start_span(
+            span.name, context=context, start_time=int(span.start * 1e9),
+            attributes={"kind": span.kind, "trace_id": span.trace_id}
+        )
+        with self._lock:
+            self._live[span.span_id] = span._otel
+
+    def end(self, span: Span):
+        otel = span._otel
+        if otel is None:
+            return
+        for key, value in span.attributes.items():
+            if isinstance(value, (str, bool, int, float)):
+                otel.set_attribute(key, value)
+        if span.status != "ok":
+            otel.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+        otel.end(end_time=int((span.start + span.duration_ms / 1000) * 1e9))
+        with self._lock:
+            self._live.pop(span.span_id, None)
+
+    def flush(self):
+        self._provider.force_flush()
+
+
+# -------------------------------------------------------------
+# Tracer
+# -------------------------------------------------------------
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_current_trace: ContextVar[Optional[str]] = ContextVar("current_trace", default=None)
+
+# Summaries of runs that stopped and were never resumed here (e.g. requeued
+# to another worker) are dropped once idle this long
+SUMMARY_MAX_IDLE_SECONDS = 24 * 3600
+
+
+class Tracer:
+    """Hands finished spans to the exporters and keeps a running summary per trace."""
+
+    def __init__(self):
+        self.exporters: List[Any] = []
+        if config.TRACE_PATH:
+            self.exporters.append(JsonlExporter(config.TRACE_PATH))
+        if config.TRACE_OTLP_ENDPOINT:
+            try:
+                self.exporters.append(OtlpExporter(config.TRACE_OTLP_ENDPOINT))
+            except ImportError as e:
+                print(f"OTLP export disabled ({e}); install opentelemetry-sdk and opentelemetry-exporter-otlp-proto-http")
+
+        self._summaries: Dict[str, TraceSummary] = {}
+        self._last_span_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def start(self, span: Span):
+        for exporter in self.exporters:
+            exporter.start(span)
+
+    def finish(self, span: Span):
+        record = span.to_dict()
+        for exporter in self.exporters:
+            exporter.end(span)
+        with self._lock:
+            summary = self._summaries.setdefault(span.trace_id, TraceSummary(span.trace_id))
+            self._last_span_at[span.trace_id] = time.time()
+        summary.add(record)
+
+    def flush(self):
+        for exporter in self.exporters:
+            exporter.flush()
+
+    def end_trace(self, trace_id: str) -> Optional[TraceSummary]:
+        self.flush()
+        with self._lock:
+            idle_since = time.time() - SUMMARY_MAX_IDLE_SECONDS
+            for stale in [t for t, at in self._last_span_at.items() if at < idle_since and t != trace_id]:
+                self._summaries.pop(stale, None)
+                self._last_span_at.pop(stale, None)
+            self._last_span_at.pop(trace_id, None)
+            return self._summaries.pop(trace_id, None)
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+
+# Trace for runs without a thread_id (set by the first node of the graph)
+_fallback_trace_id = uuid.uuid4().hex
+
+
+@contextmanager
+def span(name: str, kind: str, **attributes):
+    """
+    Time the block as a child of the current span (contextvars, so it follows
+    asyncio tasks and asyncio.to_thread). Exceptions mark the span "error"
+    and propagate.
+    """
+    if not config.TRACING:
+        yield NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    trace_id = parent.trace_id if parent else (_current_trace.get() or _fallback_trace_id)
+    s = Span(name, kind, trace_id, parent, attributes)
+    tracer = get_tracer()
+    tracer.start(s)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status = "error"
+        s.attributes["error"] = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        _current_span.reset(token)
+        s.duration_ms = (time.perf_counter() - s._t0) * 1000
+        tracer.finish(s)
+
+
+def current_span():
+    """The innermost open span, or a no-op stand-in."""
+    return _current_span.get() or NOOP_SPAN
+
+
+def annotate(**attributes):
+    """Set attributes on the innermost open span (no-op outside a span)."""
+    current_span().set(**attributes)
+
+
+def traced_node(name: str, node: Callable, first: bool = False, last: bool = False) -> Callable:
+    """
+    Graph node wrapped in a "node" span. The trace id is the run's
+    thread_id (one trace across resumes), else a new id per run started at
+    the first node. The last node prints the stage summary; a node that
+    raises ends the trace too unless the run can resume from a checkpoint
+    (the spans are flushed either way).
+    """
+    from storage.progress_store import current_thread_id
+
+    @functools.wraps(node)
+    def wrapper(state):
+        global _fallback_trace_id
+        if not config.TRACING:
+            return node(state)
+
+        thread_id = current_thread_id()
+        if not thread_id and first:
+            _fallback_trace_id = uuid.uuid4().hex
+        trace_id = thread_id or _fallback_trace_id
+
+        token = _current_trace.set(trace_id)
+        try:
+            with span(name, "node"):
+                result = node(state)
+        except BaseException:
+            if thread_id and config.CHECKPOINT_PATH:
+                get_tracer().flush()
+            else:
+                get_tracer().end_trace(trace_id)
+            raise
+        finally:
+            _current_trace.reset(token)
+
+        if last:
+            summary = get_tracer().end_trace(trace_id)
+            if summary:
+                print(summary.table())
+        return result
+
+    return wrapper
@@ -0,0 +1,110 @@
+from html.parser import HTMLParser
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import urljoin
+
+# Subtrees dropped by web_scraper.clean_text
+PAGE_SKIP_TAGS = ("script", "style", "noscript", "footer", "header", "nav", "form")
+
+# Subtrees dropped from search-result snippets
+SNIPPET_SKIP_TAGS = ("script", "style", "noscript", "header", "footer", "svg")
+
+# Feeding the parser in slices is what lets extraction stop early
+CHUNK_SIZE = 16 * 1024
+
+
+class _StreamingExtractor(HTMLParser):
+    """
+    Single pass over the markup: text outside skipped subtrees is
+    collected as it streams by, <a href> targets are collected everywhere
+    (navigation menus are where the useful links live). No tree is built.
+    """
+
+    def __init__(self, skip_tags: Iterable[str], char_budget: Optional[int], collect_links: bool):
+        super().__init__(convert_charrefs=True)
+        self.skip_tags = set(skip_tags)
+        self.char_budget = char_budget
+        self.collect_links = collect_links
+
+        self.pieces: List[str] = []
+        self.chars = 0
+        self.links: List[str] = []
+        self._skip_depth = 0
+        # A text node can arrive in several handle_data calls (chunk borders)
+        self._text_run: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        return (
+            not self.collect_links
+            and self.char_budget is not None
+            and self.chars >= self.char_budget
+        )
+
+    def _flush_text(self):
+        if not self._text_run:
+            return
+
+        # Same normalisation as get_text(" ", strip=True) + whitespace collapse
+        text = " ".join("".join(self._text_run).split())
+        self._text_run = []
+        if text:
+            self.pieces.append(text)
+            self.chars += len(text) + 1
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag in self.skip_tags:
+            self._skip_depth += 1
+            return
+
+        if self.collect_links and tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag in self.skip_tags and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._skip_depth or (self.char_budget is not None and self.chars >= self.char_budget):
+            return
+        self._text_run.append(data)
+
+    def close(self):
+        super().close()
+        self._flush_text()
+
+
+def extract(html: str, base_url: Optional[str] = None, skip_tags: Iterable[str] = PAGE_SKIP_TAGS,
+            char_budget: Optional[int] = None, collect_links: bool = False) -> Tuple[str, List[str]]:
+    """
+    Cleaned text and (optionally) absolute link URLs from one streaming pass.
+
+    char_budget stops collecting text once that many characters are in
+    hand; when links are not needed, parsing stops there too.
+    Links are returned in document order without duplicates.
+    """
+    parser = _StreamingExtractor(skip_tags, char_budget, collect_links)
+
+    for start in range(0, len(html or ""), CHUNK_SIZE):
+        parser.feed(html[start:start + CHUNK_SIZE])
+        if parser.done:
+            break
+    else:
+        parser.close()
+    parser._flush_text()
+
+    text = " ".join(parser.pieces)
+    if char_budget is not None:
+        text = text[:char_budget]
+
+    links, seen = [], set()
+    for href in parser.links:
+        url = urljoin(base_url, href) if base_url else href
+        if url not in seen:
+            seen.add(url)
+            links.append(url)
+
+    return text, links
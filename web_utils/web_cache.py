@@ -0,0 +1,252 @@
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import config
+from llm_utils.completion_cache import DiskCache
+
+# Parameters starting with TRACKING_PREFIXES or named exactly as in
+# TRACKING_PARAMS (so ?refine= or ?reference= are kept)
+TRACKING_PREFIXES = ("utm_",)
+TRACKING_PARAMS = frozenset({"gclid", "fbclid", "msclkid", "ref", "ref_src", "srsltid"})
+
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name.startswith(TRACKING_PREFIXES) or name in TRACKING_PARAMS
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form used as the page cache key:
+    lowercase scheme/host, no default port, no fragment,
+    no tracking parameters, sorted query string, no trailing slash.
+    """
+    parts = urlsplit((url or "").strip())
+    scheme = parts.scheme.lower() or "http"
+    host = (parts.hostname or "").lower()
+
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+
+    params = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(k)
+    ]
+    path = parts.path.rstrip("/") or "/"
+
+    return urlunsplit((scheme, host, path, urlencode(sorted(params)), ""))
+
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").casefold().split())
+
+
+class WebCache:
+    """
+    Search-result and page-snippet cache for one run.
+
+    Lookups go to the in-memory run cache first, then to the optional
+    persistent store. Stale persistent pages are revalidated with
+    If-None-Match / If-Modified-Since, so an unchanged page costs a 304;
+    if the revalidation fails, the stale snippet is used.
+    In replay mode nothing goes to the network.
+    """
+
+    def __init__(self, persistent: Optional[DiskCache] = None, ttl_seconds: Optional[float] = None,
+                 replay: bool = False):
+        self.persistent = persistent
+        self.ttl_seconds = ttl_seconds
+        self.replay = replay
+        self.stats = Counter()
+
+        self._searches: Dict[str, List[Dict[str, str]]] = {}
+        self._pages: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        # One lock per key, so concurrent queries hitting the same URL fetch it once
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _load(self, key: str) -> Optional[dict]:
+        if self.persistent is None:
+            return None
+        value = self.persistent.get(key)
+        return json.loads(value) if value is not None else None
+
+    def _store(self, key: str, entry: dict):
+        if self.persistent is not None:
+            self.persistent.set(key, json.dumps(entry, ensure_ascii=False))
+
+    def _is_fresh(self, entry: dict) -> bool:
+        return not self.ttl_seconds or time.time() - entry["fetched_at"] <= self.ttl_seconds
+
+    # ---------------------------------------------------------
+    # Search results
+    # ---------------------------------------------------------
+    def search(self, query: str, max_results: int,
+               fetch: Callable[[], List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        key = f"search:{max_results}:{normalize_query(query)}"
+
+        with self._key_lock(key):
+            if key in self._searches:
+                self.stats["search_hits"] += 1
+                return self._searches[key]
+
+            entry = self._load(key)
+            if entry is not None and (self.replay or self._is_fresh(entry)):
+                self.stats["search_hits"] += 1
+                self._searches[key] = entry["results"]
+                return entry["results"]
+
+            self.stats["search_misses"] += 1
+            if self.replay:
+                return []
+
+            results = fetch()
+            if results:
+                # Empty lists are usually a failed request, retry them next time
+                self._searches[key] = results
+                self._store(key, {"results": results, "fetched_at": time.time()})
+            return results
+
+    # ---------------------------------------------------------
+    # Page snippets
+    # ---------------------------------------------------------
+    def page(self, url: str, fetch: Callable[[Dict[str, str]], Tuple[Optional[str], Dict[str, str]]],
+             namespace: str = "page") -> str:
+        """
+        fetch(validators) returns (snippet, validators). A snippet of None
+        means "304 Not Modified", "" means the fetch failed (a stored
+        snippet, however stale, is then used instead).
+        namespace separates different views of the same URL (snippet vs full HTML).
+        """
+        key = f"{namespace}:{normalize_url(url)}"
+
+        with self._key_lock(key):
+            if key in self._pages:
+                self.stats["page_hits"] += 1
+                return self._pages[key]
+
+            entry = self._load(key)
+            if entry is not None and (self.replay or self._is_fresh(entry)):
+                self.stats["page_hits"] += 1
+                self._pages[key] = entry["snippet"]
+                return entry["snippet"]
+
+            if self.replay:
+                self.stats["page_misses"] += 1
+                return ""
+
+            validators = entry["validators"] if entry else {}
+            snippet, new_validators = fetch(validators)
+
+            if snippet is None and entry is not None:
+                self.stats["page_revalidated"] += 1
+                snippet = entry["snippet"]
+                new_validators = new_validators or validators
+            elif not snippet and entry is not None:
+                # Stale-if-error: keep the stored entry (and its validators)
+                # as is, so the next run tries to revalidate it again
+                self.stats["page_stale"] += 1
+                self._pages[key] = entry["snippet"]
+                return entry["snippet"]
+            else:
+                self.stats["page_misses"] += 1
+                snippet = snippet or ""
+
+            if snippet:
+                self._store(key, {
+                    "snippet": snippet,
+                    "validators": new_validators,
+                    "fetched_at": time.time()
+                })
+
+            # Failed pages are remembered for this run only
+            self._pages[key] = snippet
+            return snippet
+
+    def summary(self) -> str:
+        s = self.stats
+        searches = s["search_hits"] + s["search_misses"]
+        pages = s["page_hits"] + s["page_revalidated"] + s["page_stale"] + s["page_misses"]
+
+        parts = []
+        if searches:
+            parts.append(
+                f"searches {s['search_hits']}/{searches} hits ({s['search_hits'] / searches * 100:.1f}%)"
+            )
+        if pages:
+            reused = s["page_hits"] + s["page_revalidated"] + s["page_stale"]
+            stale = f"+{s['page_stale']} stale" if s["page_stale"] else ""
+            parts.append(
+                f"pages {s['page_hits']}+{s['page_revalidated']} revalidated{stale}/{pages} "
+                f"({reused / pages * 100:.1f}%)"
+            )
+        return "web cache: " + (", ".join(parts) or "no lookups")
+
+
+# -------------------------------------------------------------
+# Run-scoped instance shared by the fetch helpers
+# -------------------------------------------------------------
+_persistent: Optional[DiskCache] = None
+_current: Optional[WebCache] = None
+_shared: Optional[WebCache] = None
+_state_lock = threading.Lock()
+
+
+def start_run_cache() -> WebCache:
+    """
+    Start a fresh run scope; the persistent store (if enabled) is shared.
+    Inside shared_run_cache() every run keeps using the shared scope.
+    """
+    global _persistent, _current
+    replay = config.LLM_CACHE_MODE == "replay"
+
+    with _state_lock:
+        if _shared is not None:
+            return _shared
+
+        if config.WEB_CACHE_PERSISTENT and _persistent is None:
+            _persistent = DiskCache(
+                config.WEB_CACHE_PATH,
+                max_bytes=config.WEB_CACHE_MAX_BYTES,
+                read_only=replay
+            )
+
+        _current = WebCache(
+            persistent=_persistent if config.WEB_CACHE_PERSISTENT else None,
+            ttl_seconds=config.WEB_CACHE_TTL_SECONDS,
+            replay=replay
+        )
+        return _current
+
+
+def get_run_cache() -> WebCache:
+    with _state_lock:
+        current = _current
+    return current if current is not None else start_run_cache()
+
+
+@contextmanager
+def shared_run_cache():
+    """
+    One run scope for every run started inside the block, e.g. batch jobs
+    on parallel threads: searches and pages are fetched once for all of them.
+    """
+    global _shared
+    cache = start_run_cache()
+    with _state_lock:
+        _shared = cache
+    try:
+        yield cache
+    finally:
+        with _state_lock:
+            _shared = None